@@ -1,9 +1,5 @@
-from src.manual_test import manual_test
-
-
-def main():
-    manual_test()
+from src.cli import main
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,135 @@
+import numpy as np
+
+ASSIGNMENT_MODES = ('greedy', 'hungarian')
+
+
+def bbox_centers(bboxes):
+    """Целочисленные центры боксов (N, 4) -> (N, 2), как в FishTracker._get_center"""
+    boxes = np.asarray(bboxes, dtype=np.int64).reshape(-1, 4)
+    centers = np.empty((len(boxes), 2), dtype=np.int64)
+    centers[:, 0] = boxes[:, 0] + boxes[:, 2] / 2
+    centers[:, 1] = boxes[:, 1] + boxes[:, 3] / 2
+    return centers
+
+
+def distance_cost(track_centers, det_centers, max_distance, backward_slack=30, flow='right', origins=None):
+    """Матрица стоимостей (T, D): евклидово расстояние между центрами.
+
+    Недопустимые пары (дальше max_distance или движение против течения flow
+    больше чем на backward_slack пикселей) получают np.inf. При flow='both'
+    направление не ограничивается. max_distance - число или радиус на трек (T,).
+    origins - последние наблюдаемые центры треков для гейта направления, если
+    track_centers - предсказанные позиции (иначе гейт от track_centers).
+    """
+    tc = np.asarray(track_centers, dtype=np.float64).reshape(-1, 2)
+    dc = np.asarray(det_centers, dtype=np.float64).reshape(-1, 2)
+
+    dx = dc[None, :, 0] - tc[:, None, 0]
+    dy = dc[None, :, 1] - tc[:, None, 1]
+    cost = np.sqrt(dx * dx + dy * dy)
+    if origins is not None:
+        oc = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+        dx = dc[None, :, 0] - oc[:, None, 0]
+
+    # Гейты: радиус поиска и движение только вперед по течению
+    invalid = cost >= np.reshape(max_distance, (-1, 1))
+    if flow == 'right':
+        invalid |= dx <= -backward_slack
+    elif flow == 'left':
+        invalid |= dx >= backward_slack
+    cost[invalid] = np.inf
+    return cost
+
+
+def greedy_assignment(cost):
+    """Жадное сопоставление строк по порядку: каждая строка берет ближайший свободный столбец.
+
+    Совпадает с прежним вложенным циклом FishTracker.update, включая
+    разрешение равенств в пользу меньшего индекса детекции.
+    """
+    n_rows, n_cols = cost.shape
+    if n_rows == 0 or n_cols == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    best = np.argmin(cost, axis=1)
+    valid = np.isfinite(cost[np.arange(n_rows), best])
+    rows = np.flatnonzero(valid)
+    cols = best[rows]
+
+    # Быстрый путь: конфликтов за детекции нет - решение уже оптимально
+    if len(np.unique(cols)) == len(cols):
+        return rows, cols
+
+    order = np.argsort(cost, axis=1, kind='stable')
+    n_finite = np.isfinite(cost).sum(axis=1)
+    used = np.zeros(n_cols, dtype=bool)
+    match_rows, match_cols = [], []
+
+    for r in rows.tolist():
+        for c in order[r, :n_finite[r]].tolist():
+            if not used[c]:
+                used[c] = True
+                match_rows.append(r)
+                match_cols.append(c)
+                break
+
+    return np.array(match_rows, dtype=np.intp), np.array(match_cols, dtype=np.intp)
+
+
+def hungarian_assignment(cost):
+    """Глобально оптимальное сопоставление (минимум суммарного расстояния)"""
+    # scipy.optimize грузится ~0.4 с - импорт при первом вызове, а не при запуске
+    try:
+        from scipy.optimize import linear_sum_assignment
+    except ImportError:
+        raise ImportError("Режим 'hungarian' требует scipy") from None
+
+    n_rows, n_cols = cost.shape
+    finite = np.isfinite(cost)
+    if not finite.any():
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    # Недопустимые пары заменяем на стоимость, которая заведомо хуже любой допустимой
+    big = cost[finite].max() * (n_rows + n_cols) + 1.0
+    rows, cols = linear_sum_assignment(np.where(finite, cost, big))
+    keep = finite[rows, cols]
+    return rows[keep], cols[keep]
+
+
+def assign(cost, mode='greedy'):
+    """Сопоставление треков и детекций по матрице стоимостей"""
+    if mode == 'greedy':
+        return greedy_assignment(cost)
+    if mode == 'hungarian':
+        return hungarian_assignment(cost)
+    raise ValueError(f"Неизвестный режим сопоставления: {mode}")
+
+
+def isolated_detections(det_centers, ref_centers, radius):
+    """Маска детекций, из которых можно создавать новые треки.
+
+    Детекция отбрасывается, если рядом (ближе radius) уже есть трек или
+    детекция, принятая раньше нее в этом же кадре.
+    """
+    dc = np.asarray(det_centers, dtype=np.float64).reshape(-1, 2)
+    rc = np.asarray(ref_centers, dtype=np.float64).reshape(-1, 2)
+    r2 = radius * radius
+
+    if len(rc):
+        d2 = ((dc[:, None, :] - rc[None, :, :]) ** 2).sum(axis=2)
+        keep = ~(d2 < r2).any(axis=1)
+    else:
+        keep = np.ones(len(dc), dtype=bool)
+
+    candidates = np.flatnonzero(keep)
+    if len(candidates) > 1:
+        cc = dc[candidates]
+        close = ((cc[:, None, :] - cc[None, :, :]) ** 2).sum(axis=2) < r2
+        accepted = np.zeros(len(candidates), dtype=bool)
+        for i in range(len(candidates)):
+            if close[i, :i][accepted[:i]].any():
+                keep[candidates[i]] = False
+            else:
+                accepted[i] = True
+
+    return keep
@@ -0,0 +1,42 @@
+import argparse
+import importlib
+
+# Бенчмарк -> модуль пакета (по имени модуля src, который он измеряет).
+# Модуль и все, что он тянет за собой, импортируются только для выбранных бенчмарков.
+BENCHMARKS = {
+    'association': 'association',
+    'track_memory': 'track_store',
+    'scale': 'detector',
+    'detector_buffers': 'detector',
+    'compare_detection_backends': 'detector',
+    'box_merge': 'box_merge',
+    'motion_gate': 'motion_gate',
+    'operators': 'cv_runtime',
+    'instrumentation': 'instrumentation',
+    'replay_cache': 'cache',
+    'compare_motion_models': 'motion_model',
+    'batch_api': 'pipeline',
+    'renderer': 'renderer',
+    'sharding': 'sharding',
+    'startup': 'cli',
+    'checkpoint': 'checkpoint',
+    'zones': 'zones',
+    'density': 'synthetic',
+}
+
+
+def load(name):
+    """Функция бенчмарка по имени: benchmark_<name> или compare_<...> из его модуля"""
+    module = importlib.import_module(f'{__name__}.{BENCHMARKS[name]}')
+    return getattr(module, name if name.startswith('compare_') else f'benchmark_{name}')
+
+
+def main():
+    """Запуск бенчмарков по имени: python -m src.benchmarks association zones"""
+    parser = argparse.ArgumentParser(description='Бенчмарки (только выбранные по имени, проверки - в tests/)')
+    parser.add_argument('names', nargs='+', choices=sorted(BENCHMARKS), metavar='name',
+                        help=', '.join(sorted(BENCHMARKS)))
+    args = parser.parse_args()
+    for name in args.names:
+        print(f"== {name}")
+        load(name)()
@@ -0,0 +1,5 @@
+from src.benchmarks import main
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+
+from src.association import assign, bbox_centers, distance_cost
+
+
+def moving_boxes(n_objects, n_frames, seed=0):
+    """Синтетические боксы косяка: n_objects рыб плывут слева направо"""
+    rng = np.random.default_rng(seed)
+    pos = np.column_stack([rng.uniform(0, 600, n_objects), rng.uniform(0, 400, n_objects)])
+    speed = rng.uniform(5, 20, n_objects)
+    size = rng.integers(20, 60, (n_objects, 2))
+
+    frames = []
+    for _ in range(n_frames):
+        pos[:, 0] = (pos[:, 0] + speed) % 640
+        pos[:, 1] += rng.normal(0, 2, n_objects)
+        frames.append([(int(x), int(y), int(w), int(h)) for (x, y), (w, h) in zip(pos, size)])
+    return frames
+
+
+def _loop_assignment(track_boxes, detections, max_distance):
+    """Прежний вложенный цикл FishTracker.update (эталон для сравнения)"""
+    used = set()
+    matches = []
+    for t, tb in enumerate(track_boxes):
+        tc = (int(tb[0] + tb[2] / 2), int(tb[1] + tb[3] / 2))
+        best_idx, best_distance = -1, float('inf')
+        for i, db in enumerate(detections):
+            if i in used:
+                continue
+            dc = (int(db[0] + db[2] / 2), int(db[1] + db[3] / 2))
+            distance = np.sqrt((dc[0] - tc[0]) ** 2 + (dc[1] - tc[1]) ** 2)
+            if distance < best_distance and distance < max_distance and dc[0] > tc[0] - 30:
+                best_distance, best_idx = distance, i
+        if best_idx != -1:
+            matches.append((t, best_idx))
+            used.add(best_idx)
+    return matches
+
+
+def benchmark_association(sizes=(10, 50, 200), n_frames=200, max_distance=280):
+    """Время сопоставления треков и детекций на кадр: цикл vs матрица стоимостей"""
+    results = []
+
+    for n in sizes:
+        frames = moving_boxes(n, n_frames + 1)
+        row = {'objects': n}
+
+        start = time.perf_counter()
+        for prev, cur in zip(frames, frames[1:]):
+            _loop_assignment(prev, cur, max_distance)
+        row['loop_ms'] = (time.perf_counter() - start) / n_frames * 1000
+
+        for mode in ('greedy', 'hungarian'):
+            start = time.perf_counter()
+            for prev, cur in zip(frames, frames[1:]):
+                cost = distance_cost(bbox_centers(prev), bbox_centers(cur), max_distance)
+                assign(cost, mode)
+            row[f'{mode}_ms'] = (time.perf_counter() - start) / n_frames * 1000
+
+        row['speedup'] = row['loop_ms'] / row['greedy_ms']
+        results.append(row)
+
+        print(f"Объектов: {n:4d}  цикл: {row['loop_ms']:8.3f} мс  "
+              f"greedy: {row['greedy_ms']:7.3f} мс  hungarian: {row['hungarian_ms']:7.3f} мс  "
+              f"ускорение: {row['speedup']:.1f}x")
+
+    return results
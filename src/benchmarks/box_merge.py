@@ -0,0 +1,53 @@
+import time
+
+import numpy as np
+
+from src.box_merge import merge_close_boxes
+
+
+def _sorted_merge(boxes, threshold):
+    """Прежний _merge_close_boxes: один проход по x с растущим текущим боксом (эталон)"""
+    boxes = sorted(boxes, key=lambda b: b[0])
+    merged = []
+    current = list(boxes[0])
+    for x2, y2, w2, h2 in boxes[1:]:
+        x1, y1, w1, h1 = current
+        horizontal_gap = max(0, max(x1, x2) - min(x1 + w1, x2 + w2))
+        vertical_gap = max(0, max(y1, y2) - min(y1 + h1, y2 + h2))
+        inter_area = (max(0, min(x1 + w1, x2 + w2) - max(x1, x2)) *
+                      max(0, min(y1 + h1, y2 + h2) - max(y1, y2)))
+        if inter_area > 0 or max(horizontal_gap, vertical_gap) < threshold:
+            nx, ny = min(x1, x2), min(y1, y2)
+            current = [nx, ny, max(x1 + w1, x2 + w2) - nx, max(y1 + h1, y2 + h2) - ny]
+        else:
+            merged.append(tuple(current))
+            current = [x2, y2, w2, h2]
+    merged.append(tuple(current))
+    return merged
+
+
+def benchmark_box_merge(sizes=(10, 50, 100, 200, 500), threshold=20, repeats=200):
+    """Время объединения фрагментов на кадр в зависимости от их числа"""
+    rng = np.random.default_rng(0)
+    results = []
+
+    for n in sizes:
+        # Фрагменты косяков: кучки мелких боксов вокруг случайных центров
+        centers = rng.uniform((0, 0), (640, 480), (max(n // 10, 1), 2))
+        pos = centers[rng.integers(0, len(centers), n)] + rng.normal(0, 25, (n, 2))
+        boxes = [(int(x), int(y), int(w), int(h)) for (x, y), (w, h)
+                 in zip(pos, rng.integers(5, 30, (n, 2)))]
+
+        row = {'boxes': n}
+        for name, func in (('sorted', _sorted_merge), ('union_find', merge_close_boxes)):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                merged = func(boxes, threshold)
+            row[f'{name}_ms'] = (time.perf_counter() - start) / repeats * 1000
+            row[f'{name}_out'] = len(merged)
+        results.append(row)
+
+        print(f"Боксов: {n:4d}  один проход: {row['sorted_ms']:7.3f} мс -> {row['sorted_out']:3d}  "
+              f"union-find: {row['union_find_ms']:7.3f} мс -> {row['union_find_out']:3d}")
+
+    return results
@@ -0,0 +1,26 @@
+import time
+
+from src.cache import ReplayCache
+from src.evaluation import load_manifest
+from src.tuning import tune
+
+
+def benchmark_replay_cache(manifest_path='data/manifest.json', cache_dir='data/cache/benchmark', workers=None):
+    """Подбор параметров трекера: холодный прогон (декодирование и MOG2) против повторного по кэшу"""
+    manifest = load_manifest(manifest_path)
+    space = {'min_hits': [5, 7, 10], 'max_distance': [200, 280], 'max_disappeared': [15, 30]}
+    # Холодный старт: пустой кэш
+    cache = ReplayCache(cache_dir)
+    cache.evict(0)
+    results = {}
+
+    for run in ('cold', 'warm'):
+        start = time.perf_counter()
+        report = tune(manifest, space, 'grid', workers=workers, cache_dir=cache_dir)
+        results[run] = time.perf_counter() - start
+        best = report['results'][0] if report['results'] else None
+        print(f"{'Холодный' if run == 'cold' else 'По кэшу '}: {results[run]:6.2f} сек"
+              + (f"  лучший MSE: {best['mse']:.2f}" if best else ''))
+
+    print(f"Размер кэша: {cache.size() / 2 ** 20:.1f} МиБ")
+    return results
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import time
+
+from src.benchmarks.frames import read_frames
+from src.checkpoint import Checkpointer, load_snapshot, save_snapshot
+from src.pipeline import FishDetectionPipeline
+
+
+def benchmark_checkpoint(video_path='data/videos/my_video-146.mkv', n_frames=1000, every_frames=(30, 300),
+                         **pipeline_params):
+    """Цена фоновых снимков состояния на кадр и время восстановления; счет после перезапуска против непрерывного"""
+    frames = read_frames(video_path, n_frames)
+    if not frames:
+        return {}
+    width = frames[0].shape[1]
+    path = os.path.join(tempfile.mkdtemp(), 'state.npz')
+    results = {}
+
+    pipeline = FishDetectionPipeline(frame_width=width, visualize=False, **pipeline_params)
+    start = time.perf_counter()
+    for frame in frames:
+        pipeline.process_frame(frame)
+    base_ms = (time.perf_counter() - start) * 1000 / len(frames)
+    results['none'] = base_ms
+    print(f"Без снимков:         {base_ms:7.3f} мс/кадр  счет: {pipeline.counter.total_count}")
+
+    for every in every_frames:
+        pipeline = FishDetectionPipeline(frame_width=width, visualize=False, **pipeline_params)
+        checkpointer = Checkpointer(pipeline, path, every).start()
+        start = time.perf_counter()
+        for frame in frames:
+            pipeline.process_frame(frame)
+            checkpointer.step()
+        frame_ms = (time.perf_counter() - start) * 1000 / len(frames)
+        checkpointer.stop(final=False)
+        s = checkpointer.stats()
+        results[every] = {'frame_ms': frame_ms, **s}
+        print(f"Снимок каждые {every:4d}: {frame_ms:7.3f} мс/кадр ({frame_ms - base_ms:+.3f}), "
+              f"копия {s['capture_ms']:.3f} мс, запись в фоне {s['write_ms']:.2f} мс, "
+              f"снимков {s['taken']}, пропущено {s['dropped']}")
+
+    # Перезапуск посередине: снимок, новый конвейер, восстановление
+    half = len(frames) // 2
+    continuous = FishDetectionPipeline(frame_width=width, visualize=False, **pipeline_params)
+    for frame in frames[:half]:
+        continuous.process_frame(frame)
+    save_snapshot(continuous.snapshot(), path)
+    for frame in frames[half:]:
+        continuous.process_frame(frame)
+
+    restarted = FishDetectionPipeline(frame_width=width, visualize=False, **pipeline_params)
+    start = time.perf_counter()
+    restarted.restore(load_snapshot(path))
+    results['restore_ms'] = (time.perf_counter() - start) * 1000
+    for frame in frames[half:]:
+        restarted.process_frame(frame)
+    results['size_bytes'] = os.path.getsize(path)
+    print(f"Восстановление: {results['restore_ms']:.2f} мс, снимок {results['size_bytes'] / 1024:.0f} КБ, "
+          f"счет {restarted.counter.total_count} (непрерывно {continuous.counter.total_count})")
+
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+    return results
@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from src.benchmarks.frames import read_frames
+from src.checkpoint import restore_pipeline, save_snapshot
+from src.evaluation import load_manifest
+from src.pipeline import FishDetectionPipeline
+
+
+def benchmark_startup(video_path='data/videos/my_video-146.mkv', config='data/manifest.json', restart_at=300,
+                      window=None, repeats=3):
+    """Холодный старт CLI и точность сразу после перезапуска: холодный MOG2 против снимка состояния"""
+    results = {'startup_ms': {}}
+    # Команды запускаются из корня проекта, откуда бы ни был вызван бенчмарк
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    main_py = os.path.join(root, 'main.py')
+    commands = {
+        'main.py --help': [sys.executable, main_py, '--help'],
+        'import src.pipeline': [sys.executable, '-c', 'import src.pipeline'],
+        'count, 1 кадр': [sys.executable, main_py, 'count', os.path.abspath(video_path),
+                          '--config', os.path.abspath(config), '--max-frames', '1'],
+    }
+    for name, command in commands.items():
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run(command, stdout=subprocess.DEVNULL, check=True, cwd=root)
+            best = min(best, time.perf_counter() - start)
+        results['startup_ms'][name] = best * 1000
+        print(f"{name:22s} {best * 1000:7.1f} мс")
+
+    # Детекции в первые window кадров после перезапуска против непрерывного прогона
+    params = load_manifest(config)['pipeline']
+    window = window or params.get('history', 100)
+    frames = read_frames(video_path, restart_at + window)
+    if len(frames) <= restart_at:
+        return results
+    width = frames[0].shape[1]
+    after = frames[restart_at:]
+
+    def detections(pipeline, frames):
+        return [len(pipeline.process_frame(frame)[3]) for frame in frames]
+
+    state_path = os.path.join(tempfile.mkdtemp(), 'state.npz')
+    continuous = FishDetectionPipeline(frame_width=width, visualize=False, **params)
+    detections(continuous, frames[:restart_at])
+    save_snapshot(continuous.snapshot(), state_path)
+    reference = detections(continuous, after)
+
+    for name in ('cold', 'warm'):
+        pipeline = FishDetectionPipeline(frame_width=width, visualize=False, **params)
+        if name == 'warm':
+            restore_pipeline(pipeline, state_path)
+        counts = detections(pipeline, after)
+        mismatched = sum(a != b for a, b in zip(counts, reference))
+        results[name] = mismatched
+        print(f"Перезапуск {name}: детекции расходятся с непрерывным прогоном в {mismatched}/{len(after)} кадрах")
+    os.remove(state_path)
+    os.rmdir(os.path.dirname(state_path))
+    return results
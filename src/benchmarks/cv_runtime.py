@@ -0,0 +1,57 @@
+import time
+
+import cv2
+
+from src.benchmarks.frames import read_frames
+from src.cv_runtime import tune_threads
+from src.detector import FishDetector
+from src.ingestion import GrayCapture
+
+
+def benchmark_operators(video_path='data/videos/my_video-146.mkv', n_frames=300, n_pipelines=1, **detector_params):
+    """Время каждого оператора (мс/кадр): прежняя цепочка вызовов против текущей.
+
+    До: BGR-декодирование, cvtColor, CLAHE, blur, MOG2, close, open, dilate.
+    После: серый кадр из декодера, CLAHE, blur, MOG2 и слитая морфология
+    детектора; число потоков OpenCV подбирается tune_threads.
+    """
+    clock = time.perf_counter_ns
+
+    def timed(stats, name, func, *args, **kwargs):
+        start = clock()
+        out = func(*args, **kwargs)
+        stats[name] = stats.get(name, 0) + clock() - start
+        return out
+
+    def run(cap, stats, legacy):
+        detector = FishDetector(**detector_params)
+        n = 0
+        while n < n_frames:
+            ret, frame = timed(stats, 'decode', cap.read)
+            if not ret:
+                break
+            if legacy:
+                gray = timed(stats, 'cvtColor', cv2.cvtColor, frame, cv2.COLOR_BGR2GRAY)
+                enhanced = timed(stats, 'clahe', detector.clahe.apply, gray)
+                blurred = timed(stats, 'blur', cv2.GaussianBlur, enhanced, (detector.g_blur, detector.g_blur), 0)
+                fg = timed(stats, 'mog2', detector.bg_subtractor.apply, blurred, learningRate=detector.learning_rate)
+                fg = timed(stats, 'close', cv2.morphologyEx, fg, cv2.MORPH_CLOSE, detector.kernel)
+                fg = timed(stats, 'open', cv2.morphologyEx, fg, cv2.MORPH_OPEN, detector.kernel)
+                timed(stats, 'dilate', cv2.dilate, fg, detector.kernel)
+            else:
+                processed, _ = timed(stats, 'preprocess', detector.preprocess, frame)
+                fg = timed(stats, 'mog2', detector.subtract, processed)
+                timed(stats, 'morphology', detector.clean_mask, fg)
+            n += 1
+        cap.release()
+        return {name: ns / 1e6 / max(1, n) for name, ns in stats.items()}
+
+    before = run(cv2.VideoCapture(video_path), {}, legacy=True)
+    threads, thread_ms = tune_threads(read_frames(video_path, min(n_frames, 100)), detector_params, n_pipelines)
+    after = run(GrayCapture(video_path), {}, legacy=False)
+
+    print("До:    " + "  ".join(f"{k} {v:.3f}" for k, v in before.items()) + f"  | всего {sum(before.values()):.3f} мс")
+    print("После: " + "  ".join(f"{k} {v:.3f}" for k, v in after.items()) + f"  | всего {sum(after.values()):.3f} мс")
+    print(f"Потоки OpenCV: {threads} (мс/кадр по кандидатам: "
+          + ", ".join(f"{t}: {ms:.3f}" for t, ms in thread_ms.items()) + ")")
+    return {'before': before, 'after': after, 'threads': threads, 'thread_ms': thread_ms}
@@ -0,0 +1,125 @@
+import os
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from src.benchmarks.frames import read_frames
+from src.detector import FishDetector
+from src.evaluation import evaluate_video, load_manifest
+
+
+def benchmark_scale(manifest_path='data/manifest.json',
+                    scales=(1.0, 0.75, 0.5, 0.35),
+                    roi_margins=(None, 200, 120)):
+    """Точность и FPS для масштабов и ширины полосы ROI - для выбора настроек камеры"""
+    manifest = load_manifest(manifest_path)
+    entries = [e for e in manifest['videos'] if os.path.exists(e['path'])]
+    results = []
+
+    for roi_margin in roi_margins:
+        for scale in scales:
+            params = dict(manifest['pipeline'], scale=scale, roi_margin=roi_margin)
+            runs = [evaluate_video(e['path'], e['count'], params, manifest['warmup_frames'])
+                    for e in entries]
+            row = {
+                'scale': scale,
+                'roi_margin': roi_margin,
+                'mae': float(np.mean([r['error'] for r in runs])) if runs else 0.0,
+                'avg_fps': float(np.mean([r['avg_fps'] for r in runs])) if runs else 0.0,
+                'predictions': [r['predicted'] for r in runs],
+            }
+            results.append(row)
+            print(f"ROI: {str(roi_margin):>5s}  масштаб: {scale:.2f}  "
+                  f"MAE: {row['mae']:.2f}  FPS: {row['avg_fps']:7.1f}  счет: {row['predictions']}")
+
+    return results
+
+
+def _unbuffered_detect(detector, frame):
+    """Прежний путь детекции: CLAHE на каждый кадр и новые массивы на каждом шаге (эталон)"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    clahe = cv2.createCLAHE(clipLimit=detector.clipLimit,
+                            tileGridSize=(detector.tileGridkernel, detector.tileGridkernel))
+    blurred = cv2.GaussianBlur(clahe.apply(gray), (detector.g_blur, detector.g_blur), 0)
+    fg_mask = detector.bg_subtractor.apply(blurred, learningRate=detector.learning_rate)
+    fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, detector.kernel)
+    fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, detector.kernel)
+    fg_mask = cv2.dilate(fg_mask, detector.kernel, iterations=1)
+    contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for contour in contours:
+        if detector.min_area < cv2.contourArea(contour) < detector.max_area:
+            cv2.boundingRect(contour)
+    return fg_mask
+
+
+def benchmark_detector_buffers(video_path='data/videos/my_video-146.mkv', n_frames=300, **detector_params):
+    """Время и временные аллокации на кадр: прежний путь vs кэшированный CLAHE и буферы dst"""
+    frames = read_frames(video_path, n_frames)
+    if not frames:
+        print(f"Нет кадров в {video_path}")
+        return {}
+
+    results = {}
+    for name in ('unbuffered', 'buffered'):
+        detector = FishDetector(reuse_buffers=name == 'buffered', **detector_params)
+        run = (lambda f: _unbuffered_detect(detector, f)) if name == 'unbuffered' else detector.detect
+        for frame in frames[:10]:
+            run(frame)
+
+        times, allocated = [], []
+        tracemalloc.start()
+        for frame in frames:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            start = time.perf_counter()
+            run(frame)
+            times.append(time.perf_counter() - start)
+            allocated.append(tracemalloc.get_traced_memory()[1] - before)
+        tracemalloc.stop()
+
+        results[name] = {'ms': float(np.mean(times) * 1000), 'alloc_kb': float(np.mean(allocated) / 1024)}
+        print(f"{name:10s}: {results[name]['ms']:.3f} мс/кадр, "
+              f"временные аллокации: {results[name]['alloc_kb']:.1f} КБ/кадр")
+
+    saved_ms = results['unbuffered']['ms'] - results['buffered']['ms']
+    saved_kb = results['unbuffered']['alloc_kb'] - results['buffered']['alloc_kb']
+    print(f"Экономия: {saved_ms:.3f} мс и {saved_kb:.1f} КБ на кадр")
+    return results
+
+
+def compare_detection_backends(video_path='data/videos/my_video-146.mkv', n_frames=1000, **detector_params):
+    """Сравнение backend 'contours' и 'components' на одних и тех же масках: совпадение боксов и время"""
+    frames = read_frames(video_path, n_frames)
+    source = FishDetector(**detector_params)
+    backends = {name: FishDetector(backend=name, **detector_params) for name in ('contours', 'components')}
+    times = {name: [] for name in backends}
+    same_frames, total_boxes, matched_boxes = 0, 0, 0
+
+    for frame in frames:
+        processed, _ = source.preprocess(frame)
+        mask = source.clean_mask(source.subtract(processed))
+
+        boxes = {}
+        for name, detector in backends.items():
+            start = time.perf_counter()
+            boxes[name], _ = detector.find_boxes(mask)
+            times[name].append(time.perf_counter() - start)
+
+        reference, candidate = set(boxes['contours']), set(boxes['components'])
+        same_frames += reference == candidate
+        total_boxes += len(reference)
+        matched_boxes += len(reference & candidate)
+
+    n = max(len(frames), 1)
+    result = {
+        'frames': len(frames),
+        'identical_frames': same_frames / n,
+        'box_recall': matched_boxes / total_boxes if total_boxes else 1.0,
+        **{f'{name}_ms': float(np.mean(t) * 1000) if t else 0.0 for name, t in times.items()},
+    }
+    print(f"Кадров: {result['frames']}, одинаковые боксы: {result['identical_frames'] * 100:.1f}% кадров, "
+          f"совпало боксов: {result['box_recall'] * 100:.1f}%")
+    print(f"find_boxes: contours {result['contours_ms']:.3f} мс, components {result['components_ms']:.3f} мс")
+    return result
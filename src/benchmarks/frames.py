@@ -0,0 +1,13 @@
+import cv2
+
+
+def read_frames(video_path, limit):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
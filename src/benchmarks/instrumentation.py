@@ -0,0 +1,29 @@
+import time
+
+from src.benchmarks.frames import read_frames
+from src.pipeline import FishDetectionPipeline
+
+
+def benchmark_instrumentation(video_path='data/videos/my_video-146.mkv', n_frames=500, repeats=3, **pipeline_params):
+    """Цена метрик: FPS конвейера с выключенными и включенными метриками и сводка этапов"""
+    frames = read_frames(video_path, n_frames)
+    if not frames:
+        return {}
+    width = frames[0].shape[1]
+    results = {}
+
+    for enabled in (False, True):
+        best = float('inf')
+        for _ in range(repeats):
+            pipeline = FishDetectionPipeline(frame_width=width, visualize=False, metrics=enabled, **pipeline_params)
+            start = time.perf_counter()
+            for frame in frames:
+                pipeline.process_frame(frame)
+            best = min(best, time.perf_counter() - start)
+        results['enabled' if enabled else 'disabled'] = len(frames) / best
+        print(f"Метрики {'вкл ' if enabled else 'выкл'}: {len(frames) / best:7.1f} FPS")
+
+    for stage, s in pipeline.metrics.snapshot()['stages_ms'].items():
+        print(f"    {stage:11s} mean {s['mean']:7.3f}  p95 {s['p95']:7.3f}  max {s['max']:7.3f} мс")
+    results['snapshot'] = pipeline.metrics.snapshot()
+    return results
@@ -0,0 +1,54 @@
+import os
+import time
+
+import cv2
+
+from src.evaluation import load_manifest
+from src.pipeline import FishDetectionPipeline
+
+
+def benchmark_motion_gate(manifest_path='data/manifest.json', background_every=(1, 5, 10)):
+    """Доля пропущенных кадров, FPS и расхождение счета с полным режимом на видео из манифеста"""
+    manifest = load_manifest(manifest_path)
+    entries = [e for e in manifest['videos'] if os.path.exists(e['path'])]
+    results = []
+
+    for entry in entries:
+        cap = cv2.VideoCapture(entry['path'])
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        frames = []
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+
+        variants = [('полный', dict())] + [(f'гейт/{n}', dict(motion_gate=True, background_every=n))
+                                            for n in background_every]
+        baseline = None
+        for name, extra in variants:
+            pipeline = FishDetectionPipeline(frame_width=width, visualize=False,
+                                             **{**manifest['pipeline'], **extra})
+            start = time.perf_counter()
+            for frame in frames:
+                _, total, _, _ = pipeline.process_frame(frame)
+            elapsed = time.perf_counter() - start
+            if baseline is None:
+                baseline = total
+
+            gate = pipeline.motion_gate
+            row = {
+                'video': os.path.basename(entry['path']),
+                'variant': name,
+                'count': total,
+                'expected': entry['count'],
+                'drift': total - baseline,
+                'skip_ratio': gate.skip_ratio if gate else 0.0,
+                'fps': len(frames) / elapsed if elapsed > 0 else 0.0,
+            }
+            results.append(row)
+            print(f"{row['video']:20s} {name:8s} счет: {total:3d} (ожидается {entry['count']:3d}, "
+                  f"расхождение {row['drift']:+d})  пропущено: {row['skip_ratio']:.1%}  FPS: {row['fps']:7.1f}")
+
+    return results
@@ -0,0 +1,53 @@
+import os
+import time
+
+import numpy as np
+
+from src.cache import ReplayCache
+from src.evaluation import load_manifest
+from src.pipeline import FishDetectionPipeline
+
+
+def compare_motion_models(manifest_path='data/manifest.json', cache_dir='data/cache', variants=None):
+    """Модель движения трекера по боксам из кэша: MAE, FPS трекера, кандидаты на кадр, создано треков"""
+    manifest = load_manifest(manifest_path)
+    entries = [e for e in manifest['videos'] if os.path.exists(e['path'])]
+    cache = ReplayCache(cache_dir)
+    logs = [(e, cache.detections(e['path'], manifest['pipeline']), cache.frames(e['path']).frame_width)
+            for e in entries]
+    variants = variants or {
+        'без модели': {'motion_model': 'none'},
+        'Калман, 80': {'motion_model': 'kalman', 'gate_radius': 80},
+        'Калман, 40': {'motion_model': 'kalman', 'gate_radius': 40},
+    }
+    results = []
+
+    for name, extra in variants.items():
+        params = dict(manifest['pipeline'], metrics=True, **extra)
+        errors, fps, candidates, created = [], [], [], 0
+        for entry, log, width in logs:
+            pipeline = FishDetectionPipeline(frame_width=width, visualize=False, **params)
+            tracker, counter = pipeline.tracker, pipeline.counter
+            total = 0
+            start = time.perf_counter()
+            for bboxes in log:
+                total = counter.update(tracker.update(bboxes))
+            elapsed = time.perf_counter() - start
+            errors.append(abs(total - entry['count']))
+            fps.append(len(log) / elapsed if elapsed > 0 else 0.0)
+            hist = pipeline.metrics.values.get('candidates')
+            candidates.append(hist.sum / hist.count if hist and hist.count else 0.0)
+            created += tracker.next_id
+
+        row = {
+            'variant': name,
+            'mae': float(np.mean(errors)) if errors else 0.0,
+            'tracker_fps': float(np.mean(fps)) if fps else 0.0,
+            'candidates_per_frame': float(np.mean(candidates)) if candidates else 0.0,
+            'tracks_created': created,
+        }
+        results.append(row)
+        print(f"{name:12s} MAE: {row['mae']:6.2f}  FPS трекера: {row['tracker_fps']:8.1f}  "
+              f"кандидатов на кадр: {row['candidates_per_frame']:6.2f}  создано треков: {created}")
+
+    return results
@@ -0,0 +1,34 @@
+import time
+
+import numpy as np
+
+from src.benchmarks.frames import read_frames
+from src.pipeline import FishDetectionPipeline
+
+
+def benchmark_batch_api(video_path='data/videos/my_video-146.mkv', n_frames=500, batch_sizes=(1, 8, 32, 128),
+                        **pipeline_params):
+    """process_frame в цикле против process_frames по пачкам (кадры уже в памяти)"""
+    frames = read_frames(video_path, n_frames)
+    if not frames:
+        return {}
+    stack = np.stack(frames)
+    width = stack.shape[2]
+    results = {}
+
+    pipeline = FishDetectionPipeline(frame_width=width, visualize=False, **pipeline_params)
+    start = time.perf_counter()
+    for frame in frames:
+        pipeline.process_frame(frame)
+    results['process_frame'] = len(frames) / (time.perf_counter() - start)
+    print(f"process_frame:          {results['process_frame']:7.1f} FPS  счет: {pipeline.counter.total_count}")
+
+    for batch_size in batch_sizes:
+        pipeline = FishDetectionPipeline(frame_width=width, visualize=False, **pipeline_params)
+        start = time.perf_counter()
+        result = pipeline.process_frames(stack, batch_size=batch_size)
+        results[batch_size] = len(frames) / (time.perf_counter() - start)
+        total = int(result.totals[-1]) if len(result.totals) else 0
+        print(f"process_frames ({batch_size:4d}):  {results[batch_size]:7.1f} FPS  счет: {total}")
+
+    return results
@@ -0,0 +1,39 @@
+import os
+import time
+
+from src.benchmarks.frames import read_frames
+from src.pipeline import FishDetectionPipeline
+from src.renderer import Renderer
+
+
+def benchmark_renderer(video_path='data/videos/my_video-146.mkv', n_frames=500, max_fps=20,
+                       output_path='data/cache/renderer_benchmark.mp4', **pipeline_params):
+    """FPS обработки: отрисовка каждого кадра в цикле, Renderer в отдельном потоке, без отрисовки"""
+    frames = read_frames(video_path, n_frames)
+    if not frames:
+        return {}
+    width = frames[0].shape[1]
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    results = {}
+
+    for name in ('inline', 'renderer', 'off'):
+        pipeline = FishDetectionPipeline(frame_width=width, visualize=name == 'inline', **pipeline_params)
+        renderer = None
+        if name == 'renderer':
+            renderer = Renderer(max_fps=max_fps, show=False, output_path=output_path)
+            pipeline.attach_renderer(renderer)
+            renderer.start()
+        start = time.perf_counter()
+        for frame in frames:
+            pipeline.process_frame(frame)
+        results[name] = len(frames) / (time.perf_counter() - start)
+        line = f"{name:9s} {results[name]:7.1f} FPS  счет: {pipeline.counter.total_count}"
+        if renderer is not None:
+            renderer.stop()
+            s = renderer.stats()
+            line += f"  снимков: {s['submitted']}, отрисовано: {s['rendered']}, сброшено: {s['dropped']}"
+        print(line)
+
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    return results
@@ -0,0 +1,30 @@
+import os
+
+from src.evaluation import load_manifest
+from src.sharding import process_shard, process_sharded
+
+
+def benchmark_sharding(manifest_path='data/manifest.json', workers=(1, 2, 4), warmup_frames=300, guard_frames=60,
+                       tolerance=1):
+    """Шардированный прогон длинных видео против последовательного: счет (в пределах tolerance) и ускорение"""
+    manifest = load_manifest(manifest_path)
+    params = manifest['pipeline']
+    results = {}
+    for entry in manifest['videos']:
+        if not os.path.exists(entry['path']):
+            continue
+        sequential = process_shard(entry['path'], 0, None, params)
+        seq_total, seq_fps = len(sequential['events']), sequential['frames'] / sequential['sec']
+        print(f"{entry['path']}: последовательно {seq_total} рыб, {seq_fps:.1f} FPS")
+        rows = {}
+        for n in workers:
+            r = process_sharded(entry['path'], params, workers=n, warmup_frames=warmup_frames,
+                                guard_frames=guard_frames)
+            diff = r['total'] - seq_total
+            ok = abs(diff) <= tolerance
+            rows[n] = {'total': r['total'], 'diff': diff, 'fps': r['fps'], 'speedup': r['fps'] / seq_fps,
+                       'overhead': r['overhead'], 'ok': ok}
+            print(f"    процессов {n:2d}: {r['total']} рыб ({diff:+d}, {'OK' if ok else 'РАСХОЖДЕНИЕ'}), "
+                  f"{r['fps']:7.1f} FPS, ускорение x{r['fps'] / seq_fps:.2f}, накладные {r['overhead']:.1%}")
+        results[entry['path']] = {'sequential': seq_total, 'sharded': rows}
+    return results
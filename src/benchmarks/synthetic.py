@@ -0,0 +1,101 @@
+import time
+import tracemalloc
+
+import numpy as np
+
+from src.box_merge import merge_close_boxes
+from src.evaluation import load_manifest
+from src.pipeline import FishDetectionPipeline
+from src.synthetic import SyntheticScene
+
+
+def _state_kb(*components):
+    return sum(a.nbytes for c in components for a in c.state().values()) / 1024
+
+
+def benchmark_density(densities=(1, 5, 10, 25, 50, 100, 200), n_frames=300, warmup_frames=60,
+                      width=640, height=480, occlusion=0.2, seed=0, alloc_frames=30,
+                      manifest_path='data/manifest.json', **pipeline_params):
+    """FPS, память и ошибка счета в зависимости от числа рыб в кадре (синтетическая сцена).
+
+    Конвейер получает отрисованные кадры. Параллельно трекер и счетчик с теми
+    же параметрами получают эталонные боксы сцены (oracle), а merge_close_boxes -
+    те же боксы: так видно, где перестают масштабироваться сами FishTracker и
+    слияние боксов, независимо от того, сколько рыб различил MOG2.
+    Ошибка - счет минус эталон после прогрева: и то и другое - по пересечениям,
+    видимым в кадрах с номера warmup_frames (счет берется до обработки этого кадра).
+    """
+    params = dict(load_manifest(manifest_path)['pipeline'], **pipeline_params)
+    results = []
+
+    for n_fish in densities:
+        scene = SyntheticScene(width, height, n_fish, occlusion=occlusion,
+                               count_line_ratio=params.get('count_line_ratio', 0.85), seed=seed)
+        pipeline = FishDetectionPipeline(frame_width=width, visualize=False, metrics=True, **params)
+        oracle = FishDetectionPipeline(frame_width=width, visualize=False, **params)
+        threshold = pipeline.detector.work_merge_threshold
+
+        frame_sec = track_sec = merge_sec = 0.0
+        base = oracle_base = 0
+        allocated = []
+        for i in range(warmup_frames + n_frames + alloc_frames):
+            # Как в SyntheticScene.frames: шаг перед кадром, после последнего кадра шага нет
+            if i:
+                scene.step()
+            frame = scene.render()
+            boxes = scene.boxes()
+            if i == warmup_frames:
+                pipeline.metrics.reset()
+                base, oracle_base = pipeline.counter.total_count, oracle.counter.total_count
+            if i == warmup_frames + n_frames:
+                tracemalloc.start()
+
+            if i < warmup_frames + n_frames:
+                start = time.perf_counter()
+                pipeline.process_frame(frame)
+                t = time.perf_counter()
+                frame_sec += t - start
+            else:
+                # Последние кадры - временные аллокации конвейера на кадр (под tracemalloc медленнее)
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+                pipeline.process_frame(frame)
+                allocated.append(tracemalloc.get_traced_memory()[1] - before)
+                t = time.perf_counter()
+            merge_close_boxes(boxes, threshold)
+            merged = time.perf_counter()
+            oracle.counter.update(oracle.tracker.update(boxes))
+            if warmup_frames <= i < warmup_frames + n_frames:
+                merge_sec += merged - t
+                track_sec += time.perf_counter() - merged
+        tracemalloc.stop()
+
+        direction = params.get('direction', 'right')
+        truth = scene.truth(warmup_frames)[1]['total' if direction == 'both' else direction]
+        stats = pipeline.metrics.snapshot()
+        stages = {name: h['mean'] for name, h in stats['stages_ms'].items()}
+        row = {
+            'fish': n_fish,
+            'fps': n_frames / frame_sec,
+            'stages_ms': stages,
+            'raw_boxes': stats['values']['raw_boxes']['mean'],
+            'detections': stats['values']['detections']['mean'],
+            'oracle_track_ms': track_sec / n_frames * 1000,
+            'oracle_merge_ms': merge_sec / n_frames * 1000,
+            'state_kb': _state_kb(oracle.tracker, oracle.counter),
+            'alloc_kb': float(np.mean(allocated) / 1024) if allocated else 0.0,
+            'truth': truth,
+            'predicted': pipeline.counter.total_count - base,
+            'oracle_predicted': oracle.counter.total_count - oracle_base,
+        }
+        row['error'] = row['predicted'] - truth
+        results.append(row)
+
+        print(f"Рыб {n_fish:3d}: {row['fps']:6.1f} FPS, MOG2 {stages.get('mog2', 0):.2f} мс, "
+              f"merge {stages.get('merge', 0):.3f} мс, трекинг {stages.get('track', 0):.3f} мс, "
+              f"боксов {row['raw_boxes']:.1f} -> {row['detections']:.1f}, "
+              f"счет {row['predicted']} из {truth} (ошибка {row['error']:+d})")
+        print(f"         эталонные боксы: трекинг {row['oracle_track_ms']:.3f} мс, "
+              f"merge {row['oracle_merge_ms']:.3f} мс, счет {row['oracle_predicted']}, "
+              f"состояние {row['state_kb']:.0f} КБ, аллокации {row['alloc_kb']:.1f} КБ/кадр")
+    return results
@@ -0,0 +1,28 @@
+import time
+import tracemalloc
+
+from src.benchmarks.association import moving_boxes
+from src.counter import FishCounter
+from src.tracker import FishTracker
+
+
+def benchmark_track_memory(n_objects=50, n_frames=20000, report_every=5000):
+    """Память трекера и счетчика на длинном потоке: после прогрева должна оставаться постоянной"""
+    frames = moving_boxes(n_objects, 500)
+    tracker = FishTracker(max_disappeared=15, max_distance=280, min_hits=7)
+    counter = FishCounter(count_line_x=544)
+    samples = []
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(n_frames):
+        tracks = tracker.update(frames[i % len(frames)])
+        counter.update(tracks)
+        if (i + 1) % report_every == 0:
+            current, peak = tracemalloc.get_traced_memory()
+            samples.append({'frame': i + 1, 'current_kb': current / 1024, 'peak_kb': peak / 1024})
+            print(f"Кадр {i + 1:7d}: текущая память {current / 1024:8.1f} КБ, пик {peak / 1024:8.1f} КБ")
+    tracemalloc.stop()
+
+    print(f"Среднее время трекинга: {(time.perf_counter() - start) / n_frames * 1000:.3f} мс/кадр")
+    return samples
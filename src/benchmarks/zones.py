@@ -0,0 +1,46 @@
+import time
+
+from src.benchmarks.frames import read_frames
+from src.counter import FishCounter
+from src.pipeline import FishDetectionPipeline
+from src.tracker import FishTracker
+
+
+def benchmark_zones(video_path='data/videos/my_video-146.mkv', n_frames=500, zone_counts=(1, 4, 16, 64),
+                    **pipeline_params):
+    """Время FishCounter.update на кадр в зависимости от числа зон (наклонные линии и многоугольники)"""
+    frames = read_frames(video_path, n_frames)
+    if not frames:
+        return {}
+    height, width = frames[0].shape[:2]
+    pipeline = FishDetectionPipeline(frame_width=width, visualize=False, **pipeline_params)
+    # Детекция и трекинг один раз: счетчики разных конфигураций получают те же треки
+    tracker_states = []
+    for frame in frames:
+        bboxes, _, _, _ = pipeline.detector.detect(frame)
+        pipeline.tracker.update(bboxes)
+        tracker_states.append(pipeline.tracker.state())
+
+    results = {}
+    for n in zone_counts:
+        step = width / (n + 1)
+        zones = []
+        for i in range(n):
+            x = int(step * (i + 1))
+            if i % 2:
+                polygon = [[x - 10, 0], [x + 10, 0], [x + 10, height], [x - 10, height]]
+                zones.append({'name': f'poly{i}', 'polygon': polygon, 'direction': 'both'})
+            else:
+                zones.append({'name': f'line{i}', 'line': [[x, 0], [x + 20, height]], 'direction': 'both'})
+        counter = FishCounter(count_line_x=0, zones=zones)
+        tracker = FishTracker()
+        elapsed = 0.0
+        for state in tracker_states:
+            tracker.load_state(state)
+            tracks = tracker.active.refresh()
+            start = time.perf_counter()
+            counter.update(tracks)
+            elapsed += time.perf_counter() - start
+        results[n] = elapsed / len(tracker_states) * 1e6
+        print(f"Зон {n:3d}: {results[n]:7.1f} мкс/кадр, пересечений {counter.total_count}")
+    return results
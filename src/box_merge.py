@@ -0,0 +1,77 @@
+import numpy as np
+
+
+def _close_pairs(boxes, threshold):
+    """Пары индексов (i, j) боксов, которые пересекаются или ближе threshold.
+
+    Sweep-line по левому краю: для бокса i кандидаты - только боксы, чей
+    левый край левее его правого края плюс threshold. Расстояние между
+    боксами - максимум из горизонтального и вертикального зазоров.
+    """
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+
+    order = np.argsort(x1, kind='stable')
+    xs = x1[order]
+    end = np.searchsorted(xs, x2[order] + max(threshold, 0), side='left')
+    start = np.arange(1, len(boxes) + 1)
+    counts = np.maximum(end - start, 0)
+    if not counts.any():
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    # Все пары (i, j) окна развертываем в плоские массивы без цикла
+    left = np.repeat(np.arange(len(boxes)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    right = np.repeat(start, counts) + offsets
+    i, j = order[left], order[right]
+
+    overlap_x = np.minimum(x2[i], x2[j]) - np.maximum(x1[i], x1[j])
+    overlap_y = np.minimum(y2[i], y2[j]) - np.maximum(y1[i], y1[j])
+    intersects = (overlap_x > 0) & (overlap_y > 0)
+    gap = np.maximum(np.maximum(-overlap_x, 0), np.maximum(-overlap_y, 0))
+
+    close = intersects | (gap < threshold)
+    return i[close], j[close]
+
+
+def _components(n, i, j):
+    """Union-find по парам: метка компоненты = минимальный индекс (векторизованное сжатие путей)"""
+    labels = np.arange(n)
+    while True:
+        previous = labels.copy()
+        np.minimum.at(labels, i, labels[j])
+        np.minimum.at(labels, j, labels[i])
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def merge_close_boxes(boxes, threshold):
+    """Объединяет все боксы, связанные цепочками близости (транзитивно).
+
+    Объединенный бокс снова проверяется на близость к остальным, пока
+    объединения не прекратятся. Результат отсортирован по x.
+    """
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+
+    while len(boxes) > 1:
+        i, j = _close_pairs(boxes, threshold)
+        if not len(i):
+            break
+
+        labels = _components(len(boxes), i, j)
+        _, groups = np.unique(labels, return_inverse=True)
+        n_groups = groups.max() + 1
+
+        x1 = np.full(n_groups, np.iinfo(np.int64).max)
+        y1 = x1.copy()
+        x2 = np.full(n_groups, np.iinfo(np.int64).min)
+        y2 = x2.copy()
+        np.minimum.at(x1, groups, boxes[:, 0])
+        np.minimum.at(y1, groups, boxes[:, 1])
+        np.maximum.at(x2, groups, boxes[:, 0] + boxes[:, 2])
+        np.maximum.at(y2, groups, boxes[:, 1] + boxes[:, 3])
+        boxes = np.column_stack([x1, y1, x2 - x1, y2 - y1])
+
+    boxes = boxes[np.argsort(boxes[:, 0], kind='stable')]
+    return [tuple(b) for b in boxes.tolist()]
@@ -0,0 +1,315 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+from src.pipeline import FishDetectionPipeline
+
+# Параметры, которые не влияют на детекцию: для них переиспользуются боксы
+# уже посчитанного детектора (count_line_ratio и zones влияют на детекцию только через ROI)
+TRACKER_PARAMS = ('max_disappeared', 'max_distance', 'iou_threshold', 'min_hits', 'assignment',
+                  'motion_model', 'gate_radius', 'direction', 'count_line_ratio', 'zones', 'metrics',
+                  'reuse_buffers')
+
+# Параметры пропуска кадров (src/motion_gate.py): кэш хранит боксы детектора на каждом кадре
+GATE_PARAMS = ('motion_gate', 'motion_ratio', 'background_every')
+
+CACHE_FORMAT = 2
+
+# Проверка записи при чтении: 'stat' - размер и mtime файлов, 'full' - еще и SHA-1, 'none' - без проверки
+VERIFY_MODES = ('stat', 'full', 'none')
+
+# SHA-1 видео по (путь, размер, mtime) - общий для всех экземпляров кэша в процессе
+_VIDEO_HASHES = {}
+
+
+def _check_ungated(params):
+    if params.get('motion_gate'):
+        raise ValueError("Кэш детекций не воспроизводит motion_gate: боксы считаются на каждом кадре")
+
+
+def detection_key(params):
+    """Ключ кэша детекций: все параметры, кроме параметров трекера, счетчика и пропуска кадров.
+
+    Кэш воспроизводит детекцию без пропуска кадров, поэтому конфигурация
+    с motion_gate=True отклоняется: ее прогон по кэшу разошелся бы с живым.
+    """
+    _check_ungated(params)
+    key = {k: v for k, v in params.items() if k not in TRACKER_PARAMS and k not in GATE_PARAMS}
+    if params.get('roi_margin') is not None:
+        key['count_line_ratio'] = params.get('count_line_ratio', 0.85)
+        key['zones'] = params.get('zones')
+    return json.dumps(key, sort_keys=True)
+
+
+def file_sha1(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FrameShards:
+    """Серые кадры видео из .npy-шардов, открытых через mmap (без копирования)"""
+
+    def __init__(self, directory, meta):
+        self.shards = [np.load(os.path.join(directory, s['file']), mmap_mode='r') for s in meta['shards']]
+        self.n_frames = meta['frames']
+        self.frame_shape = tuple(meta['shape'])
+
+    @property
+    def frame_width(self):
+        return self.frame_shape[1]
+
+    def __len__(self):
+        return self.n_frames
+
+    def __iter__(self):
+        for shard in self.shards:
+            yield from shard
+
+
+class DetectionLog:
+    """Боксы детектора по кадрам в колоночном виде: boxes (M, 4) и offsets (кадров + 1).
+
+    log[i] - массив (k, 4) боксов кадра i, срез mmap без копирования;
+    FishTracker.update принимает его так же, как список кортежей.
+    """
+
+    def __init__(self, boxes, offsets, sec_per_frame=0.0):
+        self.boxes = boxes
+        self.offsets = offsets
+        self.sec_per_frame = sec_per_frame
+
+    @classmethod
+    def from_lists(cls, detections, sec_per_frame=0.0):
+        counts = np.fromiter((len(d) for d in detections), dtype=np.int64, count=len(detections))
+        offsets = np.zeros(len(detections) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        boxes = np.array([b for d in detections for b in d], dtype=np.int64).reshape(-1, 4)
+        return cls(boxes, offsets, sec_per_frame)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.boxes[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class ReplayCache:
+    """Кэш на диске: декодированные кадры и боксы детектора для повторных прогонов.
+
+    Ключи - SHA-1 содержимого видео и конфигурации детектора (detection_key).
+    Запись - каталог с .npy и meta.json, где лежат SHA-1, размер и mtime
+    файлов; поврежденная запись удаляется и пересчитывается. SHA-1
+    считается один раз при записи, при чтении по умолчанию (verify='stat')
+    сверяются только размер и mtime, verify='full' перечитывает файлы
+    целиком. Каталог пишется во временный и переименовывается целиком.
+    Размер ограничен max_bytes: вытесняются давно не читанные записи (время
+    доступа - mtime meta.json), проверка - после каждой записи.
+    max_bytes=None - без вытеснения (для процессов пула, вытесняет владелец).
+    """
+
+    def __init__(self, root='data/cache', max_bytes=2 * 1024 ** 3, shard_frames=256, verify: str = 'stat'):
+        if verify not in VERIFY_MODES:
+            raise ValueError(f"Неизвестный режим проверки кэша: {verify}")
+        self.root = root
+        self.max_bytes = max_bytes
+        self.shard_frames = shard_frames
+        self.verify = verify
+        for kind in ('frames', 'detections'):
+            os.makedirs(os.path.join(root, kind), exist_ok=True)
+
+    def video_hash(self, path):
+        """SHA-1 файла видео; пересчитывается только при смене размера или mtime"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if key not in _VIDEO_HASHES:
+            _VIDEO_HASHES[key] = file_sha1(path)
+        return _VIDEO_HASHES[key]
+
+    def _load_meta(self, directory):
+        """meta.json записи или None, если записи нет или она повреждена"""
+        meta_path = os.path.join(directory, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('format') != CACHE_FORMAT:
+                raise ValueError(f"формат {meta.get('format')}")
+            if self.verify != 'none':
+                for name, info in meta['files'].items():
+                    path = os.path.join(directory, name)
+                    stat = os.stat(path)
+                    if stat.st_size != info['size'] or stat.st_mtime_ns != info['mtime_ns']:
+                        raise ValueError(f"размер или время изменения {name}")
+                    if self.verify == 'full' and file_sha1(path) != info['sha1']:
+                        raise ValueError(f"контрольная сумма {name}")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Кэш: запись {directory} повреждена ({e}), пересчет")
+            shutil.rmtree(directory, ignore_errors=True)
+            return None
+
+        os.utime(meta_path)
+        return meta
+
+    def _commit(self, tmp_dir, directory, meta):
+        meta['format'] = CACHE_FORMAT
+        meta['files'] = {}
+        for name in os.listdir(tmp_dir):
+            path = os.path.join(tmp_dir, name)
+            stat = os.stat(path)
+            meta['files'][name] = {'sha1': file_sha1(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False)
+        try:
+            os.rename(tmp_dir, directory)
+        except OSError:
+            # Ту же запись параллельно записал другой процесс: временный каталог удалит _staging
+            pass
+        if self.max_bytes is not None:
+            # Только что записанную запись сейчас прочитают - ее не вытесняем
+            self.evict(keep=(directory,))
+
+    @contextmanager
+    def _staging(self, kind):
+        """Временный каталог записи; удаляется, если запись прервалась до _commit"""
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp_', dir=os.path.join(self.root, kind))
+        try:
+            yield tmp_dir
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def frames(self, video_path):
+        """Серые кадры видео; при промахе видео декодируется и записывается шардами"""
+        directory = os.path.join(self.root, 'frames', self.video_hash(video_path))
+        meta = self._load_meta(directory)
+        if meta is None:
+            meta = self._decode(video_path, directory)
+        return FrameShards(directory, meta)
+
+    def _decode(self, video_path, directory):
+        with self._staging('frames') as tmp_dir:
+            cap = cv2.VideoCapture(video_path)
+            shards, batch, shape, n_frames = [], [], (0, 0), 0
+
+            def flush():
+                name = f'shard_{len(shards):05d}.npy'
+                np.save(os.path.join(tmp_dir, name), np.stack(batch))
+                shards.append({'file': name, 'frames': len(batch)})
+                batch.clear()
+
+            try:
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    # Серый кадр как после cvtColor в детекторе: детекция по кэшу совпадает с обычной
+                    batch.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+                    shape = batch[-1].shape
+                    n_frames += 1
+                    if len(batch) == self.shard_frames:
+                        flush()
+                if batch:
+                    flush()
+            finally:
+                cap.release()
+
+            meta = {'video': video_path, 'frames': n_frames, 'shape': list(shape), 'shards': shards}
+            self._commit(tmp_dir, directory, meta)
+        return meta
+
+    def _detections_dir(self, video_path, params):
+        config = hashlib.sha1(detection_key(params).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.root, 'detections', f'{self.video_hash(video_path)}_{config}')
+
+    def detections(self, video_path, params, compute: bool = True):
+        """Боксы детектора по кадрам (DetectionLog); при промахе считаются по кэшу кадров.
+
+        compute=False - None при промахе вместо пересчета.
+        """
+        directory = self._detections_dir(video_path, params)
+        meta = self._load_meta(directory)
+        if meta is None:
+            if not compute:
+                return None
+            meta = self._detect(video_path, params, directory)
+        return DetectionLog(np.load(os.path.join(directory, 'boxes.npy'), mmap_mode='r'),
+                            np.load(os.path.join(directory, 'offsets.npy'), mmap_mode='r'),
+                            meta['sec_per_frame'])
+
+    def _detect(self, video_path, params, directory):
+        frames = self.frames(video_path)
+        pipeline = FishDetectionPipeline(frame_width=frames.frame_width, visualize=False, **params)
+        detector = pipeline.detector
+        detections = []
+        start = time.perf_counter()
+        for frame in frames:
+            bboxes, _, _, _ = detector.detect(frame)
+            detections.append(bboxes)
+        log = DetectionLog.from_lists(detections, (time.perf_counter() - start) / max(1, len(frames)))
+
+        meta = {'video': video_path, 'detector': json.loads(detection_key(params)),
+                'frames': len(log), 'sec_per_frame': log.sec_per_frame}
+        with self._staging('detections') as tmp_dir:
+            np.save(os.path.join(tmp_dir, 'boxes.npy'), log.boxes)
+            np.save(os.path.join(tmp_dir, 'offsets.npy'), log.offsets)
+            self._commit(tmp_dir, directory, meta)
+        return meta
+
+    def entries(self):
+        """Записи кэша: (каталог, размер в байтах, время последнего доступа)"""
+        result = []
+        for kind in ('frames', 'detections'):
+            base = os.path.join(self.root, kind)
+            for name in os.listdir(base):
+                directory = os.path.join(base, name)
+                meta_path = os.path.join(directory, 'meta.json')
+                if name.startswith('.tmp_') or not os.path.exists(meta_path):
+                    continue
+                size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+                result.append((directory, size, os.path.getmtime(meta_path)))
+        return result
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_bytes=None, keep=()):
+        """Удаляет давно не читанные записи (кроме каталогов keep), пока кэш больше max_bytes"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for directory, size, _ in entries:
+            if total <= max_bytes:
+                break
+            if directory in keep:
+                continue
+            shutil.rmtree(directory, ignore_errors=True)
+            total -= size
+            removed.append(directory)
+        return removed
+
+
+def replay(detections, frame_width, pipeline_params):
+    """Прогон трекера и счетчика по кэшированным боксам: (счет, сек на кадр)"""
+    _check_ungated(pipeline_params)
+    pipeline = FishDetectionPipeline(frame_width=frame_width, visualize=False, **pipeline_params)
+    tracker, counter = pipeline.tracker, pipeline.counter
+    total = 0
+    start = time.perf_counter()
+    for bboxes in detections:
+        total = counter.update(tracker.update(bboxes))
+    return int(total), (time.perf_counter() - start) / max(1, len(detections))
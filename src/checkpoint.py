@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+SNAPSHOT_FORMAT = 1
+
+
+def save_snapshot(state, path):
+    """Снимок FishDetectionPipeline.snapshot() в несжатый .npz (через временный файл)"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, format=np.int64(SNAPSHOT_FORMAT), **state)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path):
+    with np.load(path) as data:
+        state = {name: data[name] for name in data.files}
+    if int(state.pop('format', -1)) != SNAPSHOT_FORMAT:
+        raise ValueError(f"Неподдерживаемый формат снимка {path}")
+    return state
+
+
+def restore_pipeline(pipeline, path):
+    """Теплый перезапуск из снимка; False (холодный старт), если снимка нет или он не подходит"""
+    if not os.path.exists(path):
+        return False
+    try:
+        pipeline.restore(load_snapshot(path))
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Снимок {path} не восстановлен ({e}), холодный старт")
+        return False
+    return True
+
+
+class Checkpointer:
+    """Периодические снимки состояния конвейера с записью в отдельном потоке.
+
+    step() вызывается после каждого кадра: раз в every_frames кадров в
+    потоке обработки снимаются только копии массивов (snapshot()), запись
+    на диск идет в фоне. Если прошлая запись еще не закончилась, ожидающий
+    снимок заменяется новым. stop() дописывает последнее состояние.
+    """
+
+    def __init__(self, pipeline, path, every_frames: int = 300):
+        self.pipeline = pipeline
+        self.path = path
+        self.every_frames = max(1, every_frames)
+        self.last_frame = pipeline.frame_count
+
+        self.cond = threading.Condition()
+        self.pending = None
+        self.running = False
+        self.thread = None
+        self.taken = 0
+        self.written = 0
+        self.dropped = 0
+        self.capture_ns = 0
+        self.write_ns = 0
+
+    def step(self):
+        if self.pipeline.frame_count - self.last_frame >= self.every_frames:
+            self.checkpoint()
+
+    def checkpoint(self):
+        start = time.perf_counter_ns()
+        state = self.pipeline.snapshot()
+        self.capture_ns += time.perf_counter_ns() - start
+        self.last_frame = self.pipeline.frame_count
+        with self.cond:
+            if self.pending is not None:
+                self.dropped += 1
+            self.pending = state
+            self.taken += 1
+            self.cond.notify()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='checkpointer', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, final: bool = True):
+        if final:
+            self.checkpoint()
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.pending is None and self.running:
+                    self.cond.wait()
+                state, self.pending = self.pending, None
+                if state is None:
+                    return
+            start = time.perf_counter_ns()
+            save_snapshot(state, self.path)
+            self.write_ns += time.perf_counter_ns() - start
+            self.written += 1
+
+    def stats(self):
+        return {
+            'taken': self.taken,
+            'written': self.written,
+            'dropped': self.dropped,
+            'capture_ms': self.capture_ns / 1e6 / self.taken if self.taken else 0.0,
+            'write_ms': self.write_ns / 1e6 / self.written if self.written else 0.0,
+        }
@@ -0,0 +1,129 @@
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+# Команды, которые целиком отдаются main() своего модуля. Модули (и cv2,
+# NumPy, scipy за ними) импортируются только при вызове команды.
+DELEGATED = {
+    'evaluate': 'src.evaluation',
+    'tune': 'src.tuning',
+    'serve': 'src.server',
+    'shard': 'src.sharding',
+    'synth': 'src.synthetic',
+}
+
+
+def _delegate(command, argv):
+    module = importlib.import_module(DELEGATED[command])
+    sys.argv = [f'{sys.argv[0]} {command}'] + argv
+    return module.main()
+
+
+def count(args):
+    """Подсчет по файлу или камере с конфигурацией из файла и теплым перезапуском из снимка состояния"""
+    started = time.perf_counter()
+    from src.cv_runtime import configure_opencv, split_opencv_params
+    from src.ingestion import CameraSource, FileSource, FrameReader, run_live
+    from src.pipeline import FishDetectionPipeline
+
+    is_file = os.path.exists(args.source)
+    if is_file:
+        source = FileSource(args.source, realtime=False, gray=args.gray_decode)
+    else:
+        source = CameraSource(int(args.source) if args.source.isdigit() else args.source)
+
+    overrides = {'visualize': False, 'reuse_buffers': True}
+    if args.metrics:
+        overrides['metrics'] = True
+    if args.crossing_log:
+        overrides['crossing_log'] = args.crossing_log
+    with open(args.config, encoding='utf-8') as f:
+        config = json.load(f)
+    # Потоки OpenCV - настройка процесса: применяется здесь, а не в конвейере
+    params, cv_args = split_opencv_params(config.get('pipeline', config))
+    configure_opencv(*cv_args)
+    pipeline = FishDetectionPipeline.from_config(params, source.frame_width, **overrides)
+    checkpointer = None
+    if args.state:
+        from src.checkpoint import Checkpointer, restore_pipeline
+        if restore_pipeline(pipeline, args.state):
+            print(f"Состояние восстановлено из {args.state}: кадр {pipeline.frame_count}, "
+                  f"рыб {pipeline.counter.total_count}")
+        if args.checkpoint_every:
+            checkpointer = Checkpointer(pipeline, args.state, args.checkpoint_every).start()
+
+    renderer = None
+    if args.display or args.output:
+        # Окно и запись видео - только по запросу: HighGUI и поток отрисовки не нужны для подсчета
+        from src.renderer import Renderer
+        renderer = Renderer(max_fps=args.max_fps, show=args.display, output_path=args.output)
+
+    # Файл считаем целиком, с камеры отстающие кадры сбрасываются
+    reader = FrameReader(source, policy='block' if is_file else 'drop_oldest')
+    print(f"Готов к работе за {(time.perf_counter() - started) * 1000:.0f} мс")
+
+    total_fish = pipeline.counter.total_count
+    try:
+        for frame, total_fish, _ in run_live(pipeline, reader, args.max_frames, args.report_every, renderer):
+            if checkpointer is not None:
+                checkpointer.step()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if checkpointer is not None:
+            checkpointer.stop()
+        elif args.state:
+            from src.checkpoint import save_snapshot
+            save_snapshot(pipeline.snapshot(), args.state)
+        pipeline.close()
+
+    print(f"Кадров: {pipeline.frame_count}, рыб: {total_fish}")
+    return total_fish
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description='Подсчет рыб. Без команды - прогон манифеста (manual_test)',
+        epilog=f"Команды {', '.join(DELEGATED)} принимают аргументы своих модулей (например, evaluate --help)")
+    commands = parser.add_subparsers(dest='command')
+
+    p = commands.add_parser('count', help='подсчет по видеофайлу или камере')
+    p.add_argument('source', help='путь к файлу, индекс камеры или URL потока')
+    p.add_argument('--config', default='data/manifest.json', help='JSON с параметрами конвейера (блок "pipeline")')
+    p.add_argument('--state', help='снимок состояния (.npz): восстанавливается при запуске, сохраняется при выходе')
+    p.add_argument('--checkpoint-every', type=int, default=300,
+                   help='снимок в фоне каждые N кадров (0 - только при выходе)')
+    p.add_argument('--display', action='store_true', help='окно с разметкой')
+    p.add_argument('--output', help='записать размеченное видео (без окна - безголовый режим)')
+    p.add_argument('--max-fps', type=float, default=20, help='частота отрисовки')
+    p.add_argument('--gray-decode', action='store_true', help='серый кадр прямо из декодера')
+    p.add_argument('--metrics', action='store_true')
+    p.add_argument('--crossing-log', help='дописывать события пересечений в двоичный журнал (src.counter.read_log)')
+    p.add_argument('--max-frames', type=int, default=None)
+    p.add_argument('--report-every', type=int, default=0)
+
+    p = commands.add_parser('manual', help='прогон манифеста с отчетом (как без команды)')
+    p.add_argument('manifest', nargs='?', default='data/manifest.json')
+    p.add_argument('--workers', type=int, default=None, help='процессов, если в манифесте "timing": "parallel"')
+
+    for command in DELEGATED:
+        commands.add_parser(command, add_help=False, help=f'см. {DELEGATED[command]}')
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in DELEGATED:
+        return _delegate(argv[0], argv[1:])
+
+    args = build_parser().parse_args(argv)
+    if args.command == 'count':
+        return count(args)
+
+    from src.manual_test import manual_test
+    if args.command == 'manual':
+        return manual_test(args.manifest, workers=args.workers)
+    return manual_test()
@@ -1,36 +1,314 @@
+import os
 import time
 
+import numpy as np
+
+from src.instrumentation import Metrics
+from src.zones import DIRECTION_NAMES, LineZone, ZoneIndex, parse_zones
+
+COUNT_DIRECTIONS = ('right', 'left', 'both')
+
+# Событие пересечения: время, id трека, направление (+1 вправо / в зону, -1 влево / из зоны) и номер зоны
+CROSSING_DTYPE = np.dtype([('timestamp', '<f8'), ('track_id', '<i8'), ('direction', 'i1'), ('zone', '<i2')])
+# Журналы до появления зон: без заголовка и без поля zone
+_LEGACY_CROSSING_DTYPE = np.dtype([('timestamp', '<f8'), ('track_id', '<i8'), ('direction', 'i1')])
+
+# Заголовок файла журнала: сигнатура, версия формата и размер записи
+LOG_MAGIC = b'FISHLOG\0'
+LOG_VERSION = 2
+_LOG_HEADER_DTYPE = np.dtype([('version', '<u4'), ('itemsize', '<u4')])
+_LOG_HEADER_SIZE = len(LOG_MAGIC) + _LOG_HEADER_DTYPE.itemsize
+
+
+class CrossingLog:
+    """Журнал пересечений только на дозапись.
+
+    В памяти хранится кольцо из последних capacity событий; если задан
+    path, каждое событие дописывается в двоичный файл (читается read_log).
+    Новый файл начинается с заголовка версии; дописывать можно только в
+    файл той же версии.
+    """
+
+    def __init__(self, capacity: int = 1024, path: str = None):
+        self.events = np.zeros(capacity, dtype=CROSSING_DTYPE)
+        self.size = 0
+        self.path = path
+        self.file = None
+        if path:
+            self.file = open(path, 'ab')
+            if self.file.tell() == 0:
+                self.file.write(_log_header())
+                self.file.flush()
+            else:
+                try:
+                    _check_header(path)
+                except ValueError:
+                    self.file.close()
+                    raise
+
+    def append(self, timestamp, track_ids, direction, zone=0):
+        n = len(track_ids)
+        if not n:
+            return
+        batch = np.empty(n, dtype=CROSSING_DTYPE)
+        batch['timestamp'] = timestamp
+        batch['track_id'] = track_ids
+        batch['direction'] = direction
+        batch['zone'] = zone
+
+        idx = (self.size + np.arange(n)) % len(self.events)
+        self.events[idx] = batch
+        self.size += n
+        if self.file is not None:
+            batch.tofile(self.file)
+            self.file.flush()
+
+    def recent(self):
+        """Последние события в хронологическом порядке"""
+        capacity = len(self.events)
+        if self.size <= capacity:
+            return self.events[:self.size].copy()
+        start = self.size % capacity
+        return np.concatenate([self.events[start:], self.events[:start]])
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def _log_header():
+    header = np.array([(LOG_VERSION, CROSSING_DTYPE.itemsize)], dtype=_LOG_HEADER_DTYPE)
+    return LOG_MAGIC + header.tobytes()
+
+
+def _check_header(path):
+    """ValueError, если файл не журнал текущей версии"""
+    with open(path, 'rb') as f:
+        head = f.read(_LOG_HEADER_SIZE)
+    if not head.startswith(LOG_MAGIC) or len(head) < _LOG_HEADER_SIZE:
+        raise ValueError(f"{path}: журнал без заголовка (старый формат), дописывать в него нельзя")
+    header = np.frombuffer(head[len(LOG_MAGIC):], dtype=_LOG_HEADER_DTYPE)[0]
+    if header['version'] != LOG_VERSION or header['itemsize'] != CROSSING_DTYPE.itemsize:
+        raise ValueError(f"{path}: журнал версии {header['version']} "
+                         f"(запись {header['itemsize']} байт), ожидалась {LOG_VERSION}")
+
+
+def read_log(path):
+    """События журнала CrossingLog (CROSSING_DTYPE).
+
+    Журнал без заголовка - старый формат без зон: события читаются с zone=0.
+    ValueError, если версия не та или размер файла не кратен размеру записи.
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(len(LOG_MAGIC))
+    size = os.path.getsize(path)
+    if magic == LOG_MAGIC:
+        _check_header(path)
+        dtype, offset = CROSSING_DTYPE, _LOG_HEADER_SIZE
+    else:
+        dtype, offset = _LEGACY_CROSSING_DTYPE, 0
+    if (size - offset) % dtype.itemsize:
+        raise ValueError(f"{path}: размер {size} байт не кратен записи журнала ({dtype.itemsize} байт)")
+
+    events = np.fromfile(path, dtype=dtype, offset=offset)
+    if dtype is CROSSING_DTYPE:
+        return events
+    converted = np.zeros(len(events), dtype=CROSSING_DTYPE)
+    for name in dtype.names:
+        converted[name] = events[name]
+    return converted
+
 
 class FishCounter:
-    def __init__(self, count_line_x, direction='right', min_frames=3):
+    """Событийный счетчик пересечений зон подсчета.
+
+    Зоны - линии (отрезки) и многоугольники, у каждой свое направление и
+    свои счета (zone_counts); без zones - одна вертикальная линия
+    count_line_x с направлением direction. Трек проверяется, только когда
+    он впервые появился среди активных, его последний отрезок пути
+    пересек линию / сменил членство в зоне или первая точка окна истории
+    (она сдвигается вместе с окном) перешла на другую сторону зоны; все
+    треки и зоны проверяются векторно через ZoneIndex. Состояние хранится
+    по слотам таблицы треков: при освобождении слота трекером оно
+    вытесняется само, поэтому память не растет на длинных потоках.
+    """
+
+    def __init__(self, count_line_x, direction='right', min_frames=3,
+                 log_size: int = 1024, log_path: str = None, zones=None):
+        if direction not in COUNT_DIRECTIONS:
+            raise ValueError(f"Неизвестное направление: {direction}")
         self.count_line_x = count_line_x
         self.direction = direction
         self.min_frames = min_frames
-        self.counted_ids = set()
+        self.zones = parse_zones(zones) if zones else [LineZone.vertical(count_line_x, direction)]
+        self.index = ZoneIndex(self.zones)
+        # Разрешенные направления зон: (+1, -1)
+        self.allowed = np.array([(z.direction != DIRECTION_NAMES[z.kind][1], z.direction != DIRECTION_NAMES[z.kind][0])
+                                 for z in self.zones], dtype=bool)
+        self.zone_counts = np.zeros((len(self.zones), 2), dtype=np.int64)
         self.total_count = 0
+        self.counts = {name: 0 for z in self.zones for name in DIRECTION_NAMES[z.kind]}
         self.last_count_time = time.time()
+        self.log = CrossingLog(log_size, log_path)
+        # Счетчики пересечений для метрик (выключены; конвейер подставляет общий объект)
+        self.metrics = Metrics()
+
+        # id трека, который уже проверялся в слоте / был засчитан в слоте по зонам (-1 - нет)
+        self.seen_id = np.full(0, -1, dtype=np.int64)
+        self.counted_id = np.full((len(self.zones), 0), -1, dtype=np.int64)
+        # Первая точка окна истории трека в слоте на прошлом кадре
+        self.first_center = np.zeros((0, 2), dtype=np.int64)
+
+    def state(self):
+        """Счета зон и засчитанные треки по слотам для снимка состояния"""
+        return {
+            'seen_id': self.seen_id.copy(),
+            'counted_id': self.counted_id.copy(),
+            'zone_counts': self.zone_counts.copy(),
+            'first_center': self.first_center.copy(),
+        }
+
+    def load_state(self, state):
+        if state['zone_counts'].shape != self.zone_counts.shape:
+            raise ValueError("Число зон в снимке не совпадает с конфигурацией счетчика")
+        self.seen_id = state['seen_id'].copy()
+        self.counted_id = state['counted_id'].copy()
+        self.zone_counts = state['zone_counts'].copy()
+        # В старых снимках первых точек нет: на первом кадре возможны лишние проверки
+        first_center = state.get('first_center')
+        self.first_center = (first_center.copy() if first_center is not None
+                             else np.full((len(self.seen_id), 2), -1, dtype=np.int64))
+        self.counts = {name: 0 for name in self.counts}
+        for zone, (forward, backward) in zip(self.zones, self.zone_counts.tolist()):
+            names = DIRECTION_NAMES[zone.kind]
+            self.counts[names[0]] += forward
+            self.counts[names[1]] += backward
+        self.total_count = int(self.zone_counts.sum())
+
+    def zone_report(self):
+        """Счета по зонам: имя -> {направление: счет}"""
+        return {zone.name: dict(zip(DIRECTION_NAMES[zone.kind], counts))
+                for zone, counts in zip(self.zones, self.zone_counts.tolist())}
+
+    def _ensure_capacity(self, capacity):
+        if len(self.seen_id) < capacity:
+            extra = capacity - len(self.seen_id)
+            self.seen_id = np.concatenate([self.seen_id, np.full(extra, -1, dtype=np.int64)])
+            self.counted_id = np.concatenate([self.counted_id, np.full((len(self.zones), extra), -1, dtype=np.int64)],
+                                             axis=1)
+            self.first_center = np.concatenate([self.first_center, np.zeros((extra, 2), dtype=np.int64)])
+
+    def _evict(self, slot_ids):
+        """Забываем треки, слоты которых трекер освободил или отдал новым трекам"""
+        n = len(slot_ids)
+        counted = self.counted_id[:, :n]
+        counted[counted != slot_ids] = -1
+        stale = self.seen_id[:n] != slot_ids
+        self.seen_id[:n][stale] = -1
+
+    def is_counted(self, tracks, slots):
+        """Маска треков, засчитанных хотя бы в одной зоне, для слотов"""
+        slots = np.asarray(slots, dtype=np.intp)
+        self._ensure_capacity(len(tracks.ids))
+        return (self.counted_id[:, slots] == tracks.ids[slots]).any(axis=0)
+
+    @property
+    def counted_ids(self):
+        """id засчитанных треков, которые трекер еще не удалил"""
+        return set(self.counted_id[self.counted_id >= 0].tolist())
+
+    def _crossed(self, a, b):
+        """Пересекли ли отрезки пути a -> b линии / сменили ли членство в многоугольниках: (K, Z)"""
+        index = self.index
+        if not index.polygons:
+            return index.crosses(a, b)
+        crossed = np.zeros((len(a), len(self.zones)), dtype=bool)
+        if index.lines:
+            crossed[:, index.lines] = index.crosses(a, b)
+        crossed[:, index.polygons] = index.members(a) != index.members(b)
+        return crossed
+
+    def _sides_changed(self, a, b):
+        """Лежат ли точки a и b по разные стороны прямых зон / по-разному относительно многоугольников: (K, Z)"""
+        index = self.index
+        changed = np.zeros((len(a), len(self.zones)), dtype=bool)
+        if index.lines:
+            changed[:, index.lines] = np.sign(index.sides(a)) != np.sign(index.sides(b))
+        if index.polygons:
+            changed[:, index.polygons] = index.members(a) != index.members(b)
+        return changed
+
+    def _directions(self, a, b):
+        """Пересечения отрезков пути a -> b вперед и назад: (K, Z), (K, Z)"""
+        index = self.index
+        k, n_zones = len(a), len(self.zones)
+        forward = np.zeros((k, n_zones), dtype=bool)
+        backward = np.zeros((k, n_zones), dtype=bool)
+        if index.lines:
+            side_a, side_b = index.sides(a), index.sides(b)
+            hit = index.crosses(a, b, side_a, side_b)
+            forward[:, index.lines] = hit & (side_a < 0) & (side_b > 0)
+            backward[:, index.lines] = hit & (side_a > 0) & (side_b < 0)
+        if index.polygons:
+            inside_a, inside_b = index.members(a), index.members(b)
+            forward[:, index.polygons] = ~inside_a & inside_b
+            backward[:, index.polygons] = inside_a & ~inside_b
+        return forward, backward
 
     def update(self, tracks):
         """Обновление счетчика"""
-        new_count = 0
+        self._ensure_capacity(len(tracks.ids))
+        self._evict(tracks.ids)
+
+        slots = tracks.slots
+        if not len(slots):
+            return self.total_count
+
+        ids = tracks.ids[slots]
+
+        # Кандидаты: новые среди активных или последний отрезок пересек зону
+        lengths = tracks.history_len[slots]
+        fresh = self.seen_id[slots] != ids
+        mature = lengths >= self.min_frames
+        self.seen_id[slots[mature]] = ids[mature]
+        last = tracks.last_centers(slots)
+        prev = tracks.centers_at(slots, -2)
+        crossed_segment = self._crossed(prev, last) & (lengths >= 2)[:, None]
+        # Окно истории сдвинулось, и его начало сменило сторону: направление first -> last могло измениться
+        first = tracks.first_centers(slots)
+        first_moved = self._sides_changed(self.first_center[slots], first)
+        self.first_center[slots] = first
 
-        for track_id, track in tracks.items():
-            if track_id in self.counted_ids:
-                continue
+        candidates = (self.counted_id[:, slots].T != ids[:, None]) & mature[:, None]
+        candidates &= fresh[:, None] | crossed_segment | first_moved
+        if not candidates.any():
+            return self.total_count
 
-            center_x, _ = track['center']
+        rows = np.flatnonzero(candidates.any(axis=1))
+        slots, ids, candidates = slots[rows], ids[rows], candidates[rows]
 
-            # Проверяем историю движения
-            if len(track['centroids']) >= self.min_frames:
-                # Определяем направление движения
-                first_x = track['centroids'][0][0]
-                last_x = track['centroids'][-1][0]
+        # Направление по истории движения в окне трека
+        forward, backward = self._directions(first[rows], last[rows])
+        forward &= candidates & self.allowed[:, 0]
+        backward &= candidates & self.allowed[:, 1]
 
-                if self.direction == 'right':
-                    if first_x < self.count_line_x < last_x:
-                        self.counted_ids.add(track_id)
-                        new_count += 1
+        now = time.time()
+        for zone_idx in np.flatnonzero((forward | backward).any(axis=0)).tolist():
+            names = DIRECTION_NAMES[self.zones[zone_idx].kind]
+            for col, mask, sign in ((0, forward[:, zone_idx], 1), (1, backward[:, zone_idx], -1)):
+                n = int(np.count_nonzero(mask))
+                if n:
+                    self.counted_id[zone_idx, slots[mask]] = ids[mask]
+                    self.zone_counts[zone_idx, col] += n
+                    self.counts[names[col]] += n
+                    self.total_count += n
+                    self.log.append(now, ids[mask], sign, zone_idx)
+                    self.metrics.inc(f'crossings_{names[col]}', n)
+                    self.last_count_time = now
 
-        self.total_count += new_count
+        return self.total_count
 
-        return self.total_count
\ No newline at end of file
+    def close(self):
+        """Закрывает файл журнала пересечений"""
+        self.log.close()
@@ -0,0 +1,58 @@
+import os
+import time
+
+import cv2
+
+from src.detector import FishDetector
+
+
+def configure_opencv(threads: int = None, optimized: bool = True):
+    """Глобальные настройки OpenCV: число потоков и оптимизированные (SIMD) ветки.
+
+    Настройки действуют на весь процесс; threads=None оставляет текущее значение.
+    """
+    cv2.setUseOptimized(optimized)
+    if threads is not None:
+        cv2.setNumThreads(threads)
+    return cv2.getNumThreads()
+
+
+def split_opencv_params(params):
+    """Параметры конвейера без cv_threads / cv_optimized и аргументы configure_opencv: (params, args).
+
+    Настройки OpenCV действуют на весь процесс, поэтому их применяют точки
+    входа и инициализаторы пулов процессов, а не конвейер.
+    """
+    params = dict(params)
+    return params, (params.pop('cv_threads', None), params.pop('cv_optimized', True))
+
+
+def auto_threads(n_pipelines: int = 1):
+    """Потоков OpenCV на конвейер, чтобы n_pipelines параллельных конвейеров не делили ядра"""
+    return max(1, (os.cpu_count() or 1) // max(1, n_pipelines))
+
+
+def tune_threads(frames, detector_params=None, n_pipelines: int = 1, candidates=None):
+    """Подбор числа потоков OpenCV замером detect на кадрах.
+
+    Кандидаты ограничены auto_threads(n_pipelines): больше потоков на
+    конвейер при нескольких конвейерах дает только переподписку ядер.
+    Лучшее значение сразу устанавливается; возвращает (threads, {threads: мс/кадр}).
+    """
+    limit = auto_threads(n_pipelines)
+    if candidates is None:
+        candidates = sorted({1, *(2 ** i for i in range(1, limit.bit_length())), limit})
+    candidates = [t for t in candidates if 1 <= t <= limit] or [1]
+
+    timings = {}
+    for threads in candidates:
+        configure_opencv(threads)
+        detector = FishDetector(**(detector_params or {}))
+        start = time.perf_counter()
+        for frame in frames:
+            detector.detect(frame)
+        timings[threads] = (time.perf_counter() - start) / max(1, len(frames)) * 1000
+
+    best = min(timings, key=timings.get)
+    configure_opencv(best)
+    return best, timings
@@ -1,5 +1,15 @@
 import cv2
+import numpy as np
 
+from src.box_merge import merge_close_boxes
+from src.instrumentation import Metrics
+
+DETECTION_BACKENDS = ('contours', 'components')
+
+# contourArea считает площадь многоугольника через центры граничных пикселей и
+# меньше числа пикселей компоненты примерно на половину периметра. Периметр
+# оцениваем по bbox: поправка ~0.88 * (w + h) подобрана по маскам MOG2.
+_EDGE_AREA_FACTOR = 0.88
 
 class FishDetector:
     def __init__(self,
@@ -12,7 +22,13 @@ class FishDetector:
                  morph_kernel: int = 7,
                  g_blur: int = 7,
                  learning_rate: float = 0.01,
-                 merge_threshold: int = 50):
+                 merge_threshold: int = 50,
+                 scale: float = 1.0,
+                 roi: tuple = None,
+                 backend: str = 'contours',
+                 reuse_buffers: bool = False):
+        if backend not in DETECTION_BACKENDS:
+            raise ValueError(f"Неизвестный backend детекции: {backend}")
         self.bg_subtractor = cv2.createBackgroundSubtractorMOG2(
             history=history,
             varThreshold=varThreshold,
@@ -20,97 +36,248 @@ class FishDetector:
         )
         self.min_area = min_area
         self.max_area = max_area
+        # Один CLAHE на детектор; clipLimit и tileGridkernel - свойства, меняющие его на ходу
+        self.clahe = cv2.createCLAHE()
         self.clipLimit = clipLimit
         self.tileGridkernel = tileGridkernel
         self.g_blur = g_blur
         self.learning_rate = learning_rate
         self.merge_threshold = merge_threshold
-        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (morph_kernel, morph_kernel))
+        self.morph_kernel = morph_kernel
+        self.backend = backend
+
+        # Обработка полосы roi = (x_start, x_end) и/или уменьшенного кадра.
+        # Пороги задаются в пикселях исходного кадра и пересчитываются под масштаб.
+        self.scale = scale
+        self.roi = roi
+        self.work_min_area = min_area * scale ** 2
+        self.work_max_area = max_area * scale ** 2
+        self.work_merge_threshold = merge_threshold * scale
+        self.work_g_blur = max(1, int(round(g_blur * scale))) | 1
+        work_kernel = max(1, int(round(morph_kernel * scale)))
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (work_kernel, work_kernel))
+
+        # Переиспользуемые выходные буферы (dst=), которые OpenCV пересоздает только
+        # при смене размера. Пошаговые методы (preprocess, subtract, clean_mask)
+        # возвращают эти буферы - результат действителен до следующего кадра.
+        # detect() и skip() отдают копию маски, если не включен reuse_buffers
+        # (для вызывающих, которые не хранят маску между кадрами).
+        self.reuse_buffers = reuse_buffers
+        self.buffers = {}
+        # Площади valid_contours последнего кадра (в пикселях исходного кадра)
+        self.contour_areas = np.empty(0)
+        # Поэтапные замеры (выключены; конвейер подставляет общий объект)
+        self.metrics = Metrics()
+
+    @property
+    def clipLimit(self):
+        return self.clahe.getClipLimit()
+
+    @clipLimit.setter
+    def clipLimit(self, value):
+        self.clahe.setClipLimit(value)
+
+    @property
+    def tileGridkernel(self):
+        return self.clahe.getTilesGridSize()[0]
+
+    @tileGridkernel.setter
+    def tileGridkernel(self, value):
+        self.clahe.setTilesGridSize((value, value))
 
     def preprocess(self, frame):
         """Подготовка кадра - обрезка боков и улучшение контраста"""
-        # Преобразование в оттенки серого
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        # Полоса интереса (срез без копирования)
+        work = frame if self.roi is None else frame[:, self.roi[0]:self.roi[1]]
+
+        buf = self.buffers
+
+        # Преобразование в оттенки серого (кадр мог прийти серым прямо из декодера)
+        if work.ndim == 2:
+            gray = work
+        else:
+            gray = buf['gray'] = cv2.cvtColor(work, cv2.COLOR_BGR2GRAY, dst=buf.get('gray'))
+
+        return self.enhance(gray), frame
+
+    def gray_batch(self, frames):
+        """Серые полосы интереса пачки (N, H, W, 3) или (N, H, W) - один cvtColor на всю пачку"""
+        work = frames if self.roi is None else frames[:, :, self.roi[0]:self.roi[1]]
+        if work.ndim == 3:
+            return work
+
+        # Пачка как один высокий кадр (N*H, W): преобразование попиксельное, кадры не смешиваются
+        n, h, w, c = work.shape
+        flat = np.ascontiguousarray(work).reshape(n * h, w, c)
+        buf = self.buffers
+        buf['gray_batch'] = cv2.cvtColor(flat, cv2.COLOR_BGR2GRAY, dst=buf.get('gray_batch'))
+        return buf['gray_batch'].reshape(n, h, w)
+
+    def enhance(self, gray):
+        """Серая полоса интереса -> уменьшение, CLAHE и размытие (результат в буфере детектора)"""
+        buf = self.buffers
+
+        # Уменьшение разрешения
+        if self.scale != 1.0:
+            gray = buf['small'] = cv2.resize(gray, None, dst=buf.get('small'), fx=self.scale, fy=self.scale,
+                                             interpolation=cv2.INTER_AREA)
 
         # Улучшение контраста для темных рыб
-        clahe = cv2.createCLAHE(clipLimit=self.clipLimit, tileGridSize=(self.tileGridkernel, self.tileGridkernel))
-        enhanced = clahe.apply(gray)
+        enhanced = buf['enhanced'] = self.clahe.apply(gray, dst=buf.get('enhanced'))
 
         # Легкое размытие для подавления шума
-        blurred = cv2.GaussianBlur(enhanced, (self.g_blur, self.g_blur), 0)
+        blurred = buf['blurred'] = cv2.GaussianBlur(enhanced, (self.work_g_blur, self.work_g_blur), 0,
+                                                    dst=buf.get('blurred'))
+
+        return blurred
+
+    def subtract(self, processed, learning_rate: float = None):
+        """Фоновое вычитание"""
+        if learning_rate is None:
+            learning_rate = self.learning_rate
+        buf = self.buffers
+        buf['fg'] = self.bg_subtractor.apply(processed, fgmask=buf.get('fg'), learningRate=learning_rate)
+        return buf['fg']
+
+    def background(self):
+        """Фон MOG2 в рабочем разрешении (None до первого кадра)"""
+        return self.bg_subtractor.getBackgroundImage()
+
+    def restore_background(self, background):
+        """Теплый старт MOG2 с сохраненного фона вместо history кадров накопления.
+
+        apply с learningRate=1 заново инициализирует смеси по этому изображению
+        (дисперсии - начальные varInit); кадр другого размера MOG2 сам сбросит.
+        """
+        self.bg_subtractor.apply(background, learningRate=1.0)
+
+    def clean_mask(self, fg_mask):
+        """Улучшенная морфология (результат в буфере детектора до следующего кадра).
 
-        return blurred, frame
+        close -> open -> dilate с одним ядром - это dilate, erode, erode, dilate, dilate.
+        Одинаковые соседние операции идут одним вызовом с iterations=2: результат
+        бит в бит тот же, но три вызова вместо пяти проходов и без временных
+        буферов morphologyEx (для прямоугольного ядра OpenCV сводит итерации к
+        одному проходу с увеличенным ядром).
+        """
+        buf = self.buffers
+        dilated = buf['mask_a'] = cv2.dilate(fg_mask, self.kernel, dst=buf.get('mask_a'))
+        eroded = buf['mask_b'] = cv2.erode(dilated, self.kernel, dst=buf.get('mask_b'), iterations=2)
+        buf['mask_a'] = cv2.dilate(eroded, self.kernel, dst=dilated, iterations=2)
+        return buf['mask_a']
+
+    def find_boxes(self, fg_mask):
+        """Маска -> отфильтрованные и объединенные bounding boxes (и контуры для визуализации).
+
+        backend='components' берет площади и bbox всех компонент одним нативным
+        вызовом и контуров не возвращает. Площадь компоненты приводится к
+        contourArea поправкой на периметр, поэтому у порогов min_area/max_area
+        и у блобов с дырами набор боксов может немного отличаться от 'contours'.
+        """
+        if self.backend == 'components':
+            buf = self.buffers
+            _, buf['labels'], stats, _ = cv2.connectedComponentsWithStats(
+                fg_mask, labels=buf.get('labels'), connectivity=8)
+            stats = stats[1:]
+            areas = stats[:, cv2.CC_STAT_AREA] - _EDGE_AREA_FACTOR * (stats[:, 2] + stats[:, 3])
+            candidates = np.flatnonzero((self.work_min_area < areas) & (areas < self.work_max_area))
+            rects = stats[candidates, :4].astype(np.int64)
+            contours = None
+        else:
+            contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+            # Площадь считаем один раз для всех контуров, прямоугольники - только для прошедших
+            areas = np.fromiter((cv2.contourArea(c) for c in contours), dtype=np.float64, count=len(contours))
+            candidates = np.flatnonzero((self.work_min_area < areas) & (areas < self.work_max_area))
+            rects = np.array([cv2.boundingRect(contours[i]) for i in candidates], dtype=np.int64).reshape(-1, 4)
+
+        # Фильтр по соотношению сторон
+        h = rects[:, 3]
+        aspect_ratio = np.divide(rects[:, 2], h, out=np.zeros(len(rects)), where=h > 0)
+        keep = (0.3 < aspect_ratio) & (aspect_ratio < 3.0)
+
+        bboxes = [tuple(r) for r in rects[keep].tolist()]
+        valid_contours = [] if contours is None else [contours[i] for i in candidates[keep].tolist()]
+        self.contour_areas = areas[candidates[keep]] / self.scale ** 2
+
+        metrics = self.metrics
+        metrics.observe('raw_boxes', len(bboxes))
+        if len(bboxes) > 1:
+            t = metrics.clock()
+            bboxes = self._merge_close_boxes(bboxes)
+            metrics.lap('merge', t)
+
+        if self.scale != 1.0 or self.roi is not None:
+            bboxes, valid_contours = self._to_frame_coords(bboxes, valid_contours)
+
+        return bboxes, valid_contours
+
+    def _to_frame_coords(self, bboxes, contours):
+        """Перевод боксов и контуров из координат обработки в координаты исходного кадра"""
+        x0 = self.roi[0] if self.roi is not None else 0
+        inv = 1.0 / self.scale
+
+        bboxes = [(int(round(x * inv)) + x0, int(round(y * inv)),
+                   int(round(w * inv)), int(round(h * inv))) for x, y, w, h in bboxes]
+        contours = [((c * inv).round() + (x0, 0)).astype(np.int32) for c in contours]
+        return bboxes, contours
 
     def detect(self, frame):
         """Обнаружение рыб с улучшенной морфологией"""
+        t = self.metrics.clock()
         processed, original = self.preprocess(frame)
+        bboxes, fg_mask, valid_contours = self._detect_processed(processed, t)
+        if not self.reuse_buffers:
+            fg_mask = fg_mask.copy()
+        return bboxes, fg_mask, valid_contours, original
+
+    def detect_gray(self, gray):
+        """Боксы для уже серой полосы интереса (кадр из gray_batch)"""
+        t = self.metrics.clock()
+        bboxes, _, _ = self._detect_processed(self.enhance(gray), t)
+        return bboxes
+
+    def _detect_processed(self, processed, t):
+        metrics = self.metrics
+        t = metrics.lap('preprocess', t)
 
         # Фоновое вычитание
-        fg_mask = self.bg_subtractor.apply(processed, learningRate=self.learning_rate)
+        fg_mask = self.subtract(processed)
+        t = metrics.lap('mog2', t)
 
         # Улучшенная морфология
-        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, self.kernel)
-        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, self.kernel)
-        fg_mask = cv2.dilate(fg_mask, self.kernel, iterations=1)
+        fg_mask = self.clean_mask(fg_mask)
+        t = metrics.lap('morphology', t)
 
         # Находим контуры
-        contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        bboxes, valid_contours = self.find_boxes(fg_mask)
+        metrics.lap('contours', t)
+        metrics.observe('detections', len(bboxes))
 
-        bboxes = []
-        valid_contours = []
+        return bboxes, fg_mask, valid_contours
 
-        for contour in contours:
-            area = cv2.contourArea(contour)
+    def skip(self, frame, gate):
+        """Кадр статичной сцены: без детекции, фон MOG2 обновляется с пониженной частотой"""
+        if gate.background_due():
+            t = self.metrics.clock()
+            processed, _ = self.preprocess(frame)
+            self.subtract(processed, gate.background_rate(self.learning_rate))
+            self.metrics.lap('background', t)
 
-            # Фильтрация по размеру и форме
-            if self.min_area < area < self.max_area:
-                x, y, w, h = cv2.boundingRect(contour)
-
-                # Фильтр по соотношению сторон
-                aspect_ratio = w / h if h > 0 else 0
-                if 0.3 < aspect_ratio < 3.0:
-                    bboxes.append((x, y, w, h))
-                    valid_contours.append(contour)
-        if len(bboxes) > 1:
-            bboxes = self._merge_close_boxes(bboxes)
-
-        return bboxes, fg_mask, valid_contours, original
+        buf = self.buffers
+        shape = buf['fg'].shape if 'fg' in buf else frame.shape[:2]
+        if not self.reuse_buffers:
+            idle = np.zeros(shape, dtype=np.uint8)
+        else:
+            if buf.get('idle') is None or buf['idle'].shape != shape:
+                buf['idle'] = np.zeros(shape, dtype=np.uint8)
+            idle = buf['idle']
+        self.contour_areas = np.empty(0)
+        return [], idle, [], frame
 
     def _merge_close_boxes(self, boxes):
         """Объединяет близко расположенные bounding boxes"""
         if not boxes:
             return boxes
 
-        boxes = sorted(boxes, key=lambda b: b[0])
-        merged = []
-        current = list(boxes[0])
-
-        for box in boxes[1:]:
-            x1, y1, w1, h1 = current
-            x2, y2, w2, h2 = box
-
-            # Проверяем расстояние между боксами
-            horizontal_gap = max(0, max(x1, x2) - min(x1 + w1, x2 + w2))
-            vertical_gap = max(0, max(y1, y2) - min(y1 + h1, y2 + h2))
-            min_distance = max(horizontal_gap, vertical_gap)
-
-            # Проверяем перекрытие
-            xi1 = max(x1, x2)
-            yi1 = max(y1, y2)
-            xi2 = min(x1 + w1, x2 + w2)
-            yi2 = min(y1 + h1, y2 + h2)
-            inter_area = max(0, xi2 - xi1) * max(0, yi2 - yi1)
-
-            # Объединяем 
-            if inter_area > 0 or min_distance < self.merge_threshold:
-                new_x = min(x1, x2)
-                new_y = min(y1, y2)
-                new_w = max(x1 + w1, x2 + w2) - new_x
-                new_h = max(y1 + h1, y2 + h2) - new_y
-                current = [new_x, new_y, new_w, new_h]
-            else:
-                merged.append(tuple(current))
-                current = list(box)
-
-        merged.append(tuple(current))
-        return merged
\ No newline at end of file
+        return merge_close_boxes(boxes, self.work_merge_threshold)
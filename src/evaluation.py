@@ -0,0 +1,237 @@
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from src.cv_runtime import auto_threads, configure_opencv, split_opencv_params
+from src.ingestion import GrayCapture
+from src.pipeline import FishDetectionPipeline
+from utils.metrics import mse, mae
+
+STAGES = ('decode', 'preprocess', 'mog2', 'morphology', 'contours', 'track', 'count')
+PERCENTILES = (50, 95, 99)
+
+
+def load_manifest(path):
+    """Манифест: список видео с эталонными счетами и параметры конвейера"""
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    manifest.setdefault('pipeline', {})
+    manifest.setdefault('warmup_frames', 0)
+    manifest.setdefault('target_fps', 500)
+    manifest.setdefault('gray_decode', False)
+    manifest.setdefault('timing', 'isolated')
+    return manifest
+
+
+def _latency_stats(samples_ns):
+    """Перцентили задержки в миллисекундах"""
+    if len(samples_ns) == 0:
+        return {'mean_ms': 0.0, **{f'p{p}_ms': 0.0 for p in PERCENTILES}}
+
+    ms = np.asarray(samples_ns, dtype=np.float64) / 1e6
+    stats = {'mean_ms': float(ms.mean())}
+    for p, value in zip(PERCENTILES, np.percentile(ms, PERCENTILES)):
+        stats[f'p{p}_ms'] = float(value)
+    return stats
+
+
+def evaluate_video(path, expected, pipeline_params, warmup_frames=0, gray_decode=False):
+    """Прогон одного видео с поэтапными замерами perf_counter_ns.
+
+    Первые warmup_frames кадров проходят через конвейер (MOG2 и трекер
+    должны набрать состояние), но в статистику задержек не попадают.
+    gray_decode - серый кадр прямо из декодера (GrayCapture).
+    """
+    cap = GrayCapture(path) if gray_decode else cv2.VideoCapture(path)
+    frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    pipeline = FishDetectionPipeline(frame_width=frame_width, visualize=False, **pipeline_params)
+    detector, tracker, counter = pipeline.detector, pipeline.tracker, pipeline.counter
+
+    timings = {stage: [] for stage in STAGES + ('total',)}
+    total_fish = 0
+    frame_count = 0
+    clock = time.perf_counter_ns
+    start = clock()
+
+    while True:
+        t0 = clock()
+        ret, frame = cap.read()
+        if not ret:
+            break
+        t1 = clock()
+        processed, _ = detector.preprocess(frame)
+        t2 = clock()
+        fg_mask = detector.subtract(processed)
+        t3 = clock()
+        fg_mask = detector.clean_mask(fg_mask)
+        t4 = clock()
+        bboxes, _ = detector.find_boxes(fg_mask)
+        t5 = clock()
+        tracks = tracker.update(bboxes)
+        t6 = clock()
+        total_fish = counter.update(tracks)
+        t7 = clock()
+        pipeline.frame_count += 1
+
+        if frame_count >= warmup_frames:
+            marks = (t0, t1, t2, t3, t4, t5, t6, t7)
+            for stage, begin, end in zip(STAGES, marks, marks[1:]):
+                timings[stage].append(end - begin)
+            timings['total'].append(t7 - t1)
+        frame_count += 1
+
+    wall_sec = (clock() - start) / 1e9
+    cap.release()
+
+    processing = np.asarray(timings['total'], dtype=np.float64)
+    avg_fps = 1e9 / processing.mean() if len(processing) else 0.0
+    return {
+        'video': path,
+        'expected': expected,
+        'predicted': int(total_fish),
+        'error': abs(int(total_fish) - expected),
+        'frames': frame_count,
+        'timed_frames': len(processing),
+        'wall_sec': wall_sec,
+        'avg_fps': float(avg_fps),
+        'latency': {stage: _latency_stats(timings[stage]) for stage in STAGES + ('total',)},
+    }
+
+
+def run_benchmark(manifest, workers=None):
+    """Прогон всех видео манифеста в пуле процессов.
+
+    manifest['timing']: 'isolated' (по умолчанию) - видео идут по одному
+    (workers=1), FPS каждого видео не зависит от соседей по ядрам и годится
+    для проверки цели target_fps. 'parallel' - видео обрабатываются
+    одновременно: быстрее получить счет, но FPS видео занижен конкуренцией,
+    поэтому цель по FPS не проверяется; для пакета в целом есть wall_sec и
+    throughput_fps.
+    """
+    entries = []
+    for entry in manifest['videos']:
+        if os.path.exists(entry['path']):
+            entries.append(entry)
+        else:
+            print(f"Пропуск: нет файла {entry['path']}")
+
+    timing = manifest['timing']
+    if timing not in ('isolated', 'parallel'):
+        raise ValueError(f"Неизвестный режим замеров: {timing}")
+    if timing == 'isolated':
+        workers = 1
+
+    # Потоки OpenCV делим между процессами пула, если в манифесте не задано явно
+    params, (threads, optimized) = split_opencv_params(manifest['pipeline'])
+    if threads is None:
+        threads = auto_threads(min(workers or os.cpu_count() or 1, max(1, len(entries))))
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=configure_opencv,
+                             initargs=(threads, optimized)) as pool:
+        futures = [pool.submit(evaluate_video, e['path'], e['count'], params,
+                               manifest['warmup_frames'], manifest['gray_decode'])
+                   for e in entries]
+        videos = [f.result() for f in futures]
+    wall_sec = time.perf_counter() - start
+
+    summary = {'videos': len(videos), 'target_fps': manifest['target_fps'], 'timing': timing,
+               'wall_sec': wall_sec,
+               'throughput_fps': sum(v['frames'] for v in videos) / wall_sec if wall_sec else 0.0}
+    if videos:
+        y_true = np.array([v['expected'] for v in videos])
+        y_pred = np.array([v['predicted'] for v in videos])
+        fps = np.array([v['avg_fps'] for v in videos])
+        summary.update({
+            'mse': float(mse(y_true, y_pred)),
+            'mae': float(mae(y_true, y_pred)),
+            'avg_fps': float(fps.mean()),
+            'min_fps': float(fps.min()),
+            'max_fps': float(fps.max()),
+            # При параллельном прогоне FPS видео зависит от числа ядер - цель не проверяем
+            'meets_target': bool(fps.min() >= manifest['target_fps']) if timing == 'isolated' else None,
+        })
+
+    return {'manifest': manifest, 'videos': videos, 'summary': summary}
+
+
+def write_json(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+def write_csv(report, path):
+    """Одна строка на видео; задержки этапов развернуты в колонки"""
+    columns = ['video', 'expected', 'predicted', 'error', 'frames', 'avg_fps']
+    for stage in STAGES + ('total',):
+        columns += [f'{stage}_{key}' for key in ('mean_ms',) + tuple(f'p{p}_ms' for p in PERCENTILES)]
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for v in report['videos']:
+            row = {key: v[key] for key in columns[:6]}
+            for stage, stats in v['latency'].items():
+                for key, value in stats.items():
+                    row[f'{stage}_{key}'] = value
+            writer.writerow(row)
+
+
+def print_report(report):
+    for v in report['videos']:
+        total = v['latency']['total']
+        print(f"{v['video']}: {v['predicted']}/{v['expected']} рыб, FPS: {v['avg_fps']:.1f}, "
+              f"p50/p95/p99: {total['p50_ms']:.2f}/{total['p95_ms']:.2f}/{total['p99_ms']:.2f} мс")
+        for stage in STAGES:
+            s = v['latency'][stage]
+            print(f"    {stage:11s} p50 {s['p50_ms']:7.3f}  p95 {s['p95_ms']:7.3f}  p99 {s['p99_ms']:7.3f} мс")
+
+    s = report['summary']
+    if s['videos']:
+        print(f"MSE: {s['mse']:.2f}, MAE: {s['mae']:.2f}, "
+              f"FPS средний/мин/макс: {s['avg_fps']:.1f}/{s['min_fps']:.1f}/{s['max_fps']:.1f}")
+        print(f"Пакет: {s['wall_sec']:.1f} сек, {s['throughput_fps']:.1f} кадров/сек ({s['timing']})")
+        if s['meets_target'] is None:
+            status = 'не проверялась (параллельный прогон, см. --timing isolated)'
+        else:
+            status = 'OK' if s['meets_target'] else 'НИЖЕ ЦЕЛИ'
+        print(f"Цель {s['target_fps']} FPS: {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк и оценка точности подсчета рыб')
+    parser.add_argument('manifest', nargs='?', default='data/manifest.json')
+    parser.add_argument('--workers', type=int, default=None, help='процессов при --timing parallel')
+    parser.add_argument('--warmup', type=int, default=None, help='кадров прогрева (без замеров)')
+    parser.add_argument('--gray-decode', action='store_true', help='серый кадр прямо из декодера')
+    parser.add_argument('--timing', choices=('isolated', 'parallel'), default=None,
+                        help='isolated - видео по одному (честный FPS), parallel - одновременно')
+    parser.add_argument('--json', dest='json_path')
+    parser.add_argument('--csv', dest='csv_path')
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.manifest)
+    if args.warmup is not None:
+        manifest['warmup_frames'] = args.warmup
+    if args.gray_decode:
+        manifest['gray_decode'] = True
+    if args.timing:
+        manifest['timing'] = args.timing
+
+    report = run_benchmark(manifest, workers=args.workers)
+    print_report(report)
+    if args.json_path:
+        write_json(report, args.json_path)
+    if args.csv_path:
+        write_csv(report, args.csv_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+import queue
+import threading
+import time
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+INGEST_POLICIES = ('block', 'drop_oldest', 'skip')
+
+
+class TimedFrame(NamedTuple):
+    index: int
+    timestamp: float
+    image: np.ndarray
+
+
+# Y-плоскость yuv420p в ограниченном диапазоне 16..235 -> полный 0..255, как после BGR2GRAY
+_Y_FULL_RANGE = np.clip((np.arange(256) - 16) * 255.0 / 219.0 + 0.5, 0, 255).astype(np.uint8)
+
+
+class GrayCapture:
+    """VideoCapture, который отдает серый кадр прямо из декодера.
+
+    Без CONVERT_RGB FFmpeg возвращает для yuv420p Y-плоскость: пропускаются
+    преобразование YUV -> BGR в декодере и BGR -> GRAY в детекторе. Сам
+    OpenCV считает этот режим неподдерживаемым, поэтому при full_range=None
+    первый кадр сверяется с обычным BGR-декодированием: так определяется
+    диапазон яркости, а если Y-плоскость не совпала ни в одном диапазоне,
+    чтение переходит на BGR + cvtColor (raw=False). raw=False сразу читает
+    BGR. Кадр пробы не перечитывается, а отдается первым read(). Каждый
+    read() возвращает новый массив: кадры можно копить в очереди.
+    """
+
+    # Свойства, смена которых переставляет позицию чтения
+    _SEEK_PROPS = (cv2.CAP_PROP_POS_FRAMES, cv2.CAP_PROP_POS_MSEC, cv2.CAP_PROP_POS_AVI_RATIO)
+    # Средняя разница с BGR2GRAY, выше которой Y-плоскость считается негодной
+    _RAW_TOLERANCE = 4.0
+
+    def __init__(self, source, full_range: bool = None, raw: bool = True):
+        self.cap = cv2.VideoCapture(source)
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.raw = raw
+        # Первый кадр, прочитанный для проверки режима
+        self.pending = None
+        if raw:
+            self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+            if full_range is None:
+                self.pending = self.cap.read()
+                full_range = self._probe(source)
+        self.full_range = bool(full_range)
+
+    def _plane(self, frame):
+        """Y-плоскость кадра сырого декодирования или None, если форма не та"""
+        if frame.ndim == 2 and frame.shape[1] == self.width and frame.shape[0] >= self.height:
+            # Планарные форматы (I420, NV12) начинаются с Y-плоскости
+            return frame[:self.height]
+        return None
+
+    def _probe(self, source):
+        """Диапазон Y-плоскости: полный (JPEG/MJPEG) или ограниченный 16..235 (обычное видео).
+
+        Если плоскость не годится, дальше читается BGR-захват пробы.
+        """
+        bgr = cv2.VideoCapture(source)
+        ok, frame = bgr.read()
+        if not ok or frame.ndim != 3:
+            bgr.release()
+            return False
+
+        ret, raw_frame = self.pending
+        luma = self._plane(raw_frame) if ret else None
+        if luma is not None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY).astype(np.int16)
+            full_err = np.abs(gray - luma).mean()
+            limited_err = np.abs(gray - cv2.LUT(luma, _Y_FULL_RANGE)).mean()
+            if min(full_err, limited_err) < self._RAW_TOLERANCE:
+                bgr.release()
+                return bool(full_err < limited_err)
+
+        # Сырое декодирование не дало Y-плоскость: обычный BGR и cvtColor
+        self.cap.release()
+        self.cap, self.pending, self.raw = bgr, (ok, frame), False
+        return False
+
+    def read(self):
+        if self.pending is not None:
+            (ret, frame), self.pending = self.pending, None
+        else:
+            ret, frame = self.cap.read()
+        if not ret:
+            return ret, frame
+        if frame.ndim == 3:
+            return True, cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        luma = self._plane(frame)
+        if luma is None:
+            raise ValueError(f"Декодер вернул кадр неподдерживаемой формы {frame.shape}")
+        return True, luma if self.full_range else cv2.LUT(luma, _Y_FULL_RANGE)
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_FRAMES and self.pending is not None:
+            return self.cap.get(prop) - 1
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        if prop in self._SEEK_PROPS:
+            self.pending = None
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.cap.release()
+
+
+class CameraSource:
+    """Живой источник: RTSP-поток или USB-камера (индекс устройства)"""
+
+    def __init__(self, source):
+        self.cap = cv2.VideoCapture(source)
+        # Не копим кадры в буфере драйвера: отставание регулирует FrameReader
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 25.0
+        self.frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+
+    def read(self):
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+
+class FileSource:
+    """Видеофайл, который отдает кадры в темпе реального времени (для локальной проверки)"""
+
+    def __init__(self, path, realtime: bool = True, loop: bool = False, gray: bool = False):
+        self.path = path
+        self.cap = GrayCapture(path) if gray else cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 25.0
+        self.frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.realtime = realtime
+        self.loop = loop
+        self.started = None
+        self.frames_read = 0
+
+    def read(self):
+        if self.realtime:
+            if self.started is None:
+                self.started = time.monotonic()
+            delay = self.started + self.frames_read / self.fps - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        if ret:
+            self.frames_read += 1
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class FrameReader:
+    """Чтение кадров в отдельном потоке в ограниченную очередь.
+
+    Политики при медленной обработке:
+      - 'block': читатель ждет свободного места (живая камера сама сбрасывает кадры);
+      - 'drop_oldest': самый старый кадр в очереди выбрасывается ради нового;
+      - 'skip': в очередь попадает только каждый skip_every-й кадр.
+    Каждый кадр несет номер и время захвата (time.monotonic).
+    """
+
+    def __init__(self, source, maxsize: int = 8, policy: str = 'drop_oldest', skip_every: int = 2):
+        if policy not in INGEST_POLICIES:
+            raise ValueError(f"Неизвестная политика: {policy}")
+        self.source = source
+        self.policy = policy
+        self.skip_every = max(1, skip_every)
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        self.read_count = 0
+        self.dropped = 0
+        self.processed = 0
+        self.finished = False
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='frame-reader', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _put(self, item):
+        if self.policy != 'drop_oldest':
+            while not self.stop_event.is_set():
+                try:
+                    self.queue.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        # drop_oldest, а также остановка потребителя: освобождаем место за счет старых кадров
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _run(self):
+        try:
+            while not self.stop_event.is_set():
+                ret, frame = self.source.read()
+                if not ret:
+                    break
+                index = self.read_count
+                self.read_count += 1
+
+                if self.policy == 'skip' and index % self.skip_every:
+                    self.dropped += 1
+                    continue
+
+                self._put(TimedFrame(index, time.monotonic(), frame))
+        finally:
+            self.finished = True
+            self.source.release()
+            # Маркер конца потока должен дойти до потребителя
+            self._put(None)
+
+    def frames(self):
+        """Генератор кадров для обработки; завершается, когда источник исчерпан"""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            self.processed += 1
+            yield item
+
+    def stats(self):
+        return {
+            'read': self.read_count,
+            'dropped': self.dropped,
+            'processed': self.processed,
+            'queue_depth': self.queue.qsize(),
+        }
+
+
+def run_live(pipeline, reader: FrameReader, max_frames: int = None, report_every: int = 0,
+             renderer=None):
+    """Обработка живого потока конвейером FishDetectionPipeline.
+
+    Генератор (TimedFrame, total_fish, задержка от захвата до конца обработки в сек).
+    renderer - Renderer для отрисовки в отдельном потоке (клавиша 'q' в окне - выход).
+    """
+    if renderer is not None:
+        pipeline.attach_renderer(renderer)
+        renderer.start()
+    reader.start()
+    try:
+        for frame in reader.frames():
+            result = pipeline.process_frame(frame.image)
+            total_fish = result[2] if pipeline.visualize else result[1]
+            yield frame, total_fish, time.monotonic() - frame.timestamp
+
+            if report_every and reader.processed % report_every == 0:
+                s = reader.stats()
+                print(f"Прочитано: {s['read']}, обработано: {s['processed']}, "
+                      f"сброшено: {s['dropped']}, очередь: {s['queue_depth']}")
+            if max_frames is not None and reader.processed >= max_frames:
+                break
+            # Окно обновляется здесь: HighGUI - только из главного потока
+            if renderer is not None and renderer.poll():
+                break
+    finally:
+        reader.stop()
+        if renderer is not None:
+            renderer.stop()
+            pipeline.attach_renderer(None)
@@ -0,0 +1,174 @@
+import time
+from bisect import bisect_left
+
+# Границы корзин гистограмм: задержки в миллисекундах и количества объектов на кадр
+LATENCY_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (как histogram в Prometheus)"""
+
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Оценка квантиля линейной интерполяцией внутри корзины"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'max': self.max,
+        }
+
+
+class Metrics:
+    """Поэтапные таймеры, счетчики и гистограммы конвейера.
+
+    Включается и выключается на ходу (enabled). Выключенный объект
+    сводится к проверке флага в каждом вызове: clock() и lap()
+    возвращают 0 и ничего не записывают.
+
+        t = metrics.clock()
+        ...
+        t = metrics.lap('mog2', t)
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.stages = {}
+        self.values = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.stages.clear()
+        self.values.clear()
+        self.counters.clear()
+        self.gauges.clear()
+
+    def clock(self):
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def lap(self, stage, start):
+        """Записывает время этапа с момента start и возвращает новую отметку"""
+        if not self.enabled:
+            return 0
+        now = time.perf_counter_ns()
+        # start == 0: метрики включили посреди кадра, замер неполный
+        if start:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = Histogram(LATENCY_BUCKETS_MS)
+            hist.observe((now - start) / 1e6)
+        return now
+
+    def observe(self, name, value):
+        """Количество на кадр (детекции, треки) - в гистограмму и в последнее значение"""
+        if not self.enabled:
+            return
+        hist = self.values.get(name)
+        if hist is None:
+            hist = self.values[name] = Histogram(COUNT_BUCKETS)
+        hist.observe(value)
+        self.gauges[name] = value
+
+    def inc(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        """Состояние для JSON: задержки этапов в мс, распределения количеств, счетчики.
+
+        Вызывается из другого потока, пока конвейер добавляет ключи: словари
+        обходятся по копиям list(items()), а не по живым представлениям.
+        """
+        return {
+            'enabled': self.enabled,
+            'stages_ms': {name: h.snapshot() for name, h in list(self.stages.items())},
+            'values': {name: h.snapshot() for name, h in list(self.values.items())},
+            'counters': dict(list(self.counters.items())),
+            'gauges': dict(list(self.gauges.items())),
+        }
+
+    def to_prometheus(self, prefix='fish', labels=None):
+        """Текстовый формат экспозиции Prometheus (задержки в секундах)"""
+        return to_prometheus([(labels, self)], prefix)
+
+    def _families(self, prefix, labels):
+        """(имя семейства, тип, строки) для экспозиции Prometheus"""
+        base = ','.join(f'{k}="{v}"' for k, v in (labels or {}).items())
+
+        def label_str(*extra):
+            parts = [p for p in (base,) + extra if p]
+            return '{' + ','.join(parts) + '}' if parts else ''
+
+        def histogram(name, hist, label, scale):
+            lines = []
+            cumulative = 0
+            for bound, n in zip(hist.bounds + [None], hist.counts):
+                cumulative += n
+                le = 'le="{}"'.format('+Inf' if bound is None else repr(bound * scale))
+                lines.append(f'{name}_bucket{label_str(label, le)} {cumulative}')
+            lines.append(f'{name}_sum{label_str(label)} {hist.sum * scale!r}')
+            lines.append(f'{name}_count{label_str(label)} {hist.count}')
+            return lines
+
+        name = f'{prefix}_stage_seconds'
+        for stage, hist in list(self.stages.items()):
+            yield name, 'histogram', histogram(name, hist, f'stage="{stage}"', 1e-3)
+        for key, hist in list(self.values.items()):
+            name = f'{prefix}_{key}'
+            yield name, 'histogram', histogram(name, hist, '', 1)
+        for key, value in list(self.counters.items()):
+            name = f'{prefix}_{key}_total'
+            yield name, 'counter', [f'{name}{label_str()} {value}']
+        for key, value in list(self.gauges.items()):
+            name = f'{prefix}_{key}_last'
+            yield name, 'gauge', [f'{name}{label_str()} {value}']
+
+
+def to_prometheus(sources, prefix='fish'):
+    """Экспозиция нескольких Metrics: sources = [(labels, metrics)], семейства сгруппированы"""
+    families = {}
+    for labels, metrics in sources:
+        for name, kind, lines in metrics._families(prefix, labels):
+            families.setdefault(name, (kind, []))[1].extend(lines)
+
+    out = []
+    for name, (kind, lines) in families.items():
+        out.append(f'# TYPE {name} {kind}')
+        out.extend(lines)
+    return '\n'.join(out) + '\n'
@@ -0,0 +1,83 @@
+import cv2
+
+
+class MotionGate:
+    """Дешевая проверка движения по сильно уменьшенному кадру.
+
+    Разность соседних уменьшенных кадров: если доля изменившихся пикселей
+    меньше motion_ratio и живых треков нет, полная детекция пропускается.
+    После движения полный режим держится еще hold_frames кадров. Пока
+    сцена статична, MOG2 обновляется на каждом background_every-м кадре.
+    """
+
+    def __init__(self,
+                 probe_scale: float = 0.125,
+                 pixel_threshold: int = 15,
+                 motion_ratio: float = 0.002,
+                 hold_frames: int = 10,
+                 background_every: int = 5):
+        self.probe_scale = probe_scale
+        self.pixel_threshold = pixel_threshold
+        self.motion_ratio = motion_ratio
+        self.hold_frames = hold_frames
+        self.background_every = max(1, background_every)
+
+        self.buffers = {}
+        self.prev = None
+        self.hold = 0
+        self.idle_run = 0
+        self.frames = 0
+        self.skipped = 0
+        self.background_updates = 0
+
+    def _probe(self, frame):
+        buf = self.buffers
+        tiny = buf['tiny'] = cv2.resize(frame, None, dst=buf.get('tiny'), fx=self.probe_scale,
+                                        fy=self.probe_scale, interpolation=cv2.INTER_AREA)
+        # Два серых буфера по очереди: текущий и предыдущий кадр
+        slot = 'gray_a' if self.prev is not buf.get('gray_a') else 'gray_b'
+        if tiny.ndim == 2:
+            # Серый кадр: уменьшенная копия (буфер tiny перезапишется следующим кадром)
+            buf[slot] = tiny.copy()
+        else:
+            buf[slot] = cv2.cvtColor(tiny, cv2.COLOR_BGR2GRAY, dst=buf.get(slot))
+        return buf[slot]
+
+    def check(self, frame, busy: bool = False):
+        """True - кадр нужно обработать полностью; busy - у трекера есть живые треки"""
+        gray = self._probe(frame)
+        motion = True
+        if self.prev is not None:
+            buf = self.buffers
+            buf['diff'] = cv2.absdiff(gray, self.prev, dst=buf.get('diff'))
+            _, buf['changed'] = cv2.threshold(buf['diff'], self.pixel_threshold, 255, cv2.THRESH_BINARY,
+                                              dst=buf.get('changed'))
+            motion = cv2.countNonZero(buf['changed']) > self.motion_ratio * gray.size
+        self.prev = gray
+        self.frames += 1
+
+        if motion or busy:
+            self.hold = self.hold_frames
+            self.idle_run = 0
+            return True
+        if self.hold > 0:
+            self.hold -= 1
+            return True
+
+        self.skipped += 1
+        self.idle_run += 1
+        return False
+
+    def background_due(self):
+        """Нужно ли на этом пропущенном кадре обновить фоновую модель"""
+        due = self.idle_run % self.background_every == 0
+        self.background_updates += due
+        return due
+
+    def background_rate(self, learning_rate):
+        """Скорость обучения MOG2, эквивалентная background_every обновлениям подряд"""
+        return 1.0 - (1.0 - learning_rate) ** self.background_every
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.frames if self.frames else 0.0
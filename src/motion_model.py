@@ -0,0 +1,55 @@
+import numpy as np
+
+MOTION_MODELS = ('none', 'kalman')
+
+# Состояние [x, y, vx, vy], шаг - один кадр
+_F = np.array([[1, 0, 1, 0],
+               [0, 1, 0, 1],
+               [0, 0, 1, 0],
+               [0, 0, 0, 1]], dtype=np.float64)
+
+
+class ConstantVelocityKalman:
+    """Фильтр Калмана с постоянной скоростью сразу для всех треков.
+
+    Состояния (N, 4) и ковариации (N, 4, 4) хранятся в TrackStore; здесь
+    только шаги predict/update над их срезами. process_noise - дисперсия
+    ускорения (пикс/кадр^2), measurement_noise - дисперсия центра детекции,
+    init_velocity_var - неопределенность скорости нового трека.
+    """
+
+    def __init__(self, process_noise: float = 4.0, measurement_noise: float = 25.0,
+                 init_velocity_var: float = 900.0):
+        q = process_noise
+        self.Q = q * np.array([[0.25, 0, 0.5, 0],
+                               [0, 0.25, 0, 0.5],
+                               [0.5, 0, 1, 0],
+                               [0, 0.5, 0, 1]], dtype=np.float64)
+        self.R = measurement_noise * np.eye(2)
+        self.P0 = np.diag([measurement_noise, measurement_noise, init_velocity_var, init_velocity_var])
+
+    def initiate(self, centers):
+        """Начальные состояния (нулевая скорость) и ковариации для центров (N, 2)"""
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        state = np.zeros((len(centers), 4))
+        state[:, :2] = centers
+        return state, np.broadcast_to(self.P0, (len(centers), 4, 4)).copy()
+
+    def predict(self, state, cov):
+        state = state @ _F.T
+        cov = _F @ cov @ _F.T + self.Q
+        return state, cov
+
+    def update(self, state, cov, centers):
+        """Коррекция по измеренным центрам (N, 2)"""
+        innovation = np.asarray(centers, dtype=np.float64) - state[:, :2]
+        S = cov[:, :2, :2] + self.R
+        K = cov[:, :, :2] @ np.linalg.inv(S)
+        state = state + (K @ innovation[:, :, None])[:, :, 0]
+        cov = cov - K @ cov[:, :2, :]
+        return state, cov
+
+    @staticmethod
+    def position_sigma(cov):
+        """Неопределенность предсказанной позиции, пикс"""
+        return np.sqrt(cov[:, 0, 0] + cov[:, 1, 1])
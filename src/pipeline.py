@@ -1,8 +1,25 @@
-import cv2
+import json
+from itertools import islice
+from typing import NamedTuple
+
+import numpy as np
 
 from src.counter import FishCounter
 from src.detector import FishDetector
+from src.instrumentation import Metrics
+from src.motion_gate import MotionGate
 from src.tracker import FishTracker
+from src.zones import parse_zones
+
+
+# Бокс детекции с номером кадра (результат process_frames)
+DETECTION_DTYPE = np.dtype([('frame', '<i8'), ('x', '<i4'), ('y', '<i4'), ('w', '<i4'), ('h', '<i4')])
+
+
+class BatchResult(NamedTuple):
+    detections: np.ndarray     # DETECTION_DTYPE, все боксы пачки
+    totals: np.ndarray         # (N,) счет после каждого кадра
+    active_tracks: np.ndarray  # (N,) число активных треков после каждого кадра
 
 
 class FishDetectionPipeline:
@@ -24,9 +41,37 @@ class FishDetectionPipeline:
                  max_distance=300,
                  iou_threshold=0.3,
                  min_hits=10,
-                 visualize: bool = True):
+                 assignment: str = 'greedy',
+                 motion_model: str = 'none',
+                 gate_radius: int = 80,
+                 scale: float = 1.0,
+                 roi_margin: int = None,
+                 zones: list = None,
+                 backend: str = 'contours',
+                 motion_gate: bool = False,
+                 motion_ratio: float = 0.002,
+                 background_every: int = 5,
+                 metrics: bool = False,
+                 reuse_buffers: bool = False,
+                 visualize: bool = True,
+                 crossing_log: str = None,
+                 with_detector: bool = True):
+        count_line_x = int(frame_width * count_line_ratio)
+        # Зоны подсчета (линии и многоугольники, см. src/zones.py) вместо линии count_line_x
+        zones = parse_zones(zones) if zones else None
+
+        # Детекция только в полосе ±roi_margin пикселей вокруг линии подсчета (или по ширине всех зон)
+        roi = None
+        if roi_margin is not None:
+            if zones:
+                xs = [p[0] for z in zones for p in (z.points if z.kind == 'polygon' else (z.p1, z.p2))]
+                low, high = min(xs), max(xs)
+            else:
+                low = high = count_line_x
+            roi = (max(0, low - roi_margin), min(frame_width, high + roi_margin))
 
-        self.detector = FishDetector(
+        # Параметры детектора сохраняем, чтобы его можно было пересоздать в другом процессе
+        self.detector_params = dict(
             history=history,
             varThreshold=varThreshold,
             min_area=min_area,
@@ -36,32 +81,119 @@ class FishDetectionPipeline:
             morph_kernel=morph_kernel,
             g_blur=g_blur,
             learning_rate=learning_rate,
-            merge_threshold=merge_threshold
+            merge_threshold=merge_threshold,
+            scale=scale,
+            roi=roi,
+            backend=backend
         )
+        # Без детектора - только трекинг и подсчет готовых боксов (детекция в другом процессе)
+        # reuse_buffers: маска из process_frame - буфер детектора, перезаписываемый следующим кадром
+        self.detector = FishDetector(**self.detector_params, reuse_buffers=reuse_buffers) if with_detector else None
         self.tracker = FishTracker(
             max_disappeared=max_disappeared,
             max_distance=max_distance,
             iou_threshold=iou_threshold,
-            min_hits=min_hits
+            min_hits=min_hits,
+            assignment=assignment,
+            flow=direction,
+            motion_model=motion_model,
+            gate_radius=gate_radius
         )
         self.counter = FishCounter(
-            count_line_x=int(frame_width * count_line_ratio),
+            count_line_x=count_line_x,
             direction=direction,
-            min_frames=3
+            min_frames=3,
+            zones=zones,
+            log_path=crossing_log
         )
+        # Пропуск детекции на статичной сцене (None - каждый кадр полностью)
+        self.motion_gate = MotionGate(motion_ratio=motion_ratio,
+                                      background_every=background_every) if motion_gate else None
+        # Общие метрики всех этапов; включаются на ходу через self.metrics.enable()
+        self.metrics = Metrics(enabled=metrics)
+        self.tracker.metrics = self.counter.metrics = self.metrics
+        if self.detector is not None:
+            self.detector.metrics = self.metrics
         self.frame_count = 0
         self.visualize = visualize
+        # Отрисовка в отдельном потоке (attach_renderer), не чаще его max_fps
+        self.renderer = None
+
+    @classmethod
+    def from_config(cls, config, frame_width, **overrides):
+        """Конвейер по конфигурации: dict или путь к JSON.
+
+        Берется блок "pipeline", если он есть (формат data/manifest.json),
+        overrides - поверх него.
+        """
+        if isinstance(config, str):
+            with open(config, encoding='utf-8') as f:
+                config = json.load(f)
+        params = dict(config.get('pipeline', config))
+        params.update(overrides)
+        return cls(frame_width=frame_width, **params)
+
+    def _state_key(self):
+        """Параметры, при которых снимок состояния применим к этому конвейеру"""
+        return json.dumps({'detector': self.detector_params,
+                           'zones': [zone.spec() for zone in self.counter.zones]}, sort_keys=True)
+
+    def snapshot(self):
+        """Состояние конвейера - копии массивов: фон MOG2, треки и счетчик (см. src/checkpoint.py)"""
+        state = {'frame_count': np.int64(self.frame_count), 'key': np.array(self._state_key())}
+        # Без детектора (стадия трекинга StagedPipeline) фон хранит процесс детекции
+        background = self.detector.background() if self.detector is not None else None
+        if background is not None:
+            state['background'] = background
+        state.update({f'tracker.{k}': v for k, v in self.tracker.state().items()})
+        state.update({f'counter.{k}': v for k, v in self.counter.state().items()})
+        return state
+
+    def restore(self, state):
+        """Восстановление из snapshot(); ValueError, если снимок от конвейера с другими параметрами"""
+        if str(state['key']) != self._state_key():
+            raise ValueError("Снимок состояния сделан конвейером с другими параметрами")
+        if 'background' in state and self.detector is not None:
+            self.detector.restore_background(state['background'])
+        for prefix, component in (('tracker.', self.tracker), ('counter.', self.counter)):
+            component.load_state({k[len(prefix):]: v for k, v in state.items() if k.startswith(prefix)})
+        self.frame_count = int(state['frame_count'])
+
+    def close(self):
+        """Освобождает файлы конвейера (журнал пересечений crossing_log)"""
+        self.counter.close()
+
+    def attach_renderer(self, renderer):
+        """Подключает Renderer (None - отключить); возвращаемые process_frame значения не меняются"""
+        self.renderer = renderer
+
+    def _require_detector(self):
+        if self.detector is None:
+            raise RuntimeError("Конвейер создан с with_detector=False: кадры обрабатывает "
+                               "процесс детекции, сюда передаются боксы (tracker.update)")
 
     def process_frame(self, frame):
         """Обработка одного кадра"""
-        # 1. Детекция
-        bboxes, mask, contours, processed_frame = self.detector.detect(frame)
+        self._require_detector()
+        metrics = self.metrics
+        start = metrics.clock()
+
+        # 1. Детекция (на статичной сцене без живых треков - только редкое обновление фона)
+        gate = self.motion_gate
+        if gate is not None and not gate.check(frame, busy=len(self.tracker.tracks) > 0):
+            bboxes, mask, contours, processed_frame = self.detector.skip(frame, gate)
+            metrics.inc('frames_skipped')
+        else:
+            bboxes, mask, contours, processed_frame = self.detector.detect(frame)
 
         # 2. Трекинг
+        t = metrics.clock()
         tracks = self.tracker.update(bboxes)
+        t = metrics.lap('track', t)
 
         # 3. Подсчет
         total_fish = self.counter.update(tracks)
+        t = metrics.lap('count', t)
 
         # 4. Визуализация
         if self.visualize:
@@ -69,10 +201,18 @@ class FishDetectionPipeline:
                 processed_frame, tracks, contours,
                 mask, total_fish
             )
+            t = metrics.lap('visualize', t)
         else:
             result_frame = None
+        renderer = self.renderer
+        if renderer is not None and renderer.wants_frame():
+            from src.renderer import make_snapshot
+            renderer.submit(make_snapshot(self, processed_frame, tracks, contours, total_fish))
+            metrics.lap('snapshot', t)
 
         self.frame_count += 1
+        metrics.lap('frame', start)
+        metrics.inc('frames')
 
         # Возвращаем разные значения в зависимости от визуализации
         if self.visualize:
@@ -80,59 +220,60 @@ class FishDetectionPipeline:
         else:
             return mask, total_fish, tracks, bboxes
 
+    def process_frames(self, frames, batch_size: int = 32):
+        """Пакетная обработка: массив (N, H, W, 3) / (N, H, W) или итератор кадров.
+
+        Серый для всей пачки - один вызов cvtColor; CLAHE, размытие и MOG2
+        идут по кадрам (сетка CLAHE и края размытия у каждого кадра свои,
+        MOG2 последователен). Результат не зависит от visualize: кадры без
+        отрисовки, BatchResult с боксами и счетом по кадрам. Номера кадров
+        продолжают frame_count конвейера.
+        """
+        self._require_detector()
+        detections, totals, active = [], [], []
+        for batch in self._batches(frames, batch_size):
+            self._process_batch(batch, detections, totals, active)
+
+        boxes = np.array(detections, dtype=DETECTION_DTYPE) if detections else np.empty(0, dtype=DETECTION_DTYPE)
+        return BatchResult(boxes, np.array(totals, dtype=np.int64), np.array(active, dtype=np.int64))
+
+    @staticmethod
+    def _batches(frames, batch_size):
+        if isinstance(frames, np.ndarray):
+            for start in range(0, len(frames), batch_size):
+                yield frames[start:start + batch_size]
+            return
+        frames = iter(frames)
+        while True:
+            chunk = list(islice(frames, batch_size))
+            if not chunk:
+                return
+            yield np.stack(chunk)
+
+    def _process_batch(self, batch, detections, totals, active):
+        metrics = self.metrics
+        t = metrics.clock()
+        grays = self.detector.gray_batch(batch)
+        metrics.lap('gray_batch', t)
+        gate = self.motion_gate
+
+        for frame, gray in zip(batch, grays):
+            if gate is not None and not gate.check(frame, busy=len(self.tracker.tracks) > 0):
+                bboxes = self.detector.skip(frame, gate)[0]
+                metrics.inc('frames_skipped')
+            else:
+                bboxes = self.detector.detect_gray(gray)
+
+            tracks = self.tracker.update(bboxes)
+            totals.append(self.counter.update(tracks))
+            active.append(len(tracks))
+            detections.extend((self.frame_count, *bbox) for bbox in bboxes)
+            self.frame_count += 1
+
+        metrics.inc('frames', len(batch))
+
     def _visualize(self, frame, tracks, contours, mask, total_fish):
         """Визуализация результатов (только если visualize=True)"""
-        display = frame.copy()
-
-        # Линия подсчета
-        cv2.line(display,
-                 (self.counter.count_line_x, 0),
-                 (self.counter.count_line_x, frame.shape[0]),
-                 (0, 255, 255), 3)
-
-        # Контуры
-        for contour in contours:
-            if cv2.contourArea(contour) > 500:
-                cv2.drawContours(display, [contour], -1, (0, 255, 0), 1)
-
-        # Треки
-        for track_id, track in tracks.items():
-            # Bbox
-            x, y, w, h = track['bbox']
-            color = (0, 255, 0) if track_id not in self.counter.counted_ids else (0, 0, 255)
-            cv2.rectangle(display, (x, y), (x + w, y + h), color, 2)
-
-            # ID и возраст
-            cv2.putText(display, f"ID:{track_id}",
-                        (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-
-            # Линия пути
-            centroids = track.get('centroids', [])
-            if len(centroids) > 1:
-                for i in range(1, len(centroids)):
-                    cv2.line(display, centroids[i - 1], centroids[i], (255, 255, 0), 1)
-
-            # Центр
-            center = track['center']
-            cv2.circle(display, center, 4, color, -1)
-
-            # Статус подсчета
-            if track_id in self.counter.counted_ids:
-                cv2.putText(display, "COUNTED",
-                            (x, y + h + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-
-        # Информационная панель
-        info_y = 30
-        cv2.putText(display, f"Total: {total_fish}",
-                    (10, info_y), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-        cv2.putText(display, f"Active tracks: {len(tracks)}",
-                    (10, info_y + 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        cv2.putText(display, f"Frame: {self.frame_count}",
-                    (10, info_y + 90), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
-
-        # Координата линии
-        cv2.putText(display, f"Line X: {self.counter.count_line_x}",
-                    (self.counter.count_line_x - 100, 30),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-
-        return display
\ No newline at end of file
+        # Отрисовка нужна не всем командам: модуль грузится при первом кадре с визуализацией
+        from src.renderer import draw, make_snapshot
+        return draw(make_snapshot(self, frame, tracks, contours, total_fish))
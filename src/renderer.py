@@ -0,0 +1,227 @@
+import threading
+import time
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+
+class TrackSnapshot(NamedTuple):
+    """Все, что нужно для отрисовки кадра, без ссылок на изменяемое состояние конвейера"""
+    frame_index: int
+    image: np.ndarray      # собственная копия кадра (BGR), рисуем прямо в ней
+    ids: np.ndarray        # (K,) id активных треков
+    bboxes: np.ndarray     # (K, 4)
+    counted: np.ndarray    # (K,) bool
+    paths: list            # K массивов (L, 2) центров
+    contours: list
+    total: int
+    zones: list            # зоны счетчика (неизменяемые)
+    zone_counts: np.ndarray  # (Z, 2) счета зон вперед / назад
+
+
+def make_snapshot(pipeline, frame, tracks, contours, total_fish):
+    """Снимок состояния конвейера после обработки кадра"""
+    slots = tracks.slots
+    # Площади уже посчитаны детектором при фильтрации (у конвейера без детектора контуров нет)
+    areas = pipeline.detector.contour_areas if pipeline.detector is not None else ()
+    large = [c for c, area in zip(contours, areas) if area > 500]
+    image = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR) if frame.ndim == 2 else frame.copy()
+    return TrackSnapshot(
+        frame_index=pipeline.frame_count,
+        image=image,
+        ids=tracks.ids[slots].copy(),
+        bboxes=tracks.bbox[slots].copy(),
+        counted=pipeline.counter.is_counted(tracks, slots),
+        paths=[tracks.centroids(slot) for slot in slots.tolist()],
+        contours=large,
+        total=int(total_fish),
+        zones=pipeline.counter.zones,
+        zone_counts=pipeline.counter.zone_counts.copy(),
+    )
+
+
+def draw(snapshot):
+    """Отрисовка снимка (в snapshot.image)"""
+    display = snapshot.image
+
+    # Зоны подсчета
+    _draw_zones(display, snapshot.zones)
+
+    # Контуры
+    cv2.drawContours(display, snapshot.contours, -1, (0, 255, 0), 1)
+
+    # Треки
+    for track_id, bbox, is_counted, centroids in zip(snapshot.ids.tolist(), snapshot.bboxes.tolist(),
+                                                      snapshot.counted.tolist(), snapshot.paths):
+        # Bbox
+        x, y, w, h = bbox
+        color = (0, 0, 255) if is_counted else (0, 255, 0)
+        cv2.rectangle(display, (x, y), (x + w, y + h), color, 2)
+
+        # ID и возраст
+        cv2.putText(display, f"ID:{track_id}",
+                    (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+        # Линия пути
+        if len(centroids) > 1:
+            cv2.polylines(display, [centroids.astype(np.int32)], False, (255, 255, 0), 1)
+
+        # Центр
+        center = tuple(centroids[-1].tolist())
+        cv2.circle(display, center, 4, color, -1)
+
+        # Статус подсчета
+        if is_counted:
+            cv2.putText(display, "COUNTED",
+                        (x, y + h + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+
+    # Информационная панель
+    info_y = 30
+    cv2.putText(display, f"Total: {snapshot.total}",
+                (10, info_y), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+    cv2.putText(display, f"Active tracks: {len(snapshot.ids)}",
+                (10, info_y + 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    cv2.putText(display, f"Frame: {snapshot.frame_index}",
+                (10, info_y + 90), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+
+    # Подписи зон поверх треков
+    _label_zones(display, snapshot.zones, snapshot.zone_counts)
+
+    return display
+
+
+def _draw_zones(display, zones):
+    for zone in zones:
+        if zone.kind == 'polygon':
+            cv2.polylines(display, [np.array(zone.points, dtype=np.int32)], True, (0, 255, 255), 2)
+        elif zone.infinite:
+            # Вертикальная линия count_line_x на всю высоту кадра
+            cv2.line(display, (zone.p1[0], 0), (zone.p1[0], display.shape[0]), (0, 255, 255), 3)
+        else:
+            cv2.line(display, zone.p1, zone.p2, (0, 255, 255), 3)
+
+
+def _label_zones(display, zones, zone_counts):
+    for zone, (forward, backward) in zip(zones, zone_counts.tolist()):
+        if zone.kind == 'line' and zone.infinite:
+            # Координата линии
+            line_x = zone.p1[0]
+            cv2.putText(display, f"Line X: {line_x}",
+                        (line_x - 100, 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+            continue
+        x, y = zone.points[0] if zone.kind == 'polygon' else zone.p1
+        cv2.putText(display, f"{zone.name}: {forward}/{backward}",
+                    (x + 5, max(15, y - 8)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+
+
+class Renderer:
+    """Отрисовка в отдельном потоке с частотой не выше max_fps.
+
+    Конвейер отдает снимки через submit() не чаще max_fps (wants_frame);
+    поток рисует только последний снимок, устаревшие сбрасываются, и пишет
+    его в output_path с частотой output_fps (по умолчанию max_fps). Окно
+    (show=True) HighGUI на многих платформах работает только из главного
+    потока, поэтому нарисованный кадр показывает poll(), который вызывает
+    цикл обработки. Без окна - безголовый режим.
+    """
+
+    def __init__(self, max_fps: float = 20, show: bool = True, output_path: str = None,
+                 output_fps: float = None, window: str = 'Detection'):
+        self.interval = 1.0 / max_fps
+        self.show = show
+        self.output_path = output_path
+        self.output_fps = output_fps or max_fps
+        self.window = window
+        self.writer = None
+
+        self.cond = threading.Condition()
+        self.pending = None
+        # Последний нарисованный кадр для окна; забирает poll() в главном потоке
+        self.display = None
+        self.window_open = False
+        self.next_due = 0.0
+        self.running = False
+        self.quit_requested = False
+        self.thread = None
+        self.submitted = 0
+        self.rendered = 0
+        self.dropped = 0
+
+    def wants_frame(self):
+        """Нужен ли снимок сейчас: иначе конвейер его даже не собирает"""
+        return time.monotonic() >= self.next_due
+
+    def submit(self, snapshot):
+        with self.cond:
+            if self.pending is not None:
+                self.dropped += 1
+            self.pending = snapshot
+            self.submitted += 1
+            self.next_due = time.monotonic() + self.interval
+            self.cond.notify()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='renderer', daemon=True)
+        self.thread.start()
+        return self
+
+    def poll(self):
+        """Показ последнего нарисованного кадра и опрос клавиатуры (только из главного потока).
+
+        Возвращает True, если в окне нажата 'q'.
+        """
+        if not self.show:
+            return self.quit_requested
+        with self.cond:
+            image, self.display = self.display, None
+        if image is not None:
+            cv2.imshow(self.window, image)
+            self.window_open = True
+        # waitKey без окна не нужен, а в безголовой сборке OpenCV он падает
+        if self.window_open and cv2.waitKey(1) & 0xFF == ord('q'):
+            self.quit_requested = True
+        return self.quit_requested
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.window_open:
+            cv2.destroyWindow(self.window)
+            self.window_open = False
+
+    def _run(self):
+        try:
+            while True:
+                with self.cond:
+                    while self.pending is None and self.running:
+                        self.cond.wait()
+                    snapshot, self.pending = self.pending, None
+                    if snapshot is None:
+                        break
+                self._output(draw(snapshot))
+                self.rendered += 1
+        finally:
+            if self.writer is not None:
+                self.writer.release()
+                self.writer = None
+
+    def _output(self, image):
+        if self.output_path is not None:
+            if self.writer is None:
+                height, width = image.shape[:2]
+                self.writer = cv2.VideoWriter(self.output_path, cv2.VideoWriter_fourcc(*'mp4v'),
+                                              self.output_fps, (width, height))
+            self.writer.write(image)
+        if self.show:
+            with self.cond:
+                self.display = image
+
+    def stats(self):
+        return {'submitted': self.submitted, 'rendered': self.rendered, 'dropped': self.dropped}
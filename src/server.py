@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.cv_runtime import auto_threads, configure_opencv, split_opencv_params
+from src.ingestion import CameraSource, FileSource
+from src.instrumentation import to_prometheus
+from src.pipeline import FishDetectionPipeline
+
+
+def open_source(source):
+    """Индекс устройства, путь к файлу или URL потока"""
+    if isinstance(source, int) or str(source).isdigit():
+        return CameraSource(int(source))
+    if os.path.exists(source):
+        # Темп реального времени для файла задает цикл событий, а не sleep в потоке пула
+        return FileSource(source, realtime=False)
+    return CameraSource(source)
+
+
+class CameraWorker:
+    """Один конвейер на камеру и его текущие показатели"""
+
+    def __init__(self, name, source, pipeline_params=None):
+        self.name = name
+        self.source_name = source
+        self.source = open_source(source)
+        self.pace_fps = self.source.fps if isinstance(self.source, FileSource) else None
+        # Маска кадра не хранится - буферы детектора переиспользуются
+        self.pipeline = FishDetectionPipeline(frame_width=self.source.frame_width, visualize=False,
+                                              **dict(pipeline_params or {}, reuse_buffers=True))
+        self.total_fish = 0
+        self.frames = 0
+        self.fps = 0.0
+        self.busy_sec = 0.0
+        self.started = time.monotonic()
+        self.running = True
+        self.error = None
+
+    def step(self):
+        """Чтение и обработка одного кадра (выполняется в пуле потоков)"""
+        ret, frame = self.source.read()
+        if not ret:
+            return False
+        start = time.perf_counter()
+        _, self.total_fish, _, _ = self.pipeline.process_frame(frame)
+        elapsed = time.perf_counter() - start
+
+        self.frames += 1
+        self.busy_sec += elapsed
+        # Скользящее среднее FPS обработки
+        current = 1.0 / elapsed if elapsed > 0 else 0.0
+        self.fps = current if self.frames == 1 else 0.95 * self.fps + 0.05 * current
+        return True
+
+    def status(self):
+        return {
+            'source': str(self.source_name),
+            'running': self.running,
+            'total_fish': int(self.total_fish),
+            'frames': self.frames,
+            'fps': round(self.fps, 1),
+            'uptime_sec': round(time.monotonic() - self.started, 1),
+            'error': self.error,
+        }
+
+
+class CameraService:
+    """Asyncio-сервис: N конвейеров в одном процессе и HTTP/JSON с их состоянием.
+
+    OpenCV отпускает GIL, поэтому тяжелая работа идет в пуле потоков.
+    У каждой камеры в пуле не больше одной задачи, а очередь пула FIFO:
+    загруженная камера встает в конец очереди и не может вытеснить другие.
+    """
+
+    def __init__(self, workers: int = None):
+        self.executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count(), thread_name_prefix='camera')
+        self.cameras = {}
+        self.tasks = {}
+
+    async def add_camera(self, name, source, pipeline_params=None):
+        if name in self.cameras:
+            raise ValueError(f"Камера {name} уже добавлена")
+        loop = asyncio.get_running_loop()
+        # Открытие RTSP-потока может занимать секунды - не блокируем цикл событий
+        worker = await loop.run_in_executor(self.executor, CameraWorker, name, source, pipeline_params)
+        self.cameras[name] = worker
+        self.tasks[name] = asyncio.create_task(self._run_camera(worker))
+        return worker
+
+    async def remove_camera(self, name):
+        worker = self.cameras.pop(name)
+        worker.running = False
+        task = self.tasks.pop(name)
+        await task
+
+    async def _run_camera(self, worker):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            while worker.running:
+                if worker.pace_fps:
+                    delay = started + worker.frames / worker.pace_fps - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                if not await loop.run_in_executor(self.executor, worker.step):
+                    break
+        except Exception as e:
+            worker.error = repr(e)
+        finally:
+            worker.running = False
+            worker.source.release()
+            worker.pipeline.close()
+
+    def status(self):
+        return {name: worker.status() for name, worker in self.cameras.items()}
+
+    async def handle_http(self, reader, writer):
+        """Минимальный HTTP: GET /cameras, GET /cameras/<name>, POST /cameras, DELETE /cameras/<name>.
+
+        Метрики: GET /metrics (Prometheus), GET /cameras/<name>/metrics (JSON),
+        POST /cameras/<name>/metrics {"enabled": true|false} - включение на ходу.
+        """
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                key, _, value = line.partition(':')
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+            method, path = request_line[0], request_line[1].rstrip('/')
+            code, payload = await self._route(method, path, body)
+        except Exception as e:
+            code, payload = 400, {'error': repr(e)}
+
+        if isinstance(payload, str):
+            data = payload.encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        reason = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found'}.get(code, 'Error')
+        writer.write(f"HTTP/1.1 {code} {reason}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode('latin-1') + data)
+        await writer.drain()
+        writer.close()
+
+    async def _route(self, method, path, body):
+        parts = [p for p in path.split('/') if p]
+        if parts == ['metrics'] and method == 'GET':
+            return 200, to_prometheus([({'camera': name}, worker.pipeline.metrics)
+                                       for name, worker in self.cameras.items()])
+        if not parts or parts[0] != 'cameras':
+            return 404, {'error': 'not found'}
+
+        if len(parts) == 1:
+            if method == 'GET':
+                return 200, self.status()
+            if method == 'POST':
+                spec = json.loads(body or b'{}')
+                worker = await self.add_camera(spec['name'], spec['source'], spec.get('pipeline'))
+                return 201, {spec['name']: worker.status()}
+
+        name = parts[1]
+        if name not in self.cameras:
+            return 404, {'error': f'нет камеры {name}'}
+        if parts[2:] == ['metrics']:
+            metrics = self.cameras[name].pipeline.metrics
+            if method == 'POST':
+                metrics.enabled = bool(json.loads(body or b'{}').get('enabled', True))
+            return 200, metrics.snapshot()
+        if method == 'GET':
+            return 200, self.cameras[name].status()
+        if method == 'DELETE':
+            await self.remove_camera(name)
+            return 200, {'removed': name}
+        return 400, {'error': f'метод {method} не поддерживается'}
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        server = await asyncio.start_server(self.handle_http, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+async def _main(args):
+    service = CameraService(workers=args.workers)
+    pipeline_params = {}
+    if args.config:
+        with open(args.config, encoding='utf-8') as f:
+            pipeline_params = json.load(f).get('pipeline', {})
+    # Конвейеры камер работают в одном процессе: делим между ними потоки OpenCV
+    pipeline_params, (threads, optimized) = split_opencv_params(pipeline_params)
+    configure_opencv(auto_threads(len(args.camera)) if threads is None else threads, optimized)
+    if args.metrics:
+        pipeline_params['metrics'] = True
+
+    for spec in args.camera:
+        name, _, source = spec.partition('=')
+        await service.add_camera(name, source, pipeline_params)
+
+    print(f"Сервис камер: http://{args.host}:{args.port}/cameras")
+    await service.serve(args.host, args.port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Подсчет рыб с нескольких камер в одном процессе')
+    parser.add_argument('--camera', action='append', default=[], help='имя=источник (индекс, файл или URL)')
+    parser.add_argument('--config', help='JSON с блоком "pipeline" (например, data/manifest.json)')
+    parser.add_argument('--metrics', action='store_true', help='включить поэтапные метрики с запуска')
+    parser.add_argument('--workers', type=int, default=None, help='размер пула потоков OpenCV')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from src.cv_runtime import auto_threads, configure_opencv, split_opencv_params
+from src.evaluation import load_manifest
+from src.ingestion import GrayCapture
+from src.pipeline import FishDetectionPipeline
+from src.zones import DIRECTION_NAMES
+
+# Пересечение в шарде: кадр видео, y центра трека, направление (+1 вправо / в зону, -1 назад) и зона
+SHARD_EVENT_DTYPE = np.dtype([('frame', '<i8'), ('y', '<f4'), ('direction', 'i1'), ('zone', '<i2')])
+
+
+def plan_shards(n_frames, n_shards, min_frames: int = 0):
+    """Границы шардов [(lo, hi)]; у последнего hi=None - до конца видео.
+
+    Шардов не больше, чем помещается по min_frames кадров (прогрев
+    и хвост не должны занимать большую часть работы).
+    """
+    if n_frames <= 0:
+        return [(0, None)]
+    n_shards = max(1, min(n_shards, n_frames // max(1, min_frames)))
+    bounds = np.linspace(0, n_frames, n_shards + 1).astype(int).tolist()
+    return [(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:-1] + [None])]
+
+
+def _new_events(log, seen, tracks, frame_index):
+    """События журнала счетчика с номера seen: (кадр, y, направление, зона)"""
+    slots = tracks.slots
+    ys = dict(zip(tracks.ids[slots].tolist(), tracks.last_centers(slots)[:, 1].tolist()))
+    capacity = len(log.events)
+    events = []
+    for i in range(seen, log.size):
+        event = log.events[i % capacity]
+        events.append((frame_index, ys[int(event['track_id'])], int(event['direction']), int(event['zone'])))
+    return events
+
+
+def process_shard(video_path, lo, hi, pipeline_params, warmup_frames: int = 300, guard_frames: int = 60,
+                  gray_decode: bool = False, full_range: bool = None, gray_raw: bool = True):
+    """Прогон шарда [lo, hi) в отдельном конвейере.
+
+    Кадры [lo - warmup_frames, lo) прогревают MOG2 и трекер, после hi
+    обработка идет еще guard_frames кадров. Возвращает события пересечений
+    в [lo - guard_frames, hi + guard_frames) - по ним stitch сшивает границы.
+    Позиционирование через CAP_PROP_POS_FRAMES: контейнер должен
+    поддерживать точный переход к кадру (для MJPG/AVI и MKV через FFmpeg - да).
+    full_range и gray_raw - диапазон яркости и режим GrayCapture (full_range=None -
+    определить по видео).
+    """
+    cap = GrayCapture(video_path, full_range, gray_raw) if gray_decode else cv2.VideoCapture(video_path)
+    frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    pipeline = FishDetectionPipeline(frame_width=frame_width, visualize=False,
+                                     **dict(pipeline_params, reuse_buffers=True))
+    log = pipeline.counter.log
+
+    first = max(0, lo - warmup_frames)
+    if first:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    stop = None if hi is None else hi + guard_frames
+    record_from = lo - guard_frames
+
+    events = []
+    index = first
+    seen = 0
+    start = time.perf_counter()
+    while stop is None or index < stop:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        _, _, tracks, _ = pipeline.process_frame(frame)
+        if log.size != seen:
+            if index >= record_from:
+                events.extend(_new_events(log, seen, tracks, index))
+            seen = log.size
+        index += 1
+    sec = time.perf_counter() - start
+    cap.release()
+
+    # Границы по фактически прочитанным кадрам: CAP_PROP_FRAME_COUNT бывает завышен,
+    # и шард за концом видео становится пустым (lo == hi, frames == 0)
+    return {
+        'lo': min(lo, index),
+        'hi': index if hi is None else min(hi, index),
+        'first': first,
+        'frames': index - first,
+        'sec': sec,
+        'events': np.array(events, dtype=SHARD_EVENT_DTYPE),
+        'zones': [(zone.name, zone.kind) for zone in pipeline.counter.zones],
+    }
+
+
+def _match(a, b, guard_frames, y_tolerance):
+    """Жадное сопоставление событий двух шардов по близости кадра: [(i, j)]"""
+    candidates = []
+    for i, ea in enumerate(a):
+        for j, eb in enumerate(b):
+            df = abs(int(ea['frame']) - int(eb['frame']))
+            if (ea['direction'] == eb['direction'] and ea['zone'] == eb['zone'] and df <= guard_frames
+                    and abs(float(ea['y']) - float(eb['y'])) <= y_tolerance):
+                candidates.append((df, i, j))
+    candidates.sort()
+    used_a, used_b, pairs = set(), set(), []
+    for _, i, j in candidates:
+        if i not in used_a and j not in used_b:
+            used_a.add(i)
+            used_b.add(j)
+            pairs.append((i, j))
+    return pairs
+
+
+def stitch(shards, guard_frames: int = 60, y_tolerance: float = 40.0):
+    """Итоговый счет по шардам: {'zones', 'counts', 'total', 'stitched'}.
+
+    zones - счета по зонам (имя -> {направление: счет}, имена направлений
+    из DIRECTION_NAMES), counts - по направлениям всех зон, как
+    FishCounter.counts. Шард владеет пересечениями в своем [lo, hi). Около
+    границы одна и та же рыба может попасть в оба шарда с разницей в
+    несколько кадров, поэтому события соседей в окне ±guard_frames
+    сопоставляются (та же зона и направление, y ближе y_tolerance) и
+    засчитываются ровно один раз. Пересечение, которое после границы видел
+    только предыдущий шард (у следующего трек еще не набрал min_hits за
+    прогрев), тоже засчитывается.
+    """
+    zones = shards[0]['zones']
+    # Счета (зона, направление): столбец 0 - +1, столбец 1 - -1
+    counts = np.zeros((len(zones), 2), dtype=np.int64)
+
+    def add(events, n=1):
+        np.add.at(counts, (events['zone'], (events['direction'] < 0).astype(np.intp)), n)
+
+    for shard in shards:
+        events = shard['events']
+        add(events[(events['frame'] >= shard['lo']) & (events['frame'] < shard['hi'])])
+
+    stitched = 0
+    for prev, nxt in zip(shards, shards[1:]):
+        boundary = nxt['lo']
+        window = []
+        for shard in (prev, nxt):
+            events = shard['events']
+            window.append(events[np.abs(events['frame'] - boundary) <= guard_frames])
+        a, b = window
+        pairs = _match(a, b, guard_frames, y_tolerance)
+        matched_a = {i for i, _ in pairs}
+        for i, j in pairs:
+            owned = int(a[i]['frame'] < boundary) + int(b[j]['frame'] >= boundary)
+            # 2 - засчитано обоими шардами, 0 - ни одним
+            add(a[i:i + 1], 1 - owned)
+            stitched += owned != 1
+        for i, event in enumerate(a):
+            if i not in matched_a and event['frame'] >= boundary:
+                add(a[i:i + 1])
+                stitched += 1
+
+    zone_counts, by_direction = {}, {}
+    for (name, kind), row in zip(zones, counts.tolist()):
+        zone_counts[name] = dict(zip(DIRECTION_NAMES[kind], row))
+        for direction, n in zone_counts[name].items():
+            by_direction[direction] = by_direction.get(direction, 0) + n
+    return {'zones': zone_counts, 'counts': by_direction, 'total': int(counts.sum()), 'stitched': stitched}
+
+
+def process_sharded(video_path, pipeline_params, workers: int = None, n_shards: int = None,
+                    warmup_frames: int = 300, guard_frames: int = 60, y_tolerance: float = 40.0,
+                    gray_decode: bool = False):
+    """Счет рыб в длинном видео: шарды по времени параллельно в пуле процессов.
+
+    n_shards по умолчанию равно числу процессов. Каждый шард читает
+    лишние warmup_frames + guard_frames кадров - это и есть накладные
+    расходы относительно последовательного прогона (overhead).
+    CAP_PROP_FRAME_COUNT - только оценка для разбиения: последний шард
+    читает до конца видео, а число кадров в отчете берется по прочитанному.
+    """
+    # Режим и диапазон яркости GrayCapture определяются здесь один раз, а не в каждом шарде
+    cap = GrayCapture(video_path) if gray_decode else cv2.VideoCapture(video_path)
+    n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    full_range, gray_raw = (cap.full_range, cap.raw) if gray_decode else (None, True)
+    cap.release()
+
+    workers = workers or os.cpu_count() or 1
+    shards = plan_shards(n_frames, n_shards or workers, warmup_frames + guard_frames)
+    params, (threads, optimized) = split_opencv_params(pipeline_params)
+    if threads is None:
+        threads = auto_threads(min(workers, len(shards)))
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=configure_opencv,
+                             initargs=(threads, optimized)) as pool:
+        futures = [pool.submit(process_shard, video_path, lo, hi, params, warmup_frames, guard_frames,
+                               gray_decode, full_range, gray_raw)
+                   for lo, hi in shards]
+        results = [f.result() for f in futures]
+    wall_sec = time.perf_counter() - start
+
+    # Число кадров - по прочитанному шардами, а не по CAP_PROP_FRAME_COUNT
+    frames = max((r['hi'] for r in results if r['frames']), default=0)
+    processed = sum(r['frames'] for r in results)
+    return {
+        'video': video_path,
+        **stitch(results, guard_frames, y_tolerance),
+        'frames': frames,
+        'wall_sec': wall_sec,
+        'fps': frames / wall_sec if wall_sec else 0.0,
+        'overhead': processed / frames - 1 if frames else 0.0,
+        'shards': [{k: r[k] for k in ('lo', 'hi', 'frames', 'sec')} for r in results],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Параллельный подсчет рыб в длинном видео по шардам')
+    parser.add_argument('video')
+    parser.add_argument('--manifest', default='data/manifest.json', help='параметры конвейера')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--shards', type=int, default=None)
+    parser.add_argument('--warmup', type=int, default=300, help='кадров прогрева MOG2 и трекера перед шардом')
+    parser.add_argument('--guard', type=int, default=60, help='кадров перекрытия для сшивки на границах')
+    parser.add_argument('--gray-decode', action='store_true', help='серый кадр прямо из декодера')
+    parser.add_argument('--compare', action='store_true', help='сверить с последовательным прогоном')
+    parser.add_argument('--json', dest='json_path')
+    args = parser.parse_args()
+
+    params = load_manifest(args.manifest)['pipeline']
+    report = process_sharded(args.video, params, args.workers, args.shards, args.warmup, args.guard,
+                             gray_decode=args.gray_decode)
+    print(f"{report['video']}: {report['total']} рыб, шардов: {len(report['shards'])}, "
+          f"сшито на границах: {report['stitched']}")
+    for name, counts in report['zones'].items():
+        print(f"  {name}: " + ', '.join(f"{direction} {n}" for direction, n in counts.items()))
+    print(f"Кадров: {report['frames']}, {report['wall_sec']:.1f} с, {report['fps']:.1f} FPS, "
+          f"накладные расходы: {report['overhead']:.1%}")
+
+    if args.compare:
+        # Последовательный прогон - в этом процессе, с настройками OpenCV из манифеста
+        params, cv_args = split_opencv_params(params)
+        configure_opencv(*cv_args)
+        sequential = process_shard(args.video, 0, None, params, gray_decode=args.gray_decode)
+        report['sequential'] = {'total': len(sequential['events']), 'sec': sequential['sec'],
+                                'fps': sequential['frames'] / sequential['sec'] if sequential['sec'] else 0.0}
+        print(f"Последовательно: {report['sequential']['total']} рыб, {report['sequential']['fps']:.1f} FPS")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
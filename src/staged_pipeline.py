@@ -0,0 +1,261 @@
+import multiprocessing as mp
+import queue
+import time
+import traceback
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from src.cv_runtime import configure_opencv, split_opencv_params
+from src.detector import FishDetector
+from src.pipeline import FishDetectionPipeline
+
+_STOP = None
+
+
+class FrameRing:
+    """Кольцевой буфер кадров в разделяемой памяти.
+
+    Кадры не сериализуются: через очереди передаются только номера слотов.
+    """
+
+    def __init__(self, shape, n_slots: int = 8, name: str = None):
+        self.shape = tuple(shape)
+        self.n_slots = n_slots
+        frame_bytes = int(np.prod(self.shape))
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=frame_bytes * n_slots)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.frames = np.ndarray((n_slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self, unlink=False):
+        del self.frames
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class _StageStats:
+    """Счетчик кадров и времени работы стадии"""
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.frames = 0
+        self.busy = 0.0
+        self.wait = 0.0
+
+    def as_dict(self):
+        return {
+            'stage': self.stage,
+            'frames': self.frames,
+            'busy_sec': self.busy,
+            'wait_sec': self.wait,
+            'fps': self.frames / self.busy if self.busy > 0 else 0.0
+        }
+
+
+def _decode_worker(source, ring_name, shape, n_slots, free_q, ready_q, stats_q, stop):
+    """Стадия 1: чтение кадров из видео в разделяемый буфер (до конца видео или stop)"""
+    ring = FrameRing(shape, n_slots, name=ring_name)
+    stats = _StageStats('decode')
+    cap = cv2.VideoCapture(source)
+    try:
+        frame_idx = 0
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                break
+            t1 = time.perf_counter()
+            slot = free_q.get()
+            t2 = time.perf_counter()
+            np.copyto(ring.frames[slot], frame)
+            ready_q.put((frame_idx, slot))
+            frame_idx += 1
+
+            stats.frames += 1
+            stats.busy += (t1 - t0) + (time.perf_counter() - t2)
+            stats.wait += t2 - t1
+        ready_q.put(_STOP)
+    except Exception:
+        ready_q.put(('error', traceback.format_exc()))
+    finally:
+        cap.release()
+        ring.close()
+        stats_q.put(stats.as_dict())
+
+
+def _detect_worker(detector_params, cv_args, ring_name, shape, n_slots, free_q, ready_q, bbox_q, stats_q):
+    """Стадия 2: детекция; наружу уходят только массивы боксов (N, 4)"""
+    configure_opencv(*cv_args)
+    ring = FrameRing(shape, n_slots, name=ring_name)
+    stats = _StageStats('detect')
+    detector = FishDetector(**detector_params)
+    try:
+        while True:
+            t0 = time.perf_counter()
+            item = ready_q.get()
+            t1 = time.perf_counter()
+            if item is _STOP or item[0] == 'error':
+                bbox_q.put(item)
+                break
+
+            frame_idx, slot = item
+            bboxes, _, _, _ = detector.detect(ring.frames[slot])
+            free_q.put(slot)
+            bbox_q.put((frame_idx, np.asarray(bboxes, dtype=np.int32).reshape(-1, 4)))
+
+            stats.frames += 1
+            stats.busy += time.perf_counter() - t1
+            stats.wait += t1 - t0
+    except Exception:
+        bbox_q.put(('error', traceback.format_exc()))
+    finally:
+        ring.close()
+        stats_q.put(stats.as_dict())
+
+
+def _qsize(q):
+    try:
+        return q.qsize()
+    except NotImplementedError:  # macOS
+        return -1
+
+
+class StagedPipeline:
+    """Конвейер из трех процессов: декодирование -> детекция -> трекинг и подсчет.
+
+    Детектор работает в одном процессе и получает кадры строго по порядку,
+    поэтому состояние MOG2 и итоговый счет совпадают с последовательным
+    FishDetectionPipeline.process_frame. Трекинг и подсчет выполняются в
+    вызывающем процессе.
+    """
+
+    def __init__(self, source, ring_size: int = 8, **pipeline_kwargs):
+        self.source = source
+        self.ring_size = ring_size
+
+        cap = cv2.VideoCapture(source)
+        self.frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        cap.release()
+
+        pipeline_kwargs.setdefault('frame_width', self.frame_width)
+        # cv_threads / cv_optimized - для процесса детекции
+        pipeline_kwargs, self.cv_args = split_opencv_params(pipeline_kwargs)
+        # Детектор живет только в процессе стадии детекции
+        self.pipeline = FishDetectionPipeline(visualize=False, with_detector=False, **pipeline_kwargs)
+        self.stats = {}
+
+    def run(self):
+        """Генератор результатов по кадрам: (frame_idx, bboxes, tracks, total_fish)"""
+        shape = (self.frame_height, self.frame_width, 3)
+        ring = FrameRing(shape, self.ring_size)
+        ctx = mp.get_context('spawn')
+        free_q, ready_q, bbox_q, stats_q = ctx.Queue(), ctx.Queue(), ctx.Queue(), ctx.Queue()
+        stop = ctx.Event()
+        for slot in range(self.ring_size):
+            free_q.put(slot)
+
+        workers = [
+            ctx.Process(target=_decode_worker, daemon=True,
+                        args=(self.source, ring.name, shape, self.ring_size, free_q, ready_q, stats_q, stop)),
+            ctx.Process(target=_detect_worker, daemon=True,
+                        args=(self.pipeline.detector_params, self.cv_args, ring.name, shape, self.ring_size,
+                              free_q, ready_q, bbox_q, stats_q)),
+        ]
+        for w in workers:
+            w.start()
+
+        stats = _StageStats('track_count')
+        depth_ready, depth_bbox = [], []
+        tracker, counter = self.pipeline.tracker, self.pipeline.counter
+        finished = False
+        start = time.perf_counter()
+        try:
+            while True:
+                t0 = time.perf_counter()
+                item = bbox_q.get()
+                t1 = time.perf_counter()
+                if item is _STOP:
+                    finished = True
+                    break
+                if item[0] == 'error':
+                    finished = True
+                    raise RuntimeError(f"Ошибка в стадии конвейера:\n{item[1]}")
+
+                frame_idx, bboxes = item
+                tracks = tracker.update(bboxes)
+                total_fish = counter.update(tracks)
+                self.pipeline.frame_count += 1
+
+                stats.frames += 1
+                stats.busy += time.perf_counter() - t1
+                stats.wait += t1 - t0
+                depth_ready.append(_qsize(ready_q))
+                depth_bbox.append(_qsize(bbox_q))
+
+                yield frame_idx, bboxes, tracks, total_fish
+        finally:
+            wall = time.perf_counter() - start
+            stages = self._shutdown(workers, stop, bbox_q, stats_q, finished)
+            stages['track_count'] = stats.as_dict()
+            self.stats = {
+                'frames': stats.frames,
+                'wall_sec': wall,
+                'fps': stats.frames / wall if wall > 0 else 0.0,
+                'stages': stages,
+                'queue_depth': {
+                    'decoded': {'mean': float(np.mean(depth_ready)) if depth_ready else 0.0,
+                                'max': max(depth_ready, default=0)},
+                    'detected': {'mean': float(np.mean(depth_bbox)) if depth_bbox else 0.0,
+                                 'max': max(depth_bbox, default=0)},
+                },
+            }
+            ring.close(unlink=True)
+
+    @staticmethod
+    def _shutdown(workers, stop, bbox_q, stats_q, finished, timeout=10.0):
+        """Остановка стадий: сигнал stop, ожидание _STOP и итоговой статистики от каждой стадии.
+
+        Если потребитель бросил генератор раньше конца видео, декодер
+        останавливается по stop, детектор дорабатывает уже прочитанные кадры
+        и пересылает _STOP. terminate() - только для зависшей стадии.
+        """
+        stop.set()
+        try:
+            while not finished:
+                item = bbox_q.get(timeout=timeout)
+                finished = item is _STOP or item[0] == 'error'
+        except queue.Empty:
+            pass
+
+        stages = {}
+        for _ in workers:
+            try:
+                s = stats_q.get(timeout=timeout)
+            except queue.Empty:
+                break
+            stages[s['stage']] = s
+        for w in workers:
+            w.join(timeout=timeout)
+            if w.is_alive():
+                w.terminate()
+        return stages
+
+    def report(self):
+        """Печать пропускной способности стадий и глубины очередей"""
+        print(f"Кадров: {self.stats['frames']}, общий FPS: {self.stats['fps']:.1f}")
+        for stage in ('decode', 'detect', 'track_count'):
+            s = self.stats['stages'].get(stage)
+            if s:
+                print(f"  {stage:12s} FPS: {s['fps']:8.1f}  работа: {s['busy_sec']:.2f} сек  "
+                      f"ожидание: {s['wait_sec']:.2f} сек")
+        for name, d in self.stats['queue_depth'].items():
+            print(f"  Очередь {name}: средняя глубина {d['mean']:.1f}, максимум {d['max']}")
@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+
+import cv2
+import numpy as np
+
+# Пересечение линии подсчета в сцене: первый кадр, где рыба уже за линией, номер рыбы,
+# направление (+1 вправо, -1 влево)
+CROSSING_TRUTH_DTYPE = np.dtype([('frame', '<i8'), ('fish_id', '<i8'), ('direction', 'i1')])
+
+
+class SyntheticScene:
+    """Детерминированная синтетическая сцена: рыбы плывут над шумным фоном с меняющимся светом.
+
+    На экране все время n_fish рыб: уплывшая за край кадра заменяется
+    новой с другого края. speed - диапазон скорости в пикселях на кадр,
+    length - диапазон длины рыбы, reverse - доля рыб, плывущих влево.
+    occlusion - вероятность, что новая рыба идет в полосе уже плывущей
+    (перекрытия при обгоне). Эталонные пересечения линии count_line_ratio
+    копятся в crossings по мере генерации кадров.
+    """
+
+    def __init__(self, width: int = 640, height: int = 480, n_fish: int = 10,
+                 speed=(15.0, 30.0), length=(80, 130), occlusion: float = 0.0, reverse: float = 0.0,
+                 noise: float = 4.0, light_amplitude: float = 15.0, light_period: int = 200,
+                 count_line_ratio: float = 0.85, seed: int = 0):
+        self.width = width
+        self.height = height
+        self.n_fish = n_fish
+        self.speed = speed
+        self.length = length
+        self.occlusion = occlusion
+        self.reverse = reverse
+        self.light_amplitude = light_amplitude
+        self.light_period = light_period
+        self.line_x = int(width * count_line_ratio)
+
+        # Движение и шум - разные генераторы: траектории не зависят от отрисовки
+        self.rng = np.random.default_rng(seed)
+        noise_rng = np.random.default_rng(seed + 1)
+        texture = noise_rng.normal(125, 12, (height, width, 3)).astype(np.float32)
+        self.base = cv2.GaussianBlur(texture, (15, 15), 0)
+        self.noise = noise_rng.normal(0, noise, (8, height, width, 3)).astype(np.float32)
+        self.canvas = np.empty((height, width, 3), dtype=np.float32)
+
+        # Рыбы - структура массивов: центр, скорость, размеры, фаза виляния, цвет
+        self.ids = np.zeros(n_fish, dtype=np.int64)
+        self.pos = np.zeros((n_fish, 2), dtype=np.float64)
+        self.vx = np.zeros(n_fish, dtype=np.float64)
+        self.lane = np.zeros(n_fish, dtype=np.float64)
+        self.size = np.zeros((n_fish, 2), dtype=np.float64)
+        self.phase = np.zeros(n_fish, dtype=np.float64)
+        self.shade = np.zeros(n_fish, dtype=np.float64)
+        self.next_id = 0
+        self.frame_index = 0
+        self.crossings = []
+
+        for i in range(n_fish):
+            self._spawn(i)
+        # В первом кадре рыбы уже распределены по всей ширине
+        self.pos[:, 0] = self.rng.uniform(0, width, n_fish)
+
+    def _spawn(self, i):
+        length = self.rng.uniform(*self.length)
+        height = length * self.rng.uniform(0.4, 0.55)
+        margin = height
+        if self.n_fish > 1 and self.rng.random() < self.occlusion:
+            lane = self.lane[self.rng.integers(self.n_fish)] + self.rng.normal(0, height / 3)
+        else:
+            lane = self.rng.uniform(margin, self.height - margin)
+        direction = -1.0 if self.rng.random() < self.reverse else 1.0
+
+        self.ids[i] = self.next_id
+        self.next_id += 1
+        self.size[i] = length, height
+        self.vx[i] = direction * self.rng.uniform(*self.speed)
+        self.lane[i] = np.clip(lane, margin, self.height - margin)
+        self.pos[i] = (-length / 2 if direction > 0 else self.width + length / 2), self.lane[i]
+        self.phase[i] = self.rng.uniform(0, 2 * np.pi)
+        self.shade[i] = self.rng.uniform(20, 90)
+
+    def step(self):
+        """Сдвиг рыб на кадр и запись пересечений линии подсчета"""
+        x0 = self.pos[:, 0].copy()
+        self.pos[:, 0] += self.vx
+        self.phase += 0.3
+        self.pos[:, 1] = self.lane + 0.15 * self.size[:, 1] * np.sin(self.phase / 3)
+
+        line = self.line_x
+        x1 = self.pos[:, 0]
+        for i in np.flatnonzero((x0 < line) != (x1 < line)).tolist():
+            self.crossings.append((self.frame_index + 1, self.ids[i], 1 if x1[i] > x0[i] else -1))
+
+        half = self.size[:, 0] / 2
+        gone = (x1 - half > self.width) | (x1 + half < 0)
+        for i in np.flatnonzero(gone).tolist():
+            self._spawn(i)
+        self.frame_index += 1
+
+    def render(self):
+        """Кадр BGR: фон с медленно меняющейся освещенностью, рыбы и шум сенсора"""
+        light = 1.0 + self.light_amplitude / 125 * np.sin(2 * np.pi * self.frame_index / self.light_period)
+        canvas = self.canvas
+        np.multiply(self.base, light, out=canvas)
+
+        for (x, y), (length, height), vx, phase, shade in zip(
+                self.pos.tolist(), self.size.tolist(), self.vx.tolist(), self.phase.tolist(), self.shade.tolist()):
+            heading = 1 if vx > 0 else -1
+            color = (shade * light,) * 3
+            angle = 8 * np.sin(phase)
+            center = (int(x), int(y))
+            axes = (int(length * 0.38), int(height / 2))
+            cv2.ellipse(canvas, center, axes, angle, 0, 360, color, -1)
+            # Светлая спина и поперечные полосы: однотонное тело MOG2 быстро принимает за фон
+            stripe = ((shade + 30) * light,) * 3
+            cv2.ellipse(canvas, (int(x), int(y - height * 0.15)), (axes[0] // 2, axes[1] // 3), angle, 0, 360,
+                        stripe, -1)
+            for k in (-0.2, 0.0, 0.2):
+                sx = int(x + k * length)
+                cv2.line(canvas, (sx, int(y - height * 0.4)), (sx, int(y + height * 0.4)), stripe, 2)
+            # Хвост - треугольник позади тела, виляет вместе с фазой
+            root = x - heading * length * 0.3
+            tip = x - heading * length * 0.5
+            sway = 0.2 * height * np.sin(phase)
+            tail = np.array([[root, y], [tip, y - height * 0.4 + sway], [tip, y + height * 0.4 + sway]])
+            cv2.fillConvexPoly(canvas, tail.astype(np.int32), color)
+
+        canvas += self.noise[self.frame_index % len(self.noise)]
+        np.clip(canvas, 0, 255, out=canvas)
+        return canvas.astype(np.uint8)
+
+    def boxes(self):
+        """Эталонные боксы (x, y, w, h) видимых рыб текущего кадра, обрезанные по кадру"""
+        half = self.size / 2
+        x1 = np.maximum(self.pos - half, 0)
+        x2 = np.minimum(self.pos + half, (self.width, self.height))
+        wh = x2 - x1
+        visible = (wh > 1).all(axis=1)
+        return [tuple(b) for b in np.hstack([x1, wh])[visible].astype(int).tolist()]
+
+    def frames(self, n_frames):
+        """Генератор n_frames кадров; crossings пополняется по ходу.
+
+        Сцена сдвигается перед каждым кадром, кроме первого: после последнего
+        кадра шага нет, и в crossings нет пересечений, которых не видно в кадрах.
+        """
+        for i in range(n_frames):
+            if i:
+                self.step()
+            yield self.render()
+
+    def truth(self, from_frame: int = 0):
+        """Эталонные пересечения, видимые в кадрах с from_frame: массив и счет по направлениям"""
+        events = np.array(self.crossings, dtype=CROSSING_TRUTH_DTYPE)
+        events = events[events['frame'] >= from_frame]
+        right = int(np.count_nonzero(events['direction'] > 0))
+        return events, {'right': right, 'left': len(events) - right, 'total': len(events)}
+
+
+def write_video(scene, path, n_frames, fps: float = 30.0):
+    """Запись сцены в MJPG/AVI; возвращает эталонный счет рыб, плывущих вправо"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (scene.width, scene.height))
+    try:
+        for frame in scene.frames(n_frames):
+            writer.write(frame)
+    finally:
+        writer.release()
+    return scene.truth()[1]['right']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Синтетические видео с известным счетом и манифест к ним')
+    parser.add_argument('out_dir')
+    parser.add_argument('--densities', type=int, nargs='+', default=[1, 2, 5, 10, 20, 30, 50, 75, 100, 200],
+                        help='рыб в кадре, по одному видео на значение')
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--occlusion', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--base-manifest', default='data/manifest.json', help='откуда взять параметры конвейера')
+    args = parser.parse_args()
+
+    with open(args.base_manifest, encoding='utf-8') as f:
+        manifest = json.load(f)
+    ratio = manifest.get('pipeline', {}).get('count_line_ratio', 0.85)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    manifest['videos'] = []
+    for i, n_fish in enumerate(args.densities):
+        scene = SyntheticScene(args.width, args.height, n_fish, occlusion=args.occlusion,
+                               count_line_ratio=ratio, seed=args.seed + i)
+        path = os.path.join(args.out_dir, f'synthetic-{n_fish:03d}.avi')
+        count = write_video(scene, path, args.frames)
+        manifest['videos'].append({'path': path, 'count': count})
+        print(f"{path}: {n_fish} рыб в кадре, эталон {count}")
+
+    manifest_path = os.path.join(args.out_dir, 'manifest.json')
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    print(f"Манифест: {manifest_path}")
+
+
+if __name__ == '__main__':
+    main()
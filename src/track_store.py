@@ -0,0 +1,212 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+_FIELDS = ('ids', 'live', 'bbox', 'hits', 'age', 'disappeared', 'confirmed',
+           'created_at', 'history', 'history_len', 'history_head', 'kf_state', 'kf_cov')
+
+
+class TrackStore:
+    """Таблица треков: структура массивов с переиспользуемыми слотами.
+
+    Все поля предвыделены на capacity треков; история центров хранится
+    кольцевым буфером длины history_size. При нехватке слотов емкость
+    удваивается, освобожденные слоты используются повторно.
+    """
+
+    def __init__(self, capacity: int = 64, history_size: int = 15):
+        self.history_size = history_size
+        self.capacity = 0
+        self.free_slots = []
+        self.n_live = 0
+        self._resize(capacity)
+
+    def __len__(self):
+        return self.n_live
+
+    def _resize(self, capacity):
+        old = self.capacity
+        fresh = {
+            'ids': np.full(capacity, -1, dtype=np.int64),
+            'live': np.zeros(capacity, dtype=bool),
+            'bbox': np.zeros((capacity, 4), dtype=np.int64),
+            'hits': np.zeros(capacity, dtype=np.int64),
+            'age': np.zeros(capacity, dtype=np.int64),
+            'disappeared': np.zeros(capacity, dtype=np.int64),
+            'confirmed': np.zeros(capacity, dtype=bool),
+            'created_at': np.zeros(capacity, dtype=np.float64),
+            'history': np.zeros((capacity, self.history_size, 2), dtype=np.int64),
+            'history_len': np.zeros(capacity, dtype=np.int64),
+            'history_head': np.zeros(capacity, dtype=np.int64),
+            # Состояние фильтра Калмана [x, y, vx, vy] и его ковариация (motion_model='kalman')
+            'kf_state': np.zeros((capacity, 4), dtype=np.float64),
+            'kf_cov': np.zeros((capacity, 4, 4), dtype=np.float64),
+        }
+        for name in _FIELDS:
+            if old:
+                fresh[name][:old] = getattr(self, name)
+            setattr(self, name, fresh[name])
+
+        # Только для чтения: эти представления отдаются наружу без копирования
+        self.readonly = {}
+        for name in _FIELDS:
+            view = fresh[name].view()
+            view.flags.writeable = False
+            self.readonly[name] = view
+
+        # Слоты с меньшим индексом выдаются первыми
+        self.free_slots.extend(range(capacity - 1, old - 1, -1))
+        self.capacity = capacity
+
+    def state(self):
+        """Копии полей и служебных счетчиков для снимка состояния"""
+        state = {name: getattr(self, name).copy() for name in _FIELDS}
+        state['free_slots'] = np.array(self.free_slots, dtype=np.int64)
+        state['n_live'] = np.int64(self.n_live)
+        return state
+
+    def load_state(self, state):
+        """Восстановление из state(): таблица пересоздается под емкость снимка"""
+        if state['history'].shape[1] != self.history_size:
+            raise ValueError(f"Длина истории в снимке {state['history'].shape[1]}, ожидалась {self.history_size}")
+        self.capacity = 0
+        self._resize(len(state['ids']))
+        for name in _FIELDS:
+            getattr(self, name)[:] = state[name]
+        self.free_slots = state['free_slots'].tolist()
+        self.n_live = int(state['n_live'])
+
+    def add(self, track_id, bbox, center, created_at):
+        if not self.free_slots:
+            self._resize(self.capacity * 2)
+        slot = self.free_slots.pop()
+
+        self.ids[slot] = track_id
+        self.live[slot] = True
+        self.bbox[slot] = bbox
+        self.hits[slot] = 1
+        self.age[slot] = 0
+        self.disappeared[slot] = 0
+        self.confirmed[slot] = False
+        self.created_at[slot] = created_at
+        self.history[slot, 0] = center
+        self.history_len[slot] = 1
+        self.history_head[slot] = 1 % self.history_size
+        self.n_live += 1
+        return slot
+
+    def remove(self, slots):
+        slots = np.asarray(slots, dtype=np.intp)
+        self.live[slots] = False
+        self.confirmed[slots] = False
+        self.ids[slots] = -1
+        self.free_slots.extend(slots.tolist())
+        self.n_live -= len(slots)
+
+    def live_slots(self):
+        """Занятые слоты в порядке создания треков"""
+        slots = np.flatnonzero(self.live)
+        return slots[np.argsort(self.ids[slots], kind='stable')]
+
+    def push_centers(self, slots, centers):
+        """Добавляет центры в кольцевые буферы истории указанных слотов"""
+        head = self.history_head[slots]
+        self.history[slots, head] = centers
+        self.history_head[slots] = (head + 1) % self.history_size
+        self.history_len[slots] = np.minimum(self.history_len[slots] + 1, self.history_size)
+
+    def centers_at(self, slots, offset):
+        """Центры со смещением offset от начала истории (отрицательный - от конца)"""
+        head = self.history_head[slots]
+        length = self.history_len[slots]
+        start = head - length if offset >= 0 else head
+        return self.history[slots, (start + offset) % self.history_size]
+
+    def centroids(self, slot):
+        """История центров слота в хронологическом порядке"""
+        length = self.history_len[slot]
+        idx = (self.history_head[slot] - length + np.arange(length)) % self.history_size
+        return self.history[slot, idx]
+
+    def slot_of(self, track_id):
+        found = np.flatnonzero(self.live & (self.ids == track_id))
+        if not len(found):
+            raise KeyError(track_id)
+        return int(found[0])
+
+
+class TrackView(Mapping):
+    """Живое представление активных (подтвержденных) треков без копирования данных.
+
+    Массивы отдаются только для чтения и обновляются вместе с трекером;
+    маска active пересчитывается на месте при каждом refresh(). Интерфейс
+    Mapping (track_id -> dict) оставлен для совместимости и собирает
+    словарь только при обращении.
+    """
+
+    def __init__(self, store: TrackStore):
+        self.store = store
+        self.mask = np.zeros(store.capacity, dtype=bool)
+
+    def refresh(self):
+        if len(self.mask) != self.store.capacity:
+            self.mask = np.zeros(self.store.capacity, dtype=bool)
+        np.logical_and(self.store.live, self.store.confirmed, out=self.mask)
+        return self
+
+    @property
+    def slots(self):
+        return np.flatnonzero(self.mask)
+
+    @property
+    def ids(self):
+        return self.store.readonly['ids']
+
+    @property
+    def bbox(self):
+        return self.store.readonly['bbox']
+
+    @property
+    def hits(self):
+        return self.store.readonly['hits']
+
+    @property
+    def age(self):
+        return self.store.readonly['age']
+
+    @property
+    def history_len(self):
+        return self.store.readonly['history_len']
+
+    def centers_at(self, slots, offset):
+        return self.store.centers_at(slots, offset)
+
+    def first_centers(self, slots):
+        return self.store.centers_at(slots, 0)
+
+    def last_centers(self, slots):
+        return self.store.centers_at(slots, -1)
+
+    def centroids(self, slot):
+        return self.store.centroids(slot)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.mask))
+
+    def __iter__(self):
+        slots = self.slots
+        return iter(np.sort(self.store.ids[slots]).tolist())
+
+    def __getitem__(self, track_id):
+        slot = self.store.slot_of(track_id)
+        if not self.mask[slot]:
+            raise KeyError(track_id)
+        centroids = [tuple(c) for c in self.store.centroids(slot).tolist()]
+        return {
+            'bbox': tuple(self.store.bbox[slot].tolist()),
+            'center': centroids[-1],
+            'centroids': centroids,
+            'age': int(self.store.age[slot]),
+            'hits': int(self.store.hits[slot]),
+            'confirmed': True
+        }
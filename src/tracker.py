@@ -1,21 +1,53 @@
 import numpy as np
-from collections import deque
 import time
 
+from src.association import ASSIGNMENT_MODES, assign, bbox_centers, distance_cost, isolated_detections
+from src.instrumentation import Metrics
+from src.motion_model import MOTION_MODELS, ConstantVelocityKalman
+from src.track_store import TrackStore, TrackView
+
 
 class FishTracker:
     def __init__(self,
                  max_disappeared=30,
                  max_distance=100,
                  iou_threshold=0.1,
-                 min_hits=10):
+                 min_hits=10,
+                 assignment='greedy',
+                 flow='right',
+                 motion_model='none',
+                 gate_radius=80,
+                 gate_sigma=3.0):
+        if assignment not in ASSIGNMENT_MODES:
+            raise ValueError(f"Неизвестный режим сопоставления: {assignment}")
+        if motion_model not in MOTION_MODELS:
+            raise ValueError(f"Неизвестная модель движения: {motion_model}")
         self.next_id = 0
-        self.tracks = {}
+        self.tracks = TrackStore(history_size=15)
+        self.active = TrackView(self.tracks)
         self.max_disappeared = max_disappeared
         self.max_distance = max_distance
         self.iou_threshold = iou_threshold
         self.min_hits = min_hits
-        self.confirmed_tracks = set()
+        self.assignment = assignment
+        # Направление течения для гейта сопоставления: 'right', 'left' или 'both'
+        self.flow = flow
+        # 'kalman': сопоставление с предсказанной позицией в радиусе
+        # gate_radius + gate_sigma * sigma позиции (не больше max_distance)
+        self.kalman = ConstantVelocityKalman() if motion_model == 'kalman' else None
+        self.gate_radius = gate_radius
+        self.gate_sigma = gate_sigma
+        # Поэтапные замеры (выключены; конвейер подставляет общий объект)
+        self.metrics = Metrics()
+
+    def state(self):
+        """Треки и следующий id для снимка состояния"""
+        return {'next_id': np.int64(self.next_id), **self.tracks.state()}
+
+    def load_state(self, state):
+        self.next_id = int(state['next_id'])
+        self.tracks.load_state(state)
+        self.active.refresh()
 
     @staticmethod
     def _calculate_iou(box1, box2):
@@ -40,114 +72,111 @@ class FishTracker:
         return (int(x + w / 2), int(y + h / 2))
 
     def update(self, detections):
-        if len(self.tracks) == 0:
+        store = self.tracks
+        if self.kalman is not None and len(store):
+            self._predict()
+
+        if len(store) == 0:
             for bbox in detections:
                 self._create_track(bbox)
             return self._get_active_tracks()
 
         if len(detections) == 0:
-            for track_id in list(self.tracks.keys()):
-                self.tracks[track_id]['disappeared'] += 1
-                self.tracks[track_id]['age'] += 1
-                if self.tracks[track_id]['disappeared'] > self.max_disappeared:
-                    self._remove_track(track_id)
+            live = store.live
+            store.disappeared[live] += 1
+            store.age[live] += 1
+            self._remove_lost()
             return self._get_active_tracks()
 
-        used_detections = set()
-
-        for track_id, track in list(self.tracks.items()):
-            if track['disappeared'] > 5:
-                continue
-
-            track_center = self._get_center(track['bbox'])
-            best_match_idx = -1
-            best_distance = float('inf')
-
-            for i, bbox in enumerate(detections):
-                if i in used_detections:
-                    continue
-
-                det_center = self._get_center(bbox)
-                distance = np.sqrt((det_center[0] - track_center[0]) ** 2 +
-                                   (det_center[1] - track_center[1]) ** 2)
-
-                if distance < best_distance and distance < self.max_distance:
-                    if det_center[0] > track_center[0] - 30:
-                        best_distance = distance
-                        best_match_idx = i
-
-            if best_match_idx != -1:
-                self.tracks[track_id]['bbox'] = detections[best_match_idx]
-                self.tracks[track_id]['disappeared'] = 0
-                self.tracks[track_id]['centroids'].append(self._get_center(detections[best_match_idx]))
-                self.tracks[track_id]['hits'] += 1
-                self.tracks[track_id]['age'] += 1
-
-                if not self.tracks[track_id]['confirmed'] and self.tracks[track_id]['hits'] >= self.min_hits:
-                    self.tracks[track_id]['confirmed'] = True
-                    self.confirmed_tracks.add(track_id)
+        # Сопоставляем только недавно виденные треки
+        slots = store.live_slots()
+        slots = slots[store.disappeared[slots] <= 5]
+        det_boxes = np.asarray(detections, dtype=np.int64).reshape(-1, 4)
+        det_centers = bbox_centers(det_boxes)
+        last_centers = bbox_centers(store.bbox[slots])
+        if self.kalman is None:
+            track_centers, origins = last_centers, None
+            radius = self.max_distance
+        else:
+            # Расстояние до предсказания, направление движения - от последнего наблюдения
+            track_centers, origins = store.kf_state[slots, :2], last_centers
+            sigma = self.kalman.position_sigma(store.kf_cov[slots])
+            radius = np.minimum(self.max_distance, self.gate_radius + self.gate_sigma * sigma)
+
+        t = self.metrics.clock()
+        cost = distance_cost(track_centers, det_centers, radius, flow=self.flow, origins=origins)
+        rows, cols = assign(cost, self.assignment)
+        self.metrics.lap('associate', t)
+        if self.metrics.enabled:
+            self.metrics.observe('candidates', int(np.isfinite(cost).sum()))
+
+        matched_slots = slots[rows]
+        store.bbox[matched_slots] = det_boxes[cols]
+        store.disappeared[matched_slots] = 0
+        store.hits[matched_slots] += 1
+        store.push_centers(matched_slots, det_centers[cols])
+        if self.kalman is not None:
+            store.kf_state[matched_slots], store.kf_cov[matched_slots] = self.kalman.update(
+                store.kf_state[matched_slots], store.kf_cov[matched_slots], det_centers[cols])
+        store.confirmed[matched_slots] |= store.hits[matched_slots] >= self.min_hits
+
+        # Все несопоставленные треки стареют, включая давно потерянные:
+        # иначе трек с disappeared > 5 не удалялся бы, пока есть детекции
+        lost = store.live.copy()
+        lost[matched_slots] = False
+        store.disappeared[lost] += 1
+        store.age[store.live] += 1
+
+        # Новые треки только из детекций, рядом с которыми нет живых треков
+        used_detections = np.zeros(len(det_boxes), dtype=bool)
+        used_detections[cols] = True
+        unmatched = np.flatnonzero(~used_detections)
+        if len(unmatched):
+            near = store.live & (store.disappeared <= 5)
+            ref_centers = bbox_centers(store.bbox[near])
+            keep = isolated_detections(det_centers[unmatched], ref_centers, 60)
+            for i in unmatched[keep].tolist():
+                self._create_track(det_boxes[i])
+
+        self._remove_lost()
 
-                used_detections.add(best_match_idx)
-            else:
-                self.tracks[track_id]['disappeared'] += 1
-                self.tracks[track_id]['age'] += 1
-
-        for i, bbox in enumerate(detections):
-            if i not in used_detections:
-                too_close = False
-                det_center = self._get_center(bbox)
-
-                for track_id, track in self.tracks.items():
-                    if track['disappeared'] > 5:
-                        continue
-
-                    track_center = self._get_center(track['bbox'])
-                    distance = np.sqrt((det_center[0] - track_center[0]) ** 2 +
-                                       (det_center[1] - track_center[1]) ** 2)
-
-                    if distance < 60:
-                        too_close = True
-                        break
-
-                if not too_close:
-                    self._create_track(bbox)
+        return self._get_active_tracks()
 
-        for track_id in list(self.tracks.keys()):
-            if self.tracks[track_id]['disappeared'] > self.max_disappeared:
-                self._remove_track(track_id)
+    @property
+    def confirmed_tracks(self):
+        store = self.tracks
+        return set(store.ids[store.live & store.confirmed].tolist())
 
-        return self._get_active_tracks()
+    def _predict(self):
+        """Шаг предсказания фильтра для всех живых треков, включая пропавшие"""
+        store = self.tracks
+        live = np.flatnonzero(store.live)
+        store.kf_state[live], store.kf_cov[live] = self.kalman.predict(store.kf_state[live], store.kf_cov[live])
 
     def _create_track(self, bbox):
-        self.tracks[self.next_id] = {
-            'bbox': bbox,
-            'centroids': deque([self._get_center(bbox)], maxlen=15),
-            'age': 0,
-            'hits': 1,
-            'disappeared': 0,
-            'confirmed': False,
-            'created_at': time.time()
-        }
+        center = self._get_center(bbox)
+        slot = self.tracks.add(self.next_id, bbox, center, time.time())
+        if self.kalman is not None:
+            state, cov = self.kalman.initiate([center])
+            self.tracks.kf_state[slot], self.tracks.kf_cov[slot] = state[0], cov[0]
         self.next_id += 1
 
+    def _remove_lost(self):
+        store = self.tracks
+        lost = np.flatnonzero(store.live & (store.disappeared > self.max_disappeared))
+        if len(lost):
+            store.remove(lost)
+
     def _remove_track(self, track_id):
-        if track_id in self.tracks:
-            if track_id in self.confirmed_tracks:
-                self.confirmed_tracks.remove(track_id)
-            del self.tracks[track_id]
+        try:
+            self.tracks.remove([self.tracks.slot_of(track_id)])
+        except KeyError:
+            pass
 
     def _get_active_tracks(self):
-        active_tracks = {}
-
-        for track_id, track in self.tracks.items():
-            if track['disappeared'] <= self.max_disappeared and track['confirmed']:
-                active_tracks[track_id] = {
-                    'bbox': track['bbox'],
-                    'center': track['centroids'][-1],
-                    'centroids': list(track['centroids']),
-                    'age': track['age'],
-                    'hits': track['hits'],
-                    'confirmed': track['confirmed']
-                }
-
-        return active_tracks
\ No newline at end of file
+        active = self.active.refresh()
+        if self.metrics.enabled:
+            # Рост числа живых треков - признак плотного косяка
+            self.metrics.observe('tracks_live', len(self.tracks))
+            self.metrics.observe('tracks_active', len(active))
+        return active
@@ -0,0 +1,287 @@
+import argparse
+import itertools
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.cache import GATE_PARAMS, ReplayCache, detection_key, replay
+from src.cv_runtime import auto_threads, configure_opencv, split_opencv_params
+from src.evaluation import load_manifest
+from utils.metrics import mse, mae
+
+SEARCH_STRATEGIES = ('grid', 'random', 'halving')
+
+# Пространство поиска по умолчанию вокруг параметров из манифеста
+DEFAULT_SPACE = {
+    'history': [35, 55, 100],
+    'varThreshold': [25, 35, 50],
+    'learning_rate': [0.03, 0.072, 0.1],
+    'merge_threshold': [70, 110, 150],
+    'min_hits': [5, 7, 10],
+    'max_distance': [200, 280],
+    'max_disappeared': [15, 30],
+}
+
+
+# Состояние процесса пула, задается _init_worker один раз при запуске процесса
+_WORKER = {}
+
+
+def _init_worker(cache_root, cv_threads, cv_optimized):
+    """Инициализатор пула: настройки OpenCV, кэш и память открытых журналов детекций процесса"""
+    configure_opencv(cv_threads, cv_optimized)
+    _WORKER['cache'] = ReplayCache(cache_root, max_bytes=None)
+    _WORKER['logs'] = {}
+
+
+def _prepare_frames(video_path):
+    """Кадры видео в кэше; возвращает ширину кадра"""
+    return _WORKER['cache'].frames(video_path).frame_width
+
+
+def _detect_video(video_path, params):
+    """Боксы детектора в кэше; возвращает время детекции на кадр (сек)"""
+    return _WORKER['cache'].detections(video_path, params).sec_per_frame
+
+
+def _track_videos(videos, params):
+    """Трекер и счетчик по боксам из кэша: [(видео, ширина кадра)] -> [(счет, сек на кадр)].
+
+    Журнал детекций открывается (mmap) один раз на процесс: испытаниям
+    передаются только параметры, а не боксы. Если запись успели вытеснить,
+    боксы считаются заново.
+    """
+    cache, logs = _WORKER['cache'], _WORKER['logs']
+    key = detection_key(params)
+    results = []
+    for path, width in videos:
+        log = logs.get((key, path))
+        if log is None:
+            log = logs[key, path] = cache.detections(path, params)
+        results.append(replay(log, width, params))
+    return results
+
+
+def grid_configs(space):
+    names = list(space)
+    ranges = [n for n in names if isinstance(space[n], tuple)]
+    if ranges:
+        raise ValueError(f"Для перебора по сетке нужны списки значений, а не диапазоны: {ranges}")
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+
+def random_configs(space, n_trials, seed=0):
+    """Случайные конфигурации: список - выбор значения, кортеж (low, high) - равномерно"""
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(n_trials):
+        config = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                config[name] = rng.randint(low, high) if isinstance(low, int) else rng.uniform(low, high)
+            else:
+                config[name] = rng.choice(values)
+        configs.append(config)
+    return configs
+
+
+def pareto_front(results):
+    """Недоминируемые по (MSE меньше, FPS больше) результаты, по убыванию FPS"""
+    ordered = sorted(results, key=lambda r: (-r['avg_fps'], r['mse']))
+    front = []
+    best_mse = float('inf')
+    for r in ordered:
+        if r['mse'] < best_mse:
+            front.append(r)
+            best_mse = r['mse']
+    return front
+
+
+class Tuner:
+    """Параллельный подбор параметров конвейера по видео манифеста.
+
+    Кадры и боксы детектора берутся из ReplayCache (на диске, между
+    запусками): конфигурации, отличающиеся только параметрами трекера,
+    гоняют лишь трекер и счетчик. Цель - score (меньше лучше):
+    MSE плюс штраф fps_weight * (target_fps / fps - 1), если FPS ниже цели.
+    FPS - по времени детекции и трекинга без декодирования, как в evaluation.
+    motion_gate не подбирается: детектор здесь работает на каждом кадре, и
+    параметры пропуска кадров из манифеста отбрасываются.
+    """
+
+    def __init__(self, manifest, workers: int = None, cache_dir: str = 'data/cache',
+                 cache_bytes: int = 2 * 1024 ** 3, fps_weight: float = 1.0):
+        self.manifest = manifest
+        self.entries = [e for e in manifest['videos'] if os.path.exists(e['path'])]
+        self.workers = workers or os.cpu_count() or 1
+        # Настройки OpenCV применяются в процессах пула при запуске, в конвейер не передаются
+        base, (threads, optimized) = split_opencv_params(manifest['pipeline'])
+        self.base = {k: v for k, v in base.items() if k not in GATE_PARAMS}
+        if threads is None:
+            threads = auto_threads(self.workers)
+        self.fps_weight = fps_weight
+        self.target_fps = manifest['target_fps']
+        # Процессы пула пишут в кэш без вытеснения; размер ограничивает владелец после каждой партии записей
+        self.cache = ReplayCache(cache_dir, max_bytes=cache_bytes)
+        # (ключ детектора, видео) -> сек детекции на кадр и каталог записи в кэше
+        self.detections = {}
+        self.detection_dirs = {}
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(cache_dir, threads, optimized))
+        futures = {e['path']: self.pool.submit(_prepare_frames, e['path']) for e in self.entries}
+        self.frame_widths = {path: future.result() for path, future in futures.items()}
+        self._evict()
+
+    def close(self):
+        self.pool.shutdown()
+        self._evict()
+
+    def _evict(self):
+        """Вытеснение из кэша; вытесненные боксы забываются и при следующей оценке считаются заново"""
+        removed = set(self.cache.evict())
+        for cache_key in [k for k, directory in self.detection_dirs.items() if directory in removed]:
+            del self.detections[cache_key], self.detection_dirs[cache_key]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def score(self, mse_value, fps):
+        penalty = max(0.0, self.target_fps / fps - 1.0) if fps > 0 else float('inf')
+        return mse_value + self.fps_weight * penalty
+
+    def evaluate(self, configs, entries=None):
+        """Оценка конфигураций на entries (по умолчанию все видео манифеста)"""
+        entries = self.entries if entries is None else entries
+        params_list = [{**self.base, **config} for config in configs]
+        keys = [detection_key(params) for params in params_list]
+
+        # 1. Детекция - только для новых сочетаний (параметры детектора, видео)
+        pending = {}
+        for params, key in zip(params_list, keys):
+            for e in entries:
+                cache_key = (key, e['path'])
+                if cache_key not in self.detections and cache_key not in pending:
+                    pending[cache_key] = self.pool.submit(_detect_video, e['path'], params)
+                    self.detection_dirs[cache_key] = self.cache._detections_dir(e['path'], params)
+        for cache_key, future in pending.items():
+            self.detections[cache_key] = future.result()
+
+        # 2. Трекер и счетчик по кэшированным боксам
+        futures = []
+        for params, key in zip(params_list, keys):
+            videos = [(e['path'], self.frame_widths[e['path']]) for e in entries]
+            futures.append(self.pool.submit(_track_videos, videos, params))
+
+        results = []
+        y_true = np.array([e['count'] for e in entries])
+        for config, key, future in zip(configs, keys, futures):
+            tracked = future.result()
+            y_pred = np.array([count for count, _ in tracked])
+            fps = [1.0 / (self.detections[(key, e['path'])] + track_sec)
+                   for e, (_, track_sec) in zip(entries, tracked)]
+            mse_value = float(mse(y_true, y_pred))
+            avg_fps = float(np.mean(fps))
+            results.append({
+                'params': config,
+                'mse': mse_value,
+                'mae': float(mae(y_true, y_pred)),
+                'avg_fps': avg_fps,
+                'score': self.score(mse_value, avg_fps),
+                'predictions': y_pred.tolist(),
+                'videos': len(entries),
+            })
+        # Вытеснение - после трекинга: боксы этой партии нужны ему с диска
+        if pending:
+            self._evict()
+        return results
+
+    def grid(self, space):
+        return self.evaluate(grid_configs(space))
+
+    def random(self, space, n_trials, seed=0):
+        return self.evaluate(random_configs(space, n_trials, seed))
+
+    def successive_halving(self, space, n_trials, eta: int = 3, min_videos: int = 1, seed=0):
+        """Все кандидаты - на min_videos видео, лучшая 1/eta - на eta раз большем числе видео и т.д.
+
+        Возвращает результаты последнего круга (все видео).
+        """
+        configs = random_configs(space, n_trials, seed)
+        n_videos = max(1, min(min_videos, len(self.entries)))
+        while True:
+            results = self.evaluate(configs, self.entries[:n_videos])
+            if n_videos >= len(self.entries) or len(configs) <= 1:
+                if n_videos < len(self.entries):
+                    results = self.evaluate(configs)
+                return results
+            results.sort(key=lambda r: r['score'])
+            configs = [r['params'] for r in results[:max(1, len(results) // eta)]]
+            n_videos = min(len(self.entries), n_videos * eta)
+
+
+def tune(manifest, space=None, strategy='random', n_trials=30, workers=None,
+         cache_dir='data/cache', fps_weight=1.0, eta=3, seed=0):
+    """Подбор параметров: результаты по возрастанию score и фронт Парето MSE/FPS"""
+    if strategy not in SEARCH_STRATEGIES:
+        raise ValueError(f"Неизвестная стратегия поиска: {strategy}")
+    space = space or DEFAULT_SPACE
+
+    with Tuner(manifest, workers=workers, cache_dir=cache_dir, fps_weight=fps_weight) as tuner:
+        if strategy == 'grid':
+            results = tuner.grid(space)
+        elif strategy == 'random':
+            results = tuner.random(space, n_trials, seed)
+        else:
+            results = tuner.successive_halving(space, n_trials, eta=eta, seed=seed)
+
+    results.sort(key=lambda r: r['score'])
+    return {'results': results, 'pareto': pareto_front(results)}
+
+
+def print_tuning(report, top=5):
+    print("РЕЗУЛЬТАТЫ ПО МЕТРИКАМ:")
+    for i, r in enumerate(report['results'][:top]):
+        print(f"{i + 1}. score: {r['score']:.3f}, MSE: {r['mse']:.2f}, MAE: {r['mae']:.2f}, "
+              f"Средний FPS: {r['avg_fps']:.1f}  {r['params']}")
+    print("Фронт Парето (MSE / FPS):")
+    for r in report['pareto']:
+        print(f"  MSE: {r['mse']:7.2f}  FPS: {r['avg_fps']:7.1f}  {r['params']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Параллельный подбор параметров конвейера')
+    parser.add_argument('manifest', nargs='?', default='data/manifest.json')
+    parser.add_argument('--strategy', choices=SEARCH_STRATEGIES, default='random')
+    parser.add_argument('--space', help='JSON: имя параметра -> список значений или {"low", "high"}')
+    parser.add_argument('--trials', type=int, default=30)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache-dir', default='data/cache', help='каталог кэша кадров и детекций')
+    parser.add_argument('--fps-weight', type=float, default=1.0)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', dest='json_path')
+    args = parser.parse_args()
+
+    space = None
+    if args.space:
+        with open(args.space, encoding='utf-8') as f:
+            # {"low": ..., "high": ...} в JSON - диапазон для случайного поиска
+            space = {k: (v['low'], v['high']) if isinstance(v, dict) else v for k, v in json.load(f).items()}
+
+    report = tune(load_manifest(args.manifest), space, args.strategy, args.trials, args.workers,
+                  args.cache_dir, args.fps_weight, args.eta, args.seed)
+    print_tuning(report)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
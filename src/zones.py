@@ -0,0 +1,176 @@
+import cv2
+import numpy as np
+
+# Допустимые направления и имена направлений (+1, -1) по типу зоны
+ZONE_DIRECTIONS = {'line': ('right', 'left', 'both'), 'polygon': ('in', 'out', 'both')}
+DIRECTION_NAMES = {'line': ('right', 'left'), 'polygon': ('in', 'out')}
+
+
+class LineZone:
+    """Линия подсчета - отрезок p1-p2.
+
+    'right' - пересечение в сторону нормали (dy, -dx) к p2 - p1: для отрезка,
+    проведенного сверху вниз, это движение вправо. infinite - прямая без
+    концов (так задается старая вертикальная линия count_line_x).
+    """
+    kind = 'line'
+
+    def __init__(self, name, p1, p2, direction='right', infinite: bool = False):
+        self.name = name
+        self.p1 = tuple(int(v) for v in p1)
+        self.p2 = tuple(int(v) for v in p2)
+        self.direction = direction
+        self.infinite = infinite
+
+    @classmethod
+    def vertical(cls, x, direction='right', name='line'):
+        return cls(name, (x, 0), (x, 1), direction, infinite=True)
+
+    def spec(self):
+        return {'name': self.name, 'line': [self.p1, self.p2], 'direction': self.direction,
+                'infinite': self.infinite}
+
+
+class PolygonZone:
+    """Многоугольная зона: 'in' - центр трека вошел в зону, 'out' - вышел"""
+    kind = 'polygon'
+
+    def __init__(self, name, points, direction='in'):
+        self.name = name
+        self.points = [tuple(int(v) for v in p) for p in points]
+        self.direction = direction
+
+    def spec(self):
+        return {'name': self.name, 'polygon': self.points, 'direction': self.direction}
+
+
+def parse_zones(specs):
+    """Зоны из конфигурации: [{"name", "line": [[x1, y1], [x2, y2]] или "polygon": [[x, y], ...], "direction"}]"""
+    zones = []
+    for i, spec in enumerate(specs):
+        if isinstance(spec, (LineZone, PolygonZone)):
+            zones.append(spec)
+            continue
+        name = spec.get('name', f'zone{i}')
+        if 'line' in spec:
+            p1, p2 = spec['line']
+            zone = LineZone(name, p1, p2, spec.get('direction', 'right'), spec.get('infinite', False))
+        elif 'polygon' in spec:
+            if len(spec['polygon']) < 3:
+                raise ValueError(f"Зона {name}: в многоугольнике меньше трех вершин")
+            zone = PolygonZone(name, spec['polygon'], spec.get('direction', 'in'))
+        else:
+            raise ValueError(f"Зона {name}: нужен 'line' или 'polygon'")
+        zones.append(zone)
+
+    for zone in zones:
+        if zone.direction not in ZONE_DIRECTIONS[zone.kind]:
+            raise ValueError(f"Зона {zone.name}: неизвестное направление {zone.direction}")
+    names = [zone.name for zone in zones]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Имена зон повторяются: {names}")
+    return zones
+
+
+class ZoneIndex:
+    """Предвычисленная геометрия зон для проверки всех треков сразу.
+
+    Линии - массивы концов и нормалей: стороны и пересечения K отрезков
+    пути со всеми L линиями считаются одним broadcast (K, L). Многоугольники
+    растеризуются в сетку с шагом cell пикселей, в ячейке - битовые маски
+    зон: inner - ячейка целиком внутри, border - через ячейку проходит
+    граница. Членство центра - одно чтение из сетки; точное попадание в
+    многоугольник проверяется только для точек в граничных ячейках.
+    """
+
+    def __init__(self, zones, cell: int = 4):
+        self.lines = [i for i, zone in enumerate(zones) if zone.kind == 'line']
+        self.polygons = [i for i, zone in enumerate(zones) if zone.kind == 'polygon']
+        if len(self.polygons) > 64:
+            raise ValueError("Не больше 64 многоугольных зон")
+
+        lines = [zones[i] for i in self.lines]
+        self.p1 = np.array([z.p1 for z in lines], dtype=np.float64).reshape(-1, 2)
+        self.d = np.array([z.p2 for z in lines], dtype=np.float64).reshape(-1, 2) - self.p1
+        self.normal = np.stack([self.d[:, 1], -self.d[:, 0]], axis=1)
+        self.offset = (self.p1 * self.normal).sum(axis=1)
+        self.length_sq = (self.d ** 2).sum(axis=1)
+        self.infinite = np.array([z.infinite for z in lines], dtype=bool)
+
+        self.cell = cell
+        self.grid = np.zeros((1, 1), dtype=np.uint64)
+        self.border = np.zeros((1, 1), dtype=np.uint64)
+        self.bits = np.uint64(1) << np.arange(len(self.polygons), dtype=np.uint64)
+        self.vertices = [np.array(zones[i].points, dtype=np.float64) for i in self.polygons]
+        if self.polygons:
+            width = int(max(p[:, 0].max() for p in self.vertices)) // cell + 3
+            height = int(max(p[:, 1].max() for p in self.vertices)) // cell + 3
+            self.grid = np.zeros((height, width), dtype=np.uint64)
+            self.border = np.zeros((height, width), dtype=np.uint64)
+            fill = np.empty((height, width), dtype=np.uint8)
+            edge = np.empty((height, width), dtype=np.uint8)
+            kernel = np.ones((3, 3), dtype=np.uint8)
+            for bit, points in zip(self.bits, self.vertices):
+                # Вершины в координатах ячеек (как в membership: p // cell); растеризация
+                # ошибается не больше чем на ячейку, поэтому граница расширена на ячейку
+                cells = [(points // cell).astype(np.int32)]
+                fill[:] = 0
+                edge[:] = 0
+                cv2.fillPoly(fill, cells, 1)
+                cv2.polylines(edge, cells, True, 1)
+                edge = cv2.dilate(edge, kernel)
+                self.grid[(fill > 0) & (edge == 0)] |= bit
+                self.border[edge > 0] |= bit
+
+    def sides(self, points):
+        """Знаковое расстояние точек (K, 2) до линий, умноженное на |p2 - p1|: (K, L)"""
+        return points @ self.normal.T - self.offset
+
+    def crosses(self, a, b, side_a=None, side_b=None):
+        """Пересекают ли отрезки a -> b (K, 2) линии (в пределах их концов): (K, L)"""
+        side_a = self.sides(a) if side_a is None else side_a
+        side_b = self.sides(b) if side_b is None else side_b
+        crossed = np.sign(side_a) != np.sign(side_b)
+        if self.infinite.all():
+            return crossed
+
+        # Точка пересечения с прямой и ее положение вдоль отрезка p1-p2 (0..1)
+        denom = side_a - side_b
+        s = np.divide(side_a, denom, out=np.zeros_like(side_a), where=denom != 0)
+        point = a[:, None, :] + s[:, :, None] * (b - a)[:, None, :]
+        u = ((point - self.p1) * self.d).sum(axis=2) / self.length_sq
+        return crossed & (self.infinite | ((u >= 0) & (u <= 1)))
+
+    def membership(self, points):
+        """Битовые маски многоугольников, содержащих точки (K, 2): (K,) uint64"""
+        ix = points[:, 0] // self.cell
+        iy = points[:, 1] // self.cell
+        height, width = self.grid.shape
+        inside = (ix >= 0) & (iy >= 0) & (ix < width) & (iy < height)
+        bits = np.zeros(len(points), dtype=np.uint64)
+        bits[inside] = self.grid[iy[inside], ix[inside]]
+
+        border = np.zeros(len(points), dtype=np.uint64)
+        border[inside] = self.border[iy[inside], ix[inside]]
+        for bit, vertices in zip(self.bits, self.vertices):
+            rows = np.flatnonzero(border & bit)
+            if len(rows):
+                bits[rows[_contains(vertices, points[rows])]] |= bit
+        return bits
+
+    def members(self, points):
+        """Членство точек в многоугольниках: (K, P) bool"""
+        return (self.membership(points)[:, None] & self.bits) != 0
+
+
+def _contains(vertices, points):
+    """Точки (K, 2) внутри многоугольника (V, 2) по правилу чет-нечет: (K,) bool"""
+    x = points[:, 0, None].astype(np.float64)
+    y = points[:, 1, None].astype(np.float64)
+    x1, y1 = vertices[:, 0], vertices[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    spans = (y1 > y) != (y2 > y)
+    dy = np.broadcast_to(y2 - y1, spans.shape)
+    t = np.divide(y - y1, dy, out=np.zeros(spans.shape), where=spans)
+    hits = spans & (x < x1 + t * (x2 - x1))
+    return np.count_nonzero(hits, axis=1) % 2 == 1
@@ -0,0 +1,147 @@
+from collections import deque
+
+import numpy as np
+import pytest
+
+from src.association import assign, bbox_centers, distance_cost, isolated_detections
+from src.tracker import FishTracker
+
+
+def _center(bbox):
+    x, y, w, h = bbox
+    return (int(x + w / 2), int(y + h / 2))
+
+
+class LegacyTracker:
+    """Сопоставление исходного FishTracker.update (вложенные циклы) - эталон для матричной версии.
+
+    С одним намеренным отличием от исходника: трек с disappeared > 5 тоже
+    стареет и в итоге удаляется (раньше он жил, пока есть детекции).
+    """
+
+    def __init__(self, max_disappeared, max_distance, min_hits):
+        self.tracks = {}
+        self.next_id = 0
+        self.max_disappeared = max_disappeared
+        self.max_distance = max_distance
+        self.min_hits = min_hits
+
+    def update(self, detections):
+        used = set()
+        if not self.tracks:
+            for bbox in detections:
+                self._create(bbox)
+            return self._active()
+
+        for track in self.tracks.values():
+            if track['disappeared'] > 5:
+                track['age'] += 1
+                track['disappeared'] += 1
+                continue
+            tc = _center(track['bbox'])
+            best, best_distance = -1, float('inf')
+            for i, bbox in enumerate(detections):
+                if i in used:
+                    continue
+                dc = _center(bbox)
+                distance = np.sqrt((dc[0] - tc[0]) ** 2 + (dc[1] - tc[1]) ** 2)
+                if distance < best_distance and distance < self.max_distance and dc[0] > tc[0] - 30:
+                    best, best_distance = i, distance
+            track['age'] += 1
+            if best == -1:
+                track['disappeared'] += 1
+                continue
+            used.add(best)
+            track['bbox'] = detections[best]
+            track['disappeared'] = 0
+            track['centroids'].append(_center(detections[best]))
+            track['hits'] += 1
+            track['confirmed'] |= track['hits'] >= self.min_hits
+
+        for i, bbox in enumerate(detections):
+            if i in used:
+                continue
+            dc = _center(bbox)
+            too_close = any(np.sqrt((dc[0] - tc[0]) ** 2 + (dc[1] - tc[1]) ** 2) < 60
+                            for tc in (_center(t['bbox']) for t in self.tracks.values() if t['disappeared'] <= 5))
+            if not too_close:
+                self._create(bbox)
+
+        for track_id in [k for k, t in self.tracks.items() if t['disappeared'] > self.max_disappeared]:
+            del self.tracks[track_id]
+        return self._active()
+
+    def _create(self, bbox):
+        self.tracks[self.next_id] = {'bbox': bbox, 'centroids': deque([_center(bbox)], maxlen=15), 'age': 0,
+                                     'hits': 1, 'disappeared': 0, 'confirmed': False}
+        self.next_id += 1
+
+    def _active(self):
+        return {k: (tuple(t['bbox']), list(t['centroids']), t['age'], t['hits'])
+                for k, t in self.tracks.items() if t['confirmed']}
+
+
+def _moving_boxes(n_objects, n_frames, seed):
+    rng = np.random.default_rng(seed)
+    pos = np.column_stack([rng.uniform(0, 600, n_objects), rng.uniform(0, 400, n_objects)])
+    speed = rng.uniform(5, 20, n_objects)
+    size = rng.integers(20, 60, (n_objects, 2))
+    frames = []
+    for _ in range(n_frames):
+        pos[:, 0] = (pos[:, 0] + speed) % 640
+        pos[:, 1] += rng.normal(0, 2, n_objects)
+        # Часть детекций пропадает - треки теряются и создаются заново
+        keep = rng.random(n_objects) > 0.1
+        frames.append([(int(x), int(y), int(w), int(h)) for (x, y), (w, h), k in zip(pos, size, keep) if k])
+    return frames
+
+
+@pytest.mark.parametrize('n_objects', [1, 10, 50])
+def test_greedy_tracker_matches_legacy_loop(n_objects):
+    legacy = LegacyTracker(max_disappeared=15, max_distance=280, min_hits=7)
+    tracker = FishTracker(max_disappeared=15, max_distance=280, min_hits=7)
+    for frame in _moving_boxes(n_objects, 200, seed=n_objects):
+        expected = legacy.update(frame)
+        active = tracker.update(frame)
+        got = {k: (v['bbox'], v['centroids'], v['age'], v['hits']) for k, v in active.items()}
+        assert got == expected
+
+
+def test_distance_cost_gates():
+    tracks = [(100, 100)]
+    dets = [(150, 100), (69, 100), (71, 100), (100, 400)]
+    cost = distance_cost(tracks, dets, max_distance=280)
+    # 69 - назад больше чем на 30 пикселей, (100, 400) - дальше max_distance
+    assert np.isfinite(cost[0]).tolist() == [True, False, True, False]
+    assert cost[0, 0] == pytest.approx(50)
+
+    both = distance_cost(tracks, dets, max_distance=280, flow='both')
+    assert np.isfinite(both[0]).tolist() == [True, True, True, False]
+
+
+def test_greedy_prefers_earlier_tracks_and_hungarian_minimises_total():
+    cost = np.array([[1.0, 2.0],
+                     [1.5, 10.0]])
+    rows, cols = assign(cost, 'greedy')
+    assert list(zip(rows.tolist(), cols.tolist())) == [(0, 0), (1, 1)]
+
+    pytest.importorskip('scipy')
+    rows, cols = assign(cost, 'hungarian')
+    assert list(zip(rows.tolist(), cols.tolist())) == [(0, 1), (1, 0)]
+
+
+def test_assignment_skips_infeasible_pairs():
+    cost = np.array([[np.inf, 3.0],
+                     [np.inf, 1.0]])
+    for mode in ('greedy', 'hungarian'):
+        if mode == 'hungarian':
+            pytest.importorskip('scipy')
+        rows, cols = assign(cost, mode)
+        assert np.isfinite(cost[rows, cols]).all()
+        assert len(rows) == 1
+
+
+def test_isolated_detections_rejects_near_tracks_and_earlier_detections():
+    dets = bbox_centers([(0, 0, 10, 10), (20, 0, 10, 10), (200, 0, 10, 10), (500, 0, 10, 10)])
+    keep = isolated_detections(dets, [(505, 5)], radius=60)
+    assert keep.tolist() == [True, False, True, False]
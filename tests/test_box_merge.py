@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from src.box_merge import merge_close_boxes
+
+
+def legacy_merge(boxes, threshold):
+    """Исходный FishDetector._merge_close_boxes: один проход по x с растущим текущим боксом"""
+    boxes = sorted(boxes, key=lambda b: b[0])
+    merged = []
+    current = list(boxes[0])
+    for x2, y2, w2, h2 in boxes[1:]:
+        x1, y1, w1, h1 = current
+        horizontal_gap = max(0, max(x1, x2) - min(x1 + w1, x2 + w2))
+        vertical_gap = max(0, max(y1, y2) - min(y1 + h1, y2 + h2))
+        inter_area = (max(0, min(x1 + w1, x2 + w2) - max(x1, x2)) *
+                      max(0, min(y1 + h1, y2 + h2) - max(y1, y2)))
+        if inter_area > 0 or max(horizontal_gap, vertical_gap) < threshold:
+            nx, ny = min(x1, x2), min(y1, y2)
+            current = [nx, ny, max(x1 + w1, x2 + w2) - nx, max(y1 + h1, y2 + h2) - ny]
+        else:
+            merged.append(tuple(current))
+            current = [x2, y2, w2, h2]
+    merged.append(tuple(current))
+    return merged
+
+
+def test_transitive_chain_merges_into_one_box():
+    # A-B и B-C ближе порога, A и C - далеко друг от друга
+    a, b, c = (0, 0, 30, 30), (40, 0, 30, 30), (80, 0, 30, 30)
+    assert merge_close_boxes([c, a, b], threshold=20) == [(0, 0, 110, 30)]
+
+
+def test_long_chain_in_shuffled_order():
+    rng = np.random.default_rng(0)
+    chain = [(i * 35, (i % 3) * 5, 30, 20) for i in range(40)]
+    order = rng.permutation(len(chain))
+    merged = merge_close_boxes([chain[i] for i in order], threshold=10)
+    assert merged == [(0, 0, 39 * 35 + 30, 30)]
+
+
+def test_vertical_neighbours_not_adjacent_in_x_order():
+    # По x порядок A, B, C: B далеко от обоих, A и C рядом по вертикали
+    a, b, c = (0, 0, 20, 20), (10, 200, 20, 20), (25, 30, 20, 20)
+    assert legacy_merge([a, b, c], threshold=15) == [a, b, c]
+    assert merge_close_boxes([a, b, c], threshold=15) == [(0, 0, 45, 50), b]
+
+
+def test_merged_box_is_rechecked_against_the_rest():
+    # A и B сливаются, объединенный бокс оказывается рядом с C, хотя A и B поодиночке - нет
+    a, b, c = (0, 0, 20, 20), (0, 60, 20, 20), (30, 30, 20, 20)
+    assert merge_close_boxes([a, b, c], threshold=45) == [(0, 0, 50, 80)]
+    assert merge_close_boxes([a, c], threshold=5) == [a, c]
+
+
+def test_gap_equal_to_threshold_is_not_merged():
+    a, b = (0, 0, 10, 10), (30, 0, 10, 10)
+    assert merge_close_boxes([a, b], threshold=20) == [a, b]
+    assert merge_close_boxes([a, b], threshold=21) == [(0, 0, 40, 10)]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_matches_legacy_when_merges_are_not_transitive(seed):
+    # Группы по 1-2 бокса далеко друг от друга: старый проход по x здесь корректен
+    rng = np.random.default_rng(seed)
+    boxes = []
+    for g in range(int(rng.integers(1, 12))):
+        x, y = 300 * g + int(rng.integers(0, 50)), int(rng.integers(0, 400))
+        boxes.append((x, y, int(rng.integers(10, 60)), int(rng.integers(10, 60))))
+        if rng.random() < 0.6:
+            boxes.append((x + int(rng.integers(0, 70)), y + int(rng.integers(-40, 40)),
+                          int(rng.integers(10, 60)), int(rng.integers(10, 60))))
+    rng.shuffle(boxes)
+    assert merge_close_boxes(boxes, threshold=20) == legacy_merge(boxes, threshold=20)
+
+
+def test_empty_and_single():
+    assert merge_close_boxes([], 20) == []
+    assert merge_close_boxes([(5, 5, 10, 10)], 20) == [(5, 5, 10, 10)]
@@ -0,0 +1,121 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from src.cache import ReplayCache, detection_key, replay
+from src.evaluation import evaluate_video, load_manifest
+from src.synthetic import SyntheticScene, write_video
+from src.tuning import Tuner
+
+with open('data/manifest.json', encoding='utf-8') as f:
+    PIPELINE = json.load(f)['pipeline']
+
+
+@pytest.fixture(scope='module')
+def video(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('video') / 'scene.avi')
+    count = write_video(SyntheticScene(width=320, height=240, n_fish=3, seed=4), path, 120)
+    return path, count
+
+
+def _staging_dirs(root):
+    return [name for kind in ('frames', 'detections') for name in os.listdir(os.path.join(root, kind))
+            if name.startswith('.tmp_')]
+
+
+def test_replay_matches_evaluate_video(tmp_path, video):
+    path, _ = video
+    cache = ReplayCache(str(tmp_path / 'cache'))
+    log = cache.detections(path, PIPELINE)
+    predicted, _ = replay(log, 320, PIPELINE)
+    assert predicted == evaluate_video(path, 0, PIPELINE)['predicted']
+    assert _staging_dirs(cache.root) == []
+
+
+def test_interrupted_write_leaves_no_staging_dir(tmp_path, video, monkeypatch):
+    path, _ = video
+    cache = ReplayCache(str(tmp_path / 'cache'))
+
+    def broken_save(*args, **kwargs):
+        raise OSError('диск заполнен')
+
+    monkeypatch.setattr(np, 'save', broken_save)
+    with pytest.raises(OSError):
+        cache.frames(path)
+    assert _staging_dirs(cache.root) == []
+    assert cache.entries() == []
+
+
+def test_tuner_evaluates_configs(tmp_path, video):
+    path, count = video
+    manifest_path = tmp_path / 'manifest.json'
+    manifest_path.write_text(json.dumps({'pipeline': PIPELINE, 'videos': [{'path': path, 'count': count}]}))
+    manifest = load_manifest(str(manifest_path))
+
+    with Tuner(manifest, workers=2, cache_dir=str(tmp_path / 'cache')) as tuner:
+        results = tuner.evaluate([{'min_hits': 5}, {'min_hits': 7}, {'min_hits': 7, 'max_distance': 200}])
+    expected = evaluate_video(path, count, dict(PIPELINE, min_hits=7))['predicted']
+    assert results[1]['predictions'] == [expected]
+    assert all(r['videos'] == 1 for r in results)
+
+
+def test_verify_modes(tmp_path, video):
+    path, _ = video
+    root = str(tmp_path / 'cache')
+    ReplayCache(root).frames(path)
+    directory = ReplayCache(root).entries()[0][0]
+    shard = os.path.join(directory, 'shard_00000.npy')
+
+    # Подмена содержимого с тем же размером и mtime видна только полной проверке
+    stat = os.stat(shard)
+    with open(shard, 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+    os.utime(shard, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert ReplayCache(root)._load_meta(directory) is not None
+    assert ReplayCache(root, verify='full')._load_meta(directory) is None
+
+    ReplayCache(root).frames(path)
+    with open(shard, 'ab') as f:
+        f.write(b'\0')
+    assert ReplayCache(root)._load_meta(directory) is None
+    with pytest.raises(ValueError):
+        ReplayCache(root, verify=True)
+
+
+def test_evicts_after_each_write(tmp_path, video):
+    path, _ = video
+    cache = ReplayCache(str(tmp_path / 'cache'), max_bytes=1)
+    log = cache.detections(path, PIPELINE)
+    # Кадры вытеснены сразу после записи детекций, сама запись детекций осталась
+    entries = cache.entries()
+    assert [os.path.basename(os.path.dirname(d)) for d, _, _ in entries] == ['detections']
+    assert len(log) == 120
+
+
+def test_tuner_recomputes_evicted_detections(tmp_path, video):
+    path, count = video
+    manifest_path = tmp_path / 'manifest.json'
+    manifest_path.write_text(json.dumps({'pipeline': PIPELINE, 'videos': [{'path': path, 'count': count}]}))
+    manifest = load_manifest(str(manifest_path))
+
+    # Кэш меньше одной записи: боксы вытесняются после каждой партии
+    with Tuner(manifest, workers=1, cache_dir=str(tmp_path / 'cache'), cache_bytes=1) as tuner:
+        first = tuner.evaluate([{'min_hits': 7}])
+        assert tuner.detections == {}
+        second = tuner.evaluate([{'min_hits': 7}, {'min_hits': 5}])
+    assert second[0]['predictions'] == first[0]['predictions']
+
+
+def test_gate_params_do_not_split_cache(tmp_path, video):
+    path, _ = video
+    cache = ReplayCache(str(tmp_path / 'cache'))
+    assert detection_key(dict(PIPELINE, motion_gate=False, background_every=10)) == detection_key(PIPELINE)
+    with pytest.raises(ValueError):
+        cache.detections(path, dict(PIPELINE, motion_gate=True))
+    with pytest.raises(ValueError):
+        replay(cache.detections(path, PIPELINE), 320, dict(PIPELINE, motion_gate=True))
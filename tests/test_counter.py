@@ -0,0 +1,100 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.counter import CROSSING_DTYPE, LOG_MAGIC, CrossingLog, FishCounter, read_log
+from src.track_store import TrackStore, TrackView
+from src.zones import PolygonZone, ZoneIndex
+
+
+def _run(path, history_size=3, **counter_kwargs):
+    """Один подтвержденный трек идет по точкам path; счет после каждого кадра"""
+    store = TrackStore(capacity=4, history_size=history_size)
+    view = TrackView(store)
+    counter = FishCounter(count_line_x=100, min_frames=3, **counter_kwargs)
+    slot = store.add(0, (0, 0, 10, 10), path[0], 0.0)
+    store.confirmed[slot] = True
+    totals = [counter.update(view.refresh())]
+    for center in path[1:]:
+        store.push_centers(np.array([slot]), np.array([center]))
+        totals.append(counter.update(view.refresh()))
+    return counter, totals
+
+
+def test_counts_when_window_start_changes_side():
+    # Пересечение 90 -> 110 случилось, когда окно начиналось справа от линии;
+    # засчитывается, когда окно сдвинулось на 90 без нового пересечения
+    counter, totals = _run([(110, 50), (90, 50), (110, 50), (115, 50)])
+    assert totals == [0, 0, 0, 1]
+    assert counter.counts['right'] == 1
+
+
+def test_counts_plain_crossing_once():
+    _, totals = _run([(80, 50), (90, 50), (95, 50), (105, 50), (115, 50), (125, 50)])
+    assert totals == [0, 0, 0, 1, 1, 1]
+
+
+def test_log_is_written_and_closed(tmp_path):
+    path = str(tmp_path / 'crossings.bin')
+    counter, _ = _run([(80, 50), (90, 50), (95, 50), (105, 50)], log_path=path)
+    counter.close()
+    counter.close()
+    assert counter.log.file is None
+    events = read_log(path)
+    assert events['track_id'].tolist() == [0]
+    assert events['direction'].tolist() == [1]
+
+
+def test_polygon_membership_is_exact_at_cell_borders():
+    index = ZoneIndex([PolygonZone('pen', [(0, 0), (100, 0), (100, 100), (0, 100)])], cell=4)
+    points = np.array([[103, 103], [101, 50], [99, 99], [50, 50], [2, 98], [-1, 50]])
+    assert index.members(points)[:, 0].tolist() == [False, False, True, True, True, False]
+
+
+def test_polygon_membership_matches_point_polygon_test():
+    rng = np.random.default_rng(1)
+    vertices = [(60, 40), (300, 90), (260, 330), (120, 280), (30, 200)]
+    contour = np.array(vertices, dtype=np.float32).reshape(-1, 1, 2)
+    points = rng.integers(0, 400, (2000, 2))
+    reference = np.array([cv2.pointPolygonTest(contour, (float(x), float(y)), True) for x, y in points])
+    for cell in (1, 4, 7):
+        inside = ZoneIndex([PolygonZone('p', vertices)], cell=cell).members(points)[:, 0]
+        # Точки на самой границе не проверяем: правило чет-нечет относит их к любой стороне
+        clear = np.abs(reference) > 0.5
+        assert (inside[clear] == (reference[clear] > 0)).all()
+
+
+def test_log_has_version_header(tmp_path):
+    path = str(tmp_path / 'crossings.bin')
+    log = CrossingLog(path=path)
+    log.append(1.5, [7, 8], 1, zone=2)
+    log.close()
+    with open(path, 'rb') as f:
+        assert f.read(len(LOG_MAGIC)) == LOG_MAGIC
+    events = read_log(path)
+    assert events['track_id'].tolist() == [7, 8]
+    assert events['zone'].tolist() == [2, 2]
+
+    # Дописывание в тот же файл продолжает журнал
+    log = CrossingLog(path=path)
+    log.append(2.0, [9], -1)
+    log.close()
+    assert read_log(path)['track_id'].tolist() == [7, 8, 9]
+
+
+def test_legacy_log_is_read_and_never_appended(tmp_path):
+    legacy = np.dtype([('timestamp', '<f8'), ('track_id', '<i8'), ('direction', 'i1')])
+    path = str(tmp_path / 'old.bin')
+    np.array([(1.0, 3, 1), (2.0, 4, -1)], dtype=legacy).tofile(path)
+
+    events = read_log(path)
+    assert events.dtype == CROSSING_DTYPE
+    assert events['track_id'].tolist() == [3, 4]
+    assert events['zone'].tolist() == [0, 0]
+    with pytest.raises(ValueError):
+        CrossingLog(path=path)
+
+    with open(path, 'ab') as f:
+        f.write(b'\0\0')
+    with pytest.raises(ValueError):
+        read_log(path)
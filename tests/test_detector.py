@@ -0,0 +1,74 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.detector import FishDetector
+from src.pipeline import FishDetectionPipeline
+from src.synthetic import SyntheticScene
+
+
+def _frames(n, n_fish=3, seed=0):
+    return list(SyntheticScene(n_fish=n_fish, seed=seed).frames(n))
+
+
+def test_detect_mask_survives_next_frame():
+    detector = FishDetector(learning_rate=0.05)
+    frames = _frames(12)
+    _, first, _, _ = detector.detect(frames[0])
+    kept = first.copy()
+    for frame in frames[1:]:
+        detector.detect(frame)
+    assert np.array_equal(first, kept)
+
+
+def test_reuse_buffers_returns_detector_buffer():
+    detector = FishDetector(learning_rate=0.05, reuse_buffers=True)
+    frames = _frames(3)
+    _, first, _, _ = detector.detect(frames[0])
+    _, second, _, _ = detector.detect(frames[1])
+    assert first is second
+
+
+def test_pipeline_masks_are_independent_by_default():
+    frames = _frames(40, n_fish=5)
+    pipeline = FishDetectionPipeline(frame_width=640, visualize=False, learning_rate=0.05)
+    masks = [pipeline.process_frame(frame)[0] for frame in frames]
+    reference = FishDetector(**pipeline.detector_params)
+    for frame, mask in zip(frames, masks):
+        assert np.array_equal(mask, reference.detect(frame)[1])
+
+
+def test_clahe_settings_apply_after_construction():
+    gray = cv2.cvtColor(_frames(1)[0], cv2.COLOR_BGR2GRAY)
+    detector = FishDetector(clipLimit=2.0, tileGridkernel=4)
+    detector.clipLimit = 6.0
+    detector.tileGridkernel = 8
+    assert detector.clipLimit == 6.0 and detector.tileGridkernel == 8
+
+    expected = cv2.createCLAHE(clipLimit=6.0, tileGridSize=(8, 8)).apply(gray)
+    assert np.array_equal(detector.clahe.apply(gray), expected)
+
+
+def test_components_backend_matches_contours():
+    # Боксы 'components' совпадают с 'contours' на одних и тех же масках; расхождения
+    # (площадь у порогов через поправку на периметр) - не больше 5% боксов
+    source = FishDetector(learning_rate=0.05)
+    contours = FishDetector(learning_rate=0.05)
+    components = FishDetector(learning_rate=0.05, backend='components')
+    total, differing = 0, 0
+    for frame in _frames(150, n_fish=10, seed=1):
+        processed, _ = source.preprocess(frame)
+        mask = source.clean_mask(source.subtract(processed))
+        reference, _ = contours.find_boxes(mask)
+        candidate, candidate_contours = components.find_boxes(mask)
+        assert candidate_contours == []
+        total += len(reference)
+        differing += len(set(reference) ^ set(candidate))
+
+    assert total > 300
+    assert differing <= 0.05 * total
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        FishDetector(backend='blobs')
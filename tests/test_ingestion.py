@@ -0,0 +1,100 @@
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from src.ingestion import FileSource, FrameReader, GrayCapture
+from src.synthetic import SyntheticScene, write_video
+
+
+def _read_all(cap):
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame.copy())
+    cap.release()
+    return frames
+
+
+def test_gray_capture_keeps_probe_frame(tmp_path):
+    path = str(tmp_path / 'scene.avi')
+    write_video(SyntheticScene(width=320, height=240, n_fish=3, seed=2), path, 20)
+
+    reference = [cv2.cvtColor(f, cv2.COLOR_BGR2GRAY) for f in _read_all(cv2.VideoCapture(path))]
+    cap = GrayCapture(path)
+    assert cap.get(cv2.CAP_PROP_POS_FRAMES) == 0
+    frames = _read_all(cap)
+
+    assert len(frames) == len(reference) == 20
+    # Y-плоскость и BGR2GRAY расходятся на единицы из-за округлений декодера
+    for gray, ref in zip(frames, reference):
+        assert np.abs(gray.astype(np.int16) - ref).mean() < 2
+
+
+def test_gray_capture_seek_drops_probe_frame(tmp_path):
+    path = str(tmp_path / 'scene.avi')
+    write_video(SyntheticScene(width=320, height=240, n_fish=3, seed=2), path, 20)
+
+    cap = GrayCapture(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 15)
+    assert len(_read_all(cap)) == 5
+
+
+def _queued_frames(source, maxsize):
+    """Кадры, накопленные в очереди FrameReader до начала обработки"""
+    reader = FrameReader(source, maxsize=maxsize, policy='block').start()
+    deadline = time.monotonic() + 5
+    while not reader.queue.full() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    frames = [item.image for item in reader.frames()]
+    reader.stop()
+    return frames
+
+
+def _write_video(path, fourcc, n_frames):
+    scene = SyntheticScene(width=320, height=240, n_fish=3, seed=4)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), 30.0, (scene.width, scene.height))
+    for frame in scene.frames(n_frames):
+        writer.write(frame)
+    writer.release()
+
+
+# MJPG - Y-плоскость в полном диапазоне, mp4v - в ограниченном (через LUT)
+@pytest.mark.parametrize('name, fourcc, raw', [
+    ('scene.avi', 'MJPG', True),
+    ('scene.mp4', 'mp4v', True),
+    ('scene.mp4', 'mp4v', False),
+])
+def test_gray_frames_survive_reader_queue(tmp_path, name, fourcc, raw):
+    path = str(tmp_path / name)
+    _write_video(path, fourcc, 12)
+
+    reference = [cv2.cvtColor(f, cv2.COLOR_BGR2GRAY) for f in _read_all(cv2.VideoCapture(path))]
+    source = FileSource(path, realtime=False, gray=True)
+    if not raw:
+        source.cap = GrayCapture(path, raw=False)
+    frames = _queued_frames(source, maxsize=8)
+
+    assert len(frames) == len(reference) == 12
+    assert len({id(f) for f in frames}) == len(frames)
+    for gray, ref in zip(frames, reference):
+        assert np.abs(gray.astype(np.int16) - ref).mean() < 2
+
+
+def test_gray_capture_falls_back_to_bgr(tmp_path, monkeypatch):
+    path = str(tmp_path / 'scene.avi')
+    write_video(SyntheticScene(width=320, height=240, n_fish=3, seed=2), path, 10)
+    # Y-плоскость, которая не совпадает с BGR2GRAY ни в одном диапазоне
+    monkeypatch.setattr(GrayCapture, '_plane', lambda self, frame: None)
+
+    reference = [cv2.cvtColor(f, cv2.COLOR_BGR2GRAY) for f in _read_all(cv2.VideoCapture(path))]
+    cap = GrayCapture(path)
+    assert not cap.raw
+    frames = _read_all(cap)
+
+    assert len(frames) == len(reference)
+    for gray, ref in zip(frames, reference):
+        assert np.array_equal(gray, ref)
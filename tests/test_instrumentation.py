@@ -0,0 +1,32 @@
+import threading
+import time
+
+from src.instrumentation import Metrics
+
+
+def test_snapshot_while_another_thread_adds_keys():
+    metrics = Metrics(enabled=True)
+    stop = threading.Event()
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            key = f'k{i % 500}'
+            metrics.inc(key)
+            metrics.observe(key, i % 7)
+            metrics.lap(key, metrics.clock())
+            i += 1
+            if i % 500 == 0:
+                metrics.reset()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 1.0
+        while time.monotonic() < deadline:
+            snapshot = metrics.snapshot()
+            metrics.to_prometheus()
+            assert set(snapshot) == {'enabled', 'stages_ms', 'values', 'counters', 'gauges'}
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from src.pipeline import FishDetectionPipeline
+from src.renderer import make_snapshot
+from src.synthetic import SyntheticScene
+
+
+def _tracking_pipeline():
+    # Стадия трекинга и подсчета StagedPipeline: боксы приходят из процесса детекции
+    return FishDetectionPipeline(frame_width=640, visualize=False, with_detector=False)
+
+
+def test_snapshot_without_detector():
+    pipeline = _tracking_pipeline()
+    for x in range(0, 600, 20):
+        pipeline.counter.update(pipeline.tracker.update([(x, 200, 60, 30)]))
+        pipeline.frame_count += 1
+    state = pipeline.snapshot()
+    assert 'background' not in state
+
+    restored = _tracking_pipeline()
+    restored.restore(state)
+    assert restored.frame_count == pipeline.frame_count
+    assert restored.counter.total_count == pipeline.counter.total_count
+
+
+def test_restore_background_snapshot_without_detector():
+    pipeline = _tracking_pipeline()
+    full = FishDetectionPipeline(frame_width=640, visualize=False)
+    for frame in SyntheticScene(n_fish=2).frames(5):
+        full.process_frame(frame)
+    # Фон из снимка полного конвейера стадии трекинга не нужен
+    pipeline.restore(full.snapshot())
+    assert pipeline.frame_count == 5
+
+
+def test_frames_need_detector():
+    pipeline = _tracking_pipeline()
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    with pytest.raises(RuntimeError):
+        pipeline.process_frame(frame)
+    with pytest.raises(RuntimeError):
+        pipeline.process_frames(frame[None])
+
+
+def test_render_snapshot_without_detector():
+    pipeline = _tracking_pipeline()
+    tracks = pipeline.tracker.update([(100, 200, 60, 30)])
+    snapshot = make_snapshot(pipeline, np.zeros((480, 640), dtype=np.uint8), tracks, [], 0)
+    assert snapshot.contours == [] and snapshot.image.shape == (480, 640, 3)
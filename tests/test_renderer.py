@@ -0,0 +1,65 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from src import renderer as renderer_module
+from src.renderer import Renderer, TrackSnapshot
+
+
+def _snapshot(index):
+    return TrackSnapshot(frame_index=index, image=np.zeros((48, 64, 3), dtype=np.uint8),
+                         ids=np.zeros(0, dtype=np.int64), bboxes=np.zeros((0, 4), dtype=np.int64),
+                         counted=np.zeros(0, dtype=bool), paths=[], contours=[], total=0, zones=[],
+                         zone_counts=np.zeros((0, 2), dtype=np.int64))
+
+
+class FakeHighGui:
+    """Подмена imshow / waitKey / destroyWindow, запоминающая потоки вызовов"""
+
+    def __init__(self, monkeypatch):
+        self.calls = []
+        for name in ('imshow', 'waitKey', 'destroyWindow'):
+            monkeypatch.setattr(renderer_module.cv2, name, self._record(name))
+
+    def _record(self, name):
+        def call(*args):
+            self.calls.append((name, threading.current_thread() is threading.main_thread()))
+            return -1
+        return call
+
+
+def test_window_is_driven_from_main_thread(monkeypatch):
+    gui = FakeHighGui(monkeypatch)
+    renderer = Renderer(max_fps=1000).start()
+    renderer.submit(_snapshot(0))
+    deadline = time.monotonic() + 5
+    while renderer.rendered == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not renderer.poll()
+    renderer.stop()
+
+    assert [name for name, _ in gui.calls] == ['imshow', 'waitKey', 'destroyWindow']
+    assert all(main for _, main in gui.calls)
+
+
+def test_stop_without_window_does_not_touch_highgui(monkeypatch):
+    gui = FakeHighGui(monkeypatch)
+    renderer = Renderer(max_fps=1000).start()
+    renderer.poll()
+    renderer.stop()
+    assert gui.calls == []
+
+
+def test_headless_output(tmp_path):
+    path = str(tmp_path / 'out.avi')
+    renderer = Renderer(max_fps=1000, show=False, output_path=path).start()
+    for i in range(3):
+        renderer.submit(_snapshot(i))
+        time.sleep(0.05)
+    renderer.stop()
+    assert renderer.rendered >= 1
+    cap = cv2.VideoCapture(path)
+    assert cap.read()[0]
+    cap.release()
@@ -0,0 +1,68 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.sharding import SHARD_EVENT_DTYPE, plan_shards, process_shard, process_sharded, stitch
+from src.synthetic import SyntheticScene, write_video
+
+with open('data/manifest.json', encoding='utf-8') as f:
+    PIPELINE = json.load(f)['pipeline']
+
+N_FRAMES = 600
+# Допустимое расхождение с последовательным прогоном: рыбы на границах шардов
+TOLERANCE = 2
+
+
+@pytest.fixture(scope='module')
+def video(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('video') / 'long.avi')
+    write_video(SyntheticScene(width=320, height=240, n_fish=3, seed=7), path, N_FRAMES)
+    return path
+
+
+def test_plan_shards_covers_video():
+    assert plan_shards(1000, 4, 100) == [(0, 250), (250, 500), (500, 750), (750, None)]
+    assert plan_shards(150, 4, 100) == [(0, None)]
+    assert plan_shards(0, 4) == [(0, None)]
+
+
+def test_sharded_count_close_to_sequential(video):
+    sequential = process_shard(video, 0, None, PIPELINE)
+    sharded = process_sharded(video, PIPELINE, workers=3, warmup_frames=60, guard_frames=30)
+
+    assert len(sharded['shards']) == 3
+    assert sharded['frames'] == sequential['frames'] == N_FRAMES
+    assert sequential['events'].size > 10
+    assert abs(sharded['total'] - sequential['events'].size) <= TOLERANCE
+
+
+def test_shard_past_the_end_is_empty(video):
+    # Так выглядит шард, если CAP_PROP_FRAME_COUNT завышен
+    shard = process_shard(video, N_FRAMES + 100, N_FRAMES + 200, PIPELINE, warmup_frames=50, guard_frames=10)
+    assert shard['lo'] == shard['hi']
+    assert shard['frames'] == 0
+    assert shard['events'].size == 0
+
+    # Прогрев дочитал конец видео: шард пуст и начинается на последнем кадре
+    shard = process_shard(video, N_FRAMES + 20, None, PIPELINE, warmup_frames=50, guard_frames=10)
+    assert shard['lo'] == shard['hi'] == N_FRAMES
+    assert shard['frames'] == 30
+
+
+def _shard(lo, hi, events):
+    return {'lo': lo, 'hi': hi, 'zones': [('line', 'line'), ('pen', 'polygon')],
+            'events': np.array(events, dtype=SHARD_EVENT_DTYPE)}
+
+
+def test_stitch_counts_per_zone():
+    shards = [
+        _shard(0, 100, [(10, 50, 1, 0), (20, 60, 1, 1), (30, 70, -1, 1), (98, 80, 1, 0)]),
+        # (101, 82, 1, 0) - та же рыба, что (98, 80, 1, 0) у предыдущего шарда
+        _shard(100, 200, [(101, 82, 1, 0), (150, 90, -1, 0), (160, 95, 1, 1)]),
+    ]
+    result = stitch(shards, guard_frames=10, y_tolerance=10)
+    assert result['zones'] == {'line': {'right': 2, 'left': 1}, 'pen': {'in': 2, 'out': 1}}
+    assert result['counts'] == {'right': 2, 'left': 1, 'in': 2, 'out': 1}
+    assert result['total'] == 6
+    assert result['stitched'] == 1
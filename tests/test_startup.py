@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _loaded_modules(code):
+    out = subprocess.run([sys.executable, '-c', f'{code}; import sys; print(" ".join(sys.modules))'],
+                         cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return set(out.split())
+
+
+def test_cli_import_is_light():
+    modules = _loaded_modules('import src.cli')
+    assert not {'cv2', 'numpy', 'src.pipeline'} & modules
+
+
+def test_pipeline_does_not_load_renderer():
+    assert 'src.renderer' not in _loaded_modules('import src.pipeline')
+
+
+def test_benchmark_loads_only_its_module():
+    modules = _loaded_modules('from src.benchmarks import load; load("box_merge")')
+    assert 'src.benchmarks.box_merge' in modules
+    assert not {'cv2', 'src.pipeline', 'src.renderer', 'src.tuning', 'src.sharding'} & modules
+
+
+def test_every_benchmark_resolves():
+    from src.benchmarks import BENCHMARKS, load
+    assert all(callable(load(name)) for name in BENCHMARKS)
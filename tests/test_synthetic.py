@@ -0,0 +1,32 @@
+import numpy as np
+
+from src.synthetic import SyntheticScene
+
+
+def test_frames_do_not_step_past_the_last_frame():
+    scene = SyntheticScene(width=320, height=240, n_fish=6, speed=(20.0, 40.0), reverse=0.3, seed=3)
+    positions = []
+    for _ in scene.frames(80):
+        positions.append(dict(zip(scene.ids.tolist(), scene.pos[:, 0].tolist())))
+
+    assert len(positions) == 80
+    assert scene.frame_index == 79
+    events, counts = scene.truth()
+    assert counts['total'] == len(events) > 0
+    assert events['frame'].min() >= 1 and events['frame'].max() <= 79
+
+    # Пересечение отнесено к первому кадру, где рыба уже за линией
+    line = scene.line_x
+    for frame, fish_id, direction in events.tolist():
+        before, after = positions[frame - 1][fish_id], positions[frame][fish_id]
+        assert (before < line) != (after < line)
+        assert np.sign(after - before) == direction
+
+
+def test_truth_from_frame():
+    scene = SyntheticScene(width=320, height=240, n_fish=6, seed=5)
+    for _ in scene.frames(60):
+        pass
+    events, _ = scene.truth()
+    later, counts = scene.truth(30)
+    assert counts['total'] == np.count_nonzero(events['frame'] >= 30) == len(later)